@@ -0,0 +1,153 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import re
+
+from evidence import tokenize
+
+
+Span = Tuple[int, int]
+
+# Up to sentence punctuation followed by whitespace (so "Upstage.AI" stays whole), or a line end
+_SENTENCE = re.compile(r"[^\n]+?(?:[.!?]+(?=\s|$)|(?=\n)|$)")
+
+
+def _find_source(text: str, source: str) -> Optional[Span]:
+    """
+    Find a quoted source in the text, exactly or ignoring case and whitespace.
+    """
+
+    source = source.strip()
+    if not source:
+        return None
+    start = text.find(source)
+    if start >= 0:
+        return start, start + len(source)
+    pattern = r"\s+".join(re.escape(word) for word in source.split())
+    match = re.search(pattern, text, re.IGNORECASE)
+    return match.span() if match else None
+
+
+def sentence_spans(text: str) -> List[Span]:
+    spans = []
+    for match in _SENTENCE.finditer(text):
+        start, end = match.span()
+        # Trim surrounding whitespace
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+    return spans
+
+
+def locate_claim(
+    text: str, fact: Dict[str, Any], sentences: Optional[List[Span]] = None
+) -> Optional[Span]:
+    """
+    Return the character span of the text stating a claim.
+
+    Uses the claim's "source" quote when the extractor gave one and it occurs in the
+    text; otherwise the sentence sharing the most words with the claim's entity and value.
+
+    Args:
+        text (str): The text the claim was extracted from.
+        fact (Dict[str, Any]): The claim, with "entity", "relation", "value" and optionally "source".
+        sentences (Optional[List[Span]]): Precomputed sentence_spans(text).
+
+    Returns:
+        Optional[Span]: (start, end) offsets, or None if the claim cannot be found.
+    """
+
+    source = fact.get("source")
+    if isinstance(source, str):
+        span = _find_source(text, source)
+        if span is not None:
+            return span
+
+    words = set(tokenize(f"{fact.get('entity', '')} {fact.get('value', '')}"))
+    if not words:
+        return None
+    best, best_score = None, 0
+    for start, end in sentences if sentences is not None else sentence_spans(text):
+        score = len(words & set(tokenize(text[start:end])))
+        if score > best_score:
+            best, best_score = (start, end), score
+    return best
+
+
+def attach_spans(text: str, facts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return copies of the extracted facts with a "span" key: [start, end] offsets into text, or None.
+    """
+
+    sentences = sentence_spans(text)
+    located = []
+    for fact in facts:
+        if not isinstance(fact, dict):
+            located.append(fact)
+            continue
+        span = locate_claim(text, fact, sentences)
+        located.append({**fact, "span": list(span) if span else None})
+    return located
+
+
+def _status_label(status: str) -> str:
+    return "Unsure" if status == "not sure" else status.title()
+
+
+def _brief(explanation: str, max_chars: int = 120) -> str:
+    brief = re.split(r"(?<=[.!?])\s", explanation.strip(), maxsplit=1)[0]
+    return brief if len(brief) <= max_chars else brief[: max_chars - 3].rstrip() + "..."
+
+
+def format_annotation(result: Dict[str, Any]) -> str:
+    """
+    Format a verification result as "[Fact: <STATUS> (Confidence: <CONFIDENCE>) - <BRIEF_EXPLANATION>]".
+    """
+
+    confidence = result.get("confidence", 0.0)
+    confidence = f"{confidence:.2f}" if isinstance(confidence, (int, float)) else confidence
+    return (
+        f"[Fact: {_status_label(str(result.get('status', 'not sure')))} "
+        f"(Confidence: {confidence}) - {_brief(str(result.get('explanation', '')))}]"
+    )
+
+
+def annotate_text(
+    text: str,
+    verified_facts: Dict[str, Dict[str, Any]],
+    format_annotation: Callable[[Dict[str, Any]], str] = format_annotation,
+) -> str:
+    """
+    Insert an annotation after each verified fact's span, in one pass over the text.
+
+    Annotations of spans ending in sentence punctuation go before the punctuation.
+    Facts without a span are skipped.
+
+    Args:
+        text (str): The original text.
+        verified_facts (Dict[str, Dict[str, Any]]): Results of verify_facts, with "span" keys.
+        format_annotation (Callable[[Dict[str, Any]], str]): Formats one result.
+
+    Returns:
+        str: The annotated text.
+    """
+
+    inserts: Dict[int, List[str]] = {}
+    for result in verified_facts.values():
+        span = result.get("span")
+        if not span:
+            continue
+        end = min(span[1], len(text))
+        while end > span[0] and text[end - 1] in ".!?":
+            end -= 1
+        inserts.setdefault(end, []).append(format_annotation(result))
+
+    pieces = []
+    previous = 0
+    for position in sorted(inserts):
+        pieces.append(text[previous:position])
+        pieces.append(" " + " ".join(inserts[position]))
+        previous = position
+    pieces.append(text[previous:])
+    return "".join(pieces)
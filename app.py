@@ -1,75 +1,40 @@
 import streamlit as st
 import pandas as pd
-import networkx as nx
-import json
-from pyvis.network import Network
-from typing import Optional, Dict, Union, List, Any
+from typing import TYPE_CHECKING, Optional, Dict, Union, List, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from clients import get_llm, get_search_tool
 from fc import (
     extracted_claimed_facts,
     search_context,
     build_kg,
-    verify_facts,
-    add_fact_check_to_text,
-    Chat,
-    MODEL_NAME,
-    ddg_search,
+    iter_verify_facts,
+    apply_confidence_threshold,
 )
+from annotate import annotate_text
+from kg_render import kg_html
+from tracing import MetricsCollector, observe
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import re
-import io
-import tempfile
-
-st.set_page_config(page_title="Fact Checker", page_icon="🔍", layout="wide")
+import threading
 
+if TYPE_CHECKING:
+    from langchain_upstage import ChatUpstage as Chat
 
-# Monkey-patch the pyvis library to allow StringIO objects
-original_write_html = Network.write_html
-
-def patched_write_html(self, name, notebook=False):
-    if isinstance(name, io.StringIO):
-        html = self.generate_html()
-        name.write(html)
-    else:
-        original_write_html(self, name, notebook)
+st.set_page_config(page_title="Fact Checker", page_icon="🔍", layout="wide")
 
-Network.write_html = patched_write_html
 
 def visualize_kg(kg):
-    G = nx.Graph()
-
-    def add_node_safe(node):
-        if not isinstance(node, str):
-            return json.dumps(node)
-        return node
-
-    for entity, relations in kg.items():
-        G.add_node(add_node_safe(entity))
-        for relation, value in relations.items():
-            safe_value = add_node_safe(value)
-            G.add_node(safe_value)
-            G.add_edge(add_node_safe(entity), safe_value, title=relation)
-
-    net = Network(
-        notebook=True,
-        width="100%",
-        height="500px",
-        bgcolor="#222222",
-        font_color="white",
-    )
-    net.from_nx(G)
-    net.repulsion(node_distance=200, spring_length=200)
-    
-    # Use StringIO to capture the HTML string
-    html_io = io.StringIO()
-    net.write_html(html_io)
-    html_string = html_io.getvalue()
-
-    st.components.v1.html(html_string, height=500)
+    # Built from the KG dict and cached by its hash; large graphs are sampled and laid out statically
+    st.components.v1.html(kg_html(kg, height="500px"), height=500)
 
 
 def add_fact_check_to_text(text: str, results: Dict[str, Dict[str, Union[str, float]]]) -> str:
     """
     Annotates the original text with fact-checking results.
 
+    Facts are annotated at the text spans found during extraction. Facts without a
+    span fall back to replacing the first verbatim occurrence of the claimed fact.
+
     Args:
         text (str): The original input text.
         results (Dict[str, Dict[str, Union[str, float]]]): The verification results.
@@ -77,97 +42,189 @@ def add_fact_check_to_text(text: str, results: Dict[str, Dict[str, Union[str, fl
     Returns:
         str: Annotated text with fact checks.
     """
+
+    def format_annotation(result):
+        return (
+            f"[Fact: {result['claimed']} | status: {result['status']} "
+            f"| confidence: {result['confidence']:.2f}]"
+        )
+
+    text = annotate_text(text, results, format_annotation)
+
     for fact_id, result in results.items():
+        if result.get("span"):
+            continue
         claimed = result["claimed"]
-        status = result["status"]
-        confidence = result["confidence"]
         # Safeguard against '|' characters in claimed facts
         claimed_safe = claimed.replace("|", "\\|")
         # Escape special regex characters in claimed fact
         escaped_claimed = re.escape(claimed_safe)
-        # Construct the annotation
-        annotation = f"[Fact: {claimed} | status: {status} | confidence: {confidence:.2f}]"
         # Replace only the first occurrence to prevent multiple replacements
-        text = re.sub(escaped_claimed, annotation, text, count=1)
+        text = re.sub(escaped_claimed, format_annotation(result), text, count=1)
     return text
 
 
-def fc_streamlitet(
-    text: str,
-    verify_sources: bool = True,
-    confidence_threshold: float = 0.7,
-    llm: Optional[Chat] = None,
-) -> Dict[str, Dict[str, Union[str, float]]]:
-    st.write("--- Starting Fact Checking Process ---")
-    st.write(f"Input text: {text}")
+class CheckProgress:
+    """
+    Progress of a fact check running in the background, read by the script reruns that poll it.
+    """
 
-    if llm is None:
-        llm = Chat(model=MODEL_NAME)
-        st.info(f"Using default language model: {MODEL_NAME}")
-    else:
-        st.info("Using provided language model")
+    def __init__(self):
+        self.stage = "Queued"
+        self.claimed_facts: List[Dict[str, Any]] = []
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.metrics = MetricsCollector()
 
-    with st.spinner("Step 1: Extracting claimed facts"):
-        claimed_facts = extracted_claimed_facts(text, llm)
-        st.write(f"Extracted {len(claimed_facts)} claimed facts:")
-        for i, fact in enumerate(claimed_facts):
-            st.write(f"  {i+1}. {fact['entity']} {fact['relation']} {fact['value']}")
 
-    with st.spinner("Step 2: Searching for relevant context"):
-        context = search_context(text, claimed_facts, ddg_search, llm)
-        st.write(f"Retrieved context (first 100 characters): {context[:100]}...")
+@st.cache_resource
+def get_clients() -> Tuple["Chat", Any]:
+    # One LLM client and search tool for all sessions and reruns
+    return get_llm(), get_search_tool()
+
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="fact-check")
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def check_text(text: str, _progress: Optional[CheckProgress] = None) -> Dict[str, Any]:
+    """
+    Run the fact-checking pipeline on a text, once per text.
+
+    Facts are verified with a confidence threshold of 0.0, so the stored verdicts can
+    be re-thresholded with apply_confidence_threshold() when the slider moves.
+
+    Args:
+        text (str): The text to check.
+        _progress (Optional[CheckProgress]): Updated as the check goes; not part of the cache key.
+
+    Returns:
+        Dict[str, Any]: The claimed facts, context, knowledge graph, raw results and metrics.
+    """
+
+    progress = _progress or CheckProgress()
+    llm, search_tool = get_clients()
+
+    with observe(progress.metrics):
+        progress.stage = "Step 1: Extracting claimed facts"
+        claimed_facts = extracted_claimed_facts(text, llm)
+        progress.claimed_facts = claimed_facts
 
-    with st.spinner("Step 3: Building knowledge graph"):
+        progress.stage = "Step 2: Searching for relevant context"
+        context = search_context(text, claimed_facts, search_tool, llm)
 
+        progress.stage = "Step 3: Building knowledge graph"
         kg = build_kg(claimed_facts, context, llm)
 
-        st.write(f"Built knowledge graph with {len(kg)} entities")
-        st.subheader("Knowledge Graph Visualization")
-        visualize_kg(kg)
+        progress.stage = "Step 4: Verifying facts"
+        for fact_id, result in iter_verify_facts(
+            claimed_facts, context, kg, 0.0, llm, max_concurrency=4
+        ):
+            progress.results[fact_id] = result
+
+    return {
+        "claimed_facts": claimed_facts,
+        "context": context,
+        "kg": kg,
+        # In fact order, like verify_facts()
+        "results": {
+            fact_id: progress.results[fact_id]
+            for fact_id in sorted(progress.results, key=int)
+        },
+        "metrics": progress.metrics.to_dict(),
+    }
+
+
+def start_check(text: str) -> Dict[str, Any]:
+    """
+    Start checking a text off the script thread. Cached texts finish at once.
+    """
+
+    progress = CheckProgress()
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return check_text(text, progress)
 
-    with st.spinner("Step 4: Verifying facts"):
-        verified_facts = verify_facts(
-            claimed_facts, context, kg, confidence_threshold, llm
+    return {"text": text, "future": get_executor().submit(run), "progress": progress}
+
+
+@st.fragment(run_every=0.5)
+def show_progress(job: Dict[str, Any], confidence_threshold: float) -> None:
+    """
+    Poll a running check, showing each verdict as it arrives, until the check is done.
+    """
+
+    if job["future"].done():
+        st.rerun()
+
+    progress = job["progress"]
+    st.info(progress.stage)
+    claimed_facts = progress.claimed_facts
+    if claimed_facts:
+        st.write(f"Extracted {len(claimed_facts)} claimed facts")
+        results = dict(progress.results)
+        st.progress(
+            len(results) / len(claimed_facts),
+            text=f"Verified {len(results)} of {len(claimed_facts)} facts",
         )
-        st.write(f"Verified {len(verified_facts)} facts")
+        for fact_id, result in apply_confidence_threshold(results, confidence_threshold).items():
+            render_result(fact_id, result)
+
 
-    st.success("--- Fact Checking Process Completed ---")
+def show_process(check: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> None:
+    claimed_facts = check["claimed_facts"]
+    st.write(f"Extracted {len(claimed_facts)} claimed facts:")
+    for i, fact in enumerate(claimed_facts):
+        st.write(f"  {i+1}. {fact['entity']} {fact['relation']} {fact['value']}")
+
+    st.write(f"Retrieved context (first 100 characters): {check['context'][:100]}...")
+
+    st.write(f"Built knowledge graph with {len(check['kg'])} entities")
+    st.subheader("Knowledge Graph Visualization")
+    visualize_kg(check["kg"])
 
-    # Display all verified facts
     st.subheader("Fact Checking Results")
-    for fact_id, result in verified_facts.items():
-        status = result["status"]
-        confidence = result["confidence"]
-        explanation = result["explanation"]
-
-        # Define color and icon based on status
-        if status == "true":
-            color = "#90EE90"  # Light green
-            status_display = "✅ True"
-        elif status == "false":
-            color = "#FFB3BA"  # Light red
-            status_display = "❌ False"
-        elif status == "probably true":
-            color = "#ADD8E6"  # Light blue
-            status_display = "ℹ️ Probably True"
-        elif status == "probably false":
-            color = "#FFD700"  # Gold
-            status_display = "⚠️ Probably False"
-        else:
-            color = "#D3D3D3"  # Light gray
-            status_display = "❓ Not Sure"
-
-        with st.expander(f"Fact {fact_id}: {result['claimed'][:50]}...", expanded=True):
-            st.markdown(
-                f"<p style='background-color: {color}; padding: 10px;'>"
-                f"<strong>Status:</strong> {status_display} (Confidence: {confidence:.2f})<br>"
-                f"<strong>Claimed:</strong> {result['claimed']}<br>"
-                f"<strong>Explanation:</strong> {explanation}"
-                "</p>",
-                unsafe_allow_html=True,
-            )
-
-    return verified_facts
+    for fact_id, result in results.items():
+        render_result(fact_id, result)
+
+    st.subheader("Pipeline Metrics")
+    st.dataframe(pd.DataFrame.from_dict(check["metrics"], orient="index"))
+
+
+def render_result(fact_id: str, result: Dict[str, Any]) -> None:
+    status = result["status"]
+    confidence = result["confidence"]
+    explanation = result["explanation"]
+
+    # Define color and icon based on status
+    if status == "true":
+        color = "#90EE90"  # Light green
+        status_display = "✅ True"
+    elif status == "false":
+        color = "#FFB3BA"  # Light red
+        status_display = "❌ False"
+    elif status == "probably true":
+        color = "#ADD8E6"  # Light blue
+        status_display = "ℹ️ Probably True"
+    elif status == "probably false":
+        color = "#FFD700"  # Gold
+        status_display = "⚠️ Probably False"
+    else:
+        color = "#D3D3D3"  # Light gray
+        status_display = "❓ Not Sure"
+
+    with st.expander(f"Fact {fact_id}: {result['claimed'][:50]}...", expanded=True):
+        st.markdown(
+            f"<p style='background-color: {color}; padding: 10px;'>"
+            f"<strong>Status:</strong> {status_display} (Confidence: {confidence:.2f})<br>"
+            f"<strong>Claimed:</strong> {result['claimed']}<br>"
+            f"<strong>Explanation:</strong> {explanation}"
+            "</p>",
+            unsafe_allow_html=True,
+        )
 
 
 st.title("🔍 Fact Checker")
@@ -181,14 +238,27 @@ confidence_threshold = st.slider("Confidence threshold", 0.0, 1.0, 0.7, 0.1)
 
 if st.button("Check Facts"):
     if text:
+        st.session_state["job"] = start_check(text)
+    else:
+        st.warning("Please enter some text to fact-check.")
+
+job = st.session_state.get("job")
+if job is not None and not job["future"].done():
+    show_progress(job, confidence_threshold)
+elif job is not None:
+    error = job["future"].exception()
+    if error is not None:
+        st.error(f"Fact checking failed: {error}")
+    else:
+        check = job["future"].result()
+        # Moving the slider only re-thresholds the stored verdicts
+        results = apply_confidence_threshold(check["results"], confidence_threshold)
+        # Annotate the text that was checked, even if the text area changed since
+        text = job["text"]
         process_tab, results_tab = st.tabs(["Fact-Checking Process", "Results"])
 
         with process_tab:
-            results = fc_streamlitet(
-                text=text,
-                verify_sources=verify_sources,
-                confidence_threshold=confidence_threshold,
-            )
+            show_process(check, results)
 
         with results_tab:
             st.subheader("Fact-Checking Results Summary")
@@ -253,6 +323,3 @@ if st.button("Check Facts"):
 
             st.write("Annotated Text:")
             st.markdown(highlighted_text, unsafe_allow_html=True)
-
-    else:
-        st.warning("Please enter some text to fact-check.")
@@ -0,0 +1,246 @@
+from typing import Any, Dict, Optional, Set
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+from fc import afc
+from retries import TokenBucket, set_rate_limiter
+from tracing import MetricsCollector, observe
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    Tracks which input lines of a batch run are finished, so a crashed run can resume.
+
+    Lines finish out of order, so the checkpoint keeps a watermark (every line below it
+    is done) plus the finished lines above the watermark. run_batch() starts no line more
+    than its window past the watermark, so the latter stays below the window, and the
+    checkpoint stays small whatever the corpus size and however long one record takes.
+
+    Args:
+        path (Optional[str]): Path of the checkpoint file. None keeps the progress in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.next_line = 0
+        self.done: Set[int] = set()
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.next_line = state["next_line"]
+            self.done = set(state["done"])
+
+    def is_done(self, line_no: int) -> bool:
+        return line_no < self.next_line or line_no in self.done
+
+    def mark_done(self, line_no: int) -> None:
+        self.done.add(line_no)
+        while self.next_line in self.done:
+            self.done.remove(self.next_line)
+            self.next_line += 1
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"next_line": self.next_line, "done": sorted(self.done)}, f)
+        # Atomic, so a crash never leaves a half-written checkpoint behind
+        os.replace(tmp_path, self.path)
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    checkpoint_path: Optional[str] = None,
+    text_field: str = "text",
+    id_field: str = "id",
+    max_concurrency: int = 4,
+    window: int = 256,
+    **fc_kwargs: Any,
+) -> Dict[str, int]:
+    """
+    Fact-check every record of a JSONL file, streaming the results to an output JSONL file.
+
+    Input is read lazily and at most max_concurrency documents are in flight, so memory
+    use does not grow with the corpus. Each result is appended to the output as soon as
+    its document is done, so the output is not in input order; every output record
+    carries the input id (or line number). Records that fail are written with an
+    "error" field instead of results.
+
+    With a checkpoint, a restarted run skips the lines that were already written. A
+    crash between writing a result and saving the checkpoint can repeat that one record.
+    No line is started more than window lines past the first unfinished one, so a slow
+    record cannot make the checkpoint grow without bound.
+
+    Args:
+        input_path (str): Path of the input JSONL file.
+        output_path (str): Path of the output JSONL file; appended to.
+        checkpoint_path (Optional[str]): Path of the checkpoint file used to resume a crashed run.
+        text_field (str): Name of the field holding the text to check.
+        id_field (str): Name of the field holding the record id. The line number is used if missing.
+        max_concurrency (int): Maximum number of documents checked at the same time.
+        window (int): Maximum distance between the first unfinished line and any line started.
+        **fc_kwargs: Extra keyword arguments passed to afc(), e.g. llm or confidence_threshold.
+
+    Returns:
+        Dict[str, int]: Counts of "processed", "failed" and "skipped" records.
+    """
+
+    checkpoint = Checkpoint(checkpoint_path)
+    counts = {"processed": 0, "failed": 0, "skipped": 0}
+
+    async def check_record(line_no: int, line: str) -> Dict[str, Any]:
+        record_id = line_no
+        try:
+            record = json.loads(line)
+            record_id = record.get(id_field, line_no)
+            verified_facts, fact_checked_text = await afc(
+                record[text_field], **fc_kwargs
+            )
+            return {
+                "id": record_id,
+                "verified_facts": verified_facts,
+                "fact_checked_text": fact_checked_text,
+            }
+        except Exception as e:
+            logger.warning(f"Fact checking failed for record {record_id}: {e}")
+            return {"id": record_id, "error": str(e)}
+
+    with open(input_path) as fin, open(output_path, "a") as fout:
+
+        def write(task: asyncio.Task) -> None:
+            line_no, result = task.get_name(), task.result()
+            fout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            fout.flush()
+            checkpoint.mark_done(int(line_no))
+            checkpoint.save()
+            counts["failed" if "error" in result else "processed"] += 1
+
+        pending = set()
+        for line_no, line in enumerate(fin):
+            if checkpoint.is_done(line_no):
+                counts["skipped"] += 1
+                continue
+
+            # A slow record holds back the watermark: stop reading ahead of it at the window
+            while pending and (
+                len(pending) >= max_concurrency or line_no >= checkpoint.next_line + window
+            ):
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    write(task)
+
+            if not line.strip():
+                checkpoint.mark_done(line_no)
+                continue
+
+            pending.add(
+                asyncio.create_task(check_record(line_no, line), name=str(line_no))
+            )
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                write(task)
+
+    checkpoint.save()
+    logger.info(f"Batch finished: {counts}")
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fact-check the records of a JSONL file."
+    )
+    parser.add_argument("input", help="input JSONL file")
+    parser.add_argument("output", help="output JSONL file (appended to)")
+    parser.add_argument(
+        "--checkpoint",
+        help="checkpoint file used to resume a crashed run (default: <output>.checkpoint)",
+    )
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=4,
+        help="documents checked at the same time",
+    )
+    parser.add_argument("--confidence-threshold", type=float, default=0.7)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="extract facts from chunks of at most this many characters",
+    )
+    parser.add_argument(
+        "--search-mode",
+        choices=["keywords", "claims", "questions"],
+        default="keywords",
+        help="one search for generated keywords, or parallel searches per claim or sub-question",
+    )
+    parser.add_argument(
+        "--max-context-tokens",
+        type=int,
+        help="rank search results by relevance to the claims and keep about this many tokens",
+    )
+    parser.add_argument(
+        "--kg-fast-path",
+        action="store_true",
+        help="decide claims the knowledge graph clearly confirms or contradicts without the LLM",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        help="maximum LLM requests per second, shared by all documents",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="write per-stage metrics to this file (Prometheus text if it ends in .prom, else JSON)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.rate_limit:
+        set_rate_limiter(TokenBucket(args.rate_limit))
+
+    metrics = MetricsCollector()
+    with observe(metrics):
+        counts = asyncio.run(
+            run_batch(
+                args.input,
+                args.output,
+                checkpoint_path=args.checkpoint or f"{args.output}.checkpoint",
+                text_field=args.text_field,
+                id_field=args.id_field,
+                max_concurrency=args.max_concurrency,
+                confidence_threshold=args.confidence_threshold,
+                chunk_size=args.chunk_size,
+                kg_fast_path=args.kg_fast_path,
+                search_mode=args.search_mode,
+                max_context_tokens=args.max_context_tokens,
+            )
+        )
+    print(json.dumps(counts))
+
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            if args.metrics.endswith(".prom"):
+                f.write(metrics.to_prometheus())
+            else:
+                f.write(metrics.to_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
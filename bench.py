@@ -0,0 +1,287 @@
+"""
+Benchmarks for the fact-checking pipeline.
+
+Usage:
+    python bench.py import [--repeat N]
+    python bench.py chains [--repeat N]
+    python bench.py pipeline [--repeat N] [--latency SECONDS] [--sizes N,N,...] [--chunk-size CHARS]
+
+The pipeline benchmark runs offline, with the stand-ins from fakes.py.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Each snippet runs in a fresh interpreter, so module caches do not hide import costs
+IMPORT_SNIPPETS = {
+    "import (lazy clients)": "import fc, un2structured",
+    "import + first use": (
+        "import fc, un2structured\n"
+        "fc.get_llm()\n"
+        "fc.get_search_tool()"
+    ),
+    "import + eager clients (previous behaviour)": (
+        "import fc, un2structured\n"
+        "from langchain_community.tools import DuckDuckGoSearchResults\n"
+        "Chat = fc.get_chat_class()\n"
+        "# one client per default argument in fc.py (6) and un2structured.py (4)\n"
+        "clients = [Chat(model=fc.MODEL_NAME) for _ in range(10)]\n"
+        "DuckDuckGoSearchResults()"
+    ),
+}
+
+
+def _time_snippet(snippet: str) -> float:
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{snippet}\n"
+        "print(time.perf_counter() - start)"
+    )
+    # Clients need an API key to be constructed, but never use it here
+    env = {**os.environ, "UPSTAGE_API_KEY": os.environ.get("UPSTAGE_API_KEY", "bench")}
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def bench_import(repeat: int = 5) -> Dict[str, List[float]]:
+    """
+    Measure cold-start time of importing the pipeline modules, with and without eager clients.
+
+    Args:
+        repeat (int): Number of fresh interpreters per snippet.
+
+    Returns:
+        Dict[str, List[float]]: Timings in seconds per snippet.
+    """
+
+    return {
+        name: [_time_snippet(snippet) for _ in range(repeat)]
+        for name, snippet in IMPORT_SNIPPETS.items()
+    }
+
+
+def bench_chains(repeat: int = 5, calls: int = 200) -> Dict[str, List[float]]:
+    """
+    Measure the per-call overhead of building chains, with a local fake LLM.
+
+    Compares rebuilding the verify_one_fact prompt, parser and chain on every call
+    (the previous behaviour) with reusing the chain cached per (function, llm).
+
+    Args:
+        repeat (int): Number of timed rounds.
+        calls (int): Number of chain invocations per round.
+
+    Returns:
+        Dict[str, List[float]]: Mean time per call in seconds, one value per round.
+    """
+
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.output_parsers import JsonOutputParser
+
+    from chains import get_chain
+    from fc import _verify_one_fact_prompt
+
+    llm = FakeListChatModel(
+        responses=['{"status": "true", "confidence": 0.9, "explanation": "ok"}']
+    )
+    inputs = {
+        "entity": "Upstage",
+        "relation": "CEO",
+        "value": "Sung Kim",
+        "kg": '{"Upstage": {"CEO": {"value": "Sung Kim", "source": "..."}}}',
+        "context": "Sung Kim is the CEO of Upstage.",
+    }
+
+    prompt_value = _verify_one_fact_prompt().invoke(inputs)
+
+    def rebuild_per_call():
+        prompt = _verify_one_fact_prompt.__wrapped__()
+        return (prompt | llm | JsonOutputParser()).invoke(inputs)
+
+    def cached_chain():
+        return get_chain("verify_one_fact", llm, _verify_one_fact_prompt).invoke(inputs)
+
+    def fake_llm_only():
+        # Floor: the fake model call on an already rendered prompt
+        return llm.invoke(prompt_value)
+
+    timings = {}
+    for name, fn in [
+        ("rebuild per call", rebuild_per_call),
+        ("cached chain", cached_chain),
+        ("fake llm only", fake_llm_only),
+    ]:
+        fn()  # warm up
+        timings[name] = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(calls):
+                fn()
+            timings[name].append((time.perf_counter() - start) / calls)
+    return timings
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def bench_pipeline(
+    repeat: int = 5,
+    sizes: List[int] = (2, 8, 32),
+    latency: float = 0.0,
+    batch_size: int = 1,
+    max_concurrency: int = 1,
+    chunk_size: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run fc(), verify_facts and the un2structured functions offline across document sizes.
+
+    Every target runs against a fresh FakeChat and FakeSearch, so latency excludes any
+    network and the per-stage counters only cover that target.
+
+    Args:
+        repeat (int): Number of timed runs per (target, size).
+        sizes (List[int]): Number of facts in each generated document.
+        latency (float): Simulated seconds per LLM call and per search.
+        batch_size (int): Facts per verification call, passed to fc() and verify_facts.
+        max_concurrency (int): Parallel verification calls, passed to fc() and verify_facts.
+        chunk_size (Optional[int]): Extraction chunk size, passed to fc() and text2kvpairs.
+
+    Returns:
+        List[Dict[str, Any]]: One row per (target, size) with "p50" and "p95" latency in seconds,
+            and "stages" holding calls and prompt tokens per stage, per run.
+    """
+
+    from fakes import FakeChat, FakeSearch, make_document
+    import fc
+    import un2structured
+
+    def targets(text: str, llm: FakeChat, search: FakeSearch) -> Dict[str, Callable[[], Any]]:
+        claimed_facts = fc.extracted_claimed_facts(text, llm)
+        context = search.run(" ".join(f["entity"] for f in claimed_facts))
+        kg = fc.build_kg(claimed_facts, context, llm)
+        kv_pairs = un2structured.text2kvpairs(text, llm)
+        return {
+            "fc": lambda: fc.fc(
+                text,
+                verify_sources=False,
+                llm=llm,
+                batch_size=batch_size,
+                max_concurrency=max_concurrency,
+                search_tool=search,
+                chunk_size=chunk_size,
+            ),
+            "verify_facts": lambda: fc.verify_facts(
+                claimed_facts,
+                context,
+                kg,
+                0.7,
+                llm,
+                max_concurrency=max_concurrency,
+                batch_size=batch_size,
+            ),
+            "text2kvpairs": lambda: un2structured.text2kvpairs(
+                text, llm, chunk_size=chunk_size, max_concurrency=max_concurrency
+            ),
+            "text2kg": lambda: un2structured.text2kg(text, kv_pairs, llm),
+            "text2questions": lambda: un2structured.text2questions(text, llm),
+        }
+
+    rows = []
+    for size in sizes:
+        text = make_document(size)
+        names = list(targets(text, FakeChat(), FakeSearch()))
+        for name in names:
+            llm = FakeChat(latency=latency)
+            search = FakeSearch(latency=latency)
+            fn = targets(text, llm, search)[name]
+            llm.reset()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+            stages = {
+                stage: {key: value / repeat for key, value in stats.items()}
+                for stage, stats in llm.stage_stats().items()
+            }
+            rows.append(
+                {
+                    "target": name,
+                    "facts": size,
+                    "p50": _percentile(timings, 0.5),
+                    "p95": _percentile(timings, 0.95),
+                    "stages": stages,
+                }
+            )
+    return rows
+
+
+def _print_pipeline(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'target':<16}{'facts':>6}{'p50 ms':>10}{'p95 ms':>10}  calls / prompt tokens per stage")
+    for row in rows:
+        stages = ", ".join(
+            f"{stage} {stats['calls']:g}/{stats['prompt_tokens']:g}"
+            for stage, stats in sorted(row["stages"].items())
+        )
+        print(
+            f"{row['target']:<16}{row['facts']:>6}"
+            f"{row['p50'] * 1e3:>10.2f}{row['p95'] * 1e3:>10.2f}  {stages}"
+        )
+
+
+def _print_timings(timings: Dict[str, List[float]], unit: str = "s", scale: float = 1.0) -> None:
+    width = max(len(name) for name in timings)
+    for name, values in timings.items():
+        values = sorted(v * scale for v in values)
+        print(
+            f"{name:<{width}}  median {statistics.median(values):8.3f}{unit}"
+            f"  min {values[0]:8.3f}{unit}  max {values[-1]:8.3f}{unit}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=["import", "chains", "pipeline"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--sizes", default="2,8,32")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int)
+    args = parser.parse_args()
+
+    if args.benchmark == "import":
+        _print_timings(bench_import(args.repeat))
+    elif args.benchmark == "chains":
+        _print_timings(bench_chains(args.repeat), unit="us", scale=1e6)
+    elif args.benchmark == "pipeline":
+        _print_pipeline(
+            bench_pipeline(
+                args.repeat,
+                [int(size) for size in args.sizes.split(",")],
+                args.latency,
+                args.batch_size,
+                args.max_concurrency,
+                args.chunk_size,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
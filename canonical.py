@@ -0,0 +1,178 @@
+"""
+Canonical form of claimed facts, and a memo of verdicts keyed on it.
+
+Extracted triples differ trivially between runs: "Sung Kim " and "sung kim", "CEO of"
+and "is CEO of", "$3.2 billion" and "3,200,000,000 USD". canonical_key() maps such
+variants to one (entity, relation, value) triple: entities by alias (plus an optional
+alias table), relations by their words without articles and auxiliaries (so the
+direction, "acquired" or "acquired by", is kept), and values parsed as dates,
+quantities with units, or normalized text. The VerdictMemo answers claims verified
+before, across documents and requests, until their verdicts expire.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import json
+
+from chunking import dedupe, normalize_relation
+from kg_store import entity_key
+from kg_verify import parse_value, relation_tokens
+from llm_cache import MISSING, MemoryCache, SQLiteCache
+
+CanonicalTriple = Tuple[str, str, str]
+
+_entity_aliases: Dict[str, str] = {}
+
+
+def set_entity_aliases(aliases: Optional[Dict[str, str]]) -> None:
+    """
+    Set the alias table: each alias maps to the entity name it stands for, e.g.
+    {"Upstage AI": "Upstage", "Kim Sung-hoon": "Sung Kim"}. None clears it.
+    """
+
+    global _entity_aliases
+    _entity_aliases = {
+        entity_key(alias): entity_key(name) for alias, name in (aliases or {}).items()
+    }
+
+
+def get_entity_aliases() -> Dict[str, str]:
+    return dict(_entity_aliases)
+
+
+def canonical_entity(name: Any) -> str:
+    key = entity_key(name)
+    return _entity_aliases.get(key, key)
+
+
+def canonical_relation(relation: Any) -> str:
+    # In order, with prepositions: "acquired" and "acquired by" are opposite claims
+    tokens = relation_tokens(relation)
+    # A relation of stopwords only ("is") keeps its words
+    return " ".join(tokens) if tokens else normalize_relation(relation)
+
+
+def canonical_value(value: Any) -> str:
+    parsed = parse_value(value)
+    if parsed[0] == "date":
+        year, month, day = parsed[1:]
+        return "-".join(
+            f"{part:0{width}d}"
+            for part, width in ((year, 4), (month, 2), (day, 2))
+            if part is not None
+        )
+    if parsed[0] == "quantity":
+        _, number, unit, _ = parsed
+        return f"{number:.12g} {unit}" if unit else f"{number:.12g}"
+    return _entity_aliases.get(parsed[1], parsed[1])
+
+
+def canonical_key(fact: Dict[str, Any]) -> CanonicalTriple:
+    """
+    The canonical (entity, relation, value) triple of a claim.
+    """
+
+    if fact.get("canonical"):
+        return tuple(fact["canonical"])
+    return (
+        canonical_entity(fact.get("entity", "")),
+        canonical_relation(fact.get("relation", "")),
+        canonical_value(fact.get("value", "")),
+    )
+
+
+def _strip(value: Any) -> Any:
+    return " ".join(value.split()) if isinstance(value, str) else value
+
+
+def canonicalize_facts(facts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Clean up extracted claims and attach their canonical triple.
+
+    Whitespace in the entity, relation and value is collapsed, each fact gets a
+    "canonical" [entity, relation, value] triple, and claims with the same canonical
+    triple are merged, keeping the first.
+
+    Args:
+        facts (Iterable[Dict[str, Any]]): Facts as returned by extracted_claimed_facts().
+
+    Returns:
+        List[Dict[str, Any]]: The canonicalized facts, in order.
+    """
+
+    cleaned = []
+    for fact in facts:
+        if not isinstance(fact, dict):
+            continue
+        fact = {
+            key: _strip(value) if key in ("entity", "relation", "value") else value
+            for key, value in fact.items()
+            if key != "canonical"
+        }
+        fact["canonical"] = list(canonical_key(fact))
+        cleaned.append(fact)
+    return dedupe(cleaned, canonical_key)
+
+
+class VerdictMemo:
+    """
+    Verdicts keyed on the canonical triple of the claim, shared across documents and requests.
+
+    Unlike the incremental VerdictCache, a verdict is reused whatever context the claim
+    is checked against, so memoized verdicts expire after ttl seconds. "not sure"
+    verdicts are not memoized, so such claims get another chance with new evidence.
+
+    Args:
+        ttl (Optional[float]): Time to live of a verdict in seconds. None keeps verdicts until evicted.
+        max_entries (int): Maximum number of verdicts kept.
+        path (Optional[str]): Path of a SQLite database to persist verdicts to. None keeps them in memory only.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = 24 * 3600,
+        max_entries: int = 100_000,
+        path: Optional[str] = None,
+    ):
+        self.cache = (
+            SQLiteCache(path, max_entries=max_entries, ttl=ttl)
+            if path
+            else MemoryCache(max_entries=max_entries, ttl=ttl)
+        )
+
+    @staticmethod
+    def _key(fact: Dict[str, Any]) -> str:
+        return json.dumps(canonical_key(fact))
+
+    def get(self, fact: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        verdict = self.cache.get(self._key(fact))
+        return None if verdict is MISSING else verdict
+
+    def set(self, fact: Dict[str, Any], verdict: Optional[Dict[str, Any]]) -> None:
+        if not isinstance(verdict, dict):
+            return
+        status = str(verdict.get("status", "not sure")).lower()
+        if status == "not sure" or not isinstance(verdict.get("confidence"), (int, float)):
+            return
+        # fc imports this module, so import it here rather than at the top
+        from fc import raw_verdict
+
+        self.cache.set(self._key(fact), raw_verdict(verdict))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.cache.hits, "misses": self.cache.misses}
+
+
+_verdict_memo: Optional[VerdictMemo] = None
+
+
+def set_verdict_memo(memo: Optional[VerdictMemo]) -> None:
+    """
+    Set the memo the verification functions look claims up in and store verdicts to. None disables it.
+    """
+
+    global _verdict_memo
+    _verdict_memo = memo
+
+
+def get_verdict_memo() -> Optional[VerdictMemo]:
+    return _verdict_memo
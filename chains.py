@@ -0,0 +1,118 @@
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+from collections import OrderedDict
+import threading
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from json_repair import RepairingJsonOutputParser
+from llm_cache import MISSING, cache_key, get_llm_cache, llm_string
+from retries import alimit_rate, limit_rate
+from tracing import llm_config, record_cache
+
+
+class CachedChain:
+    """
+    A prompt | llm | output_parser chain that is built once and reused for every call.
+
+    When an LLM cache is set with llm_cache.set_llm_cache(), parsed results are looked
+    up by the rendered prompt before calling the model. Only successfully parsed
+    results are cached, so parse failures still reach the LLM on retry.
+
+    Args:
+        prompt (ChatPromptTemplate): The prompt template.
+        llm (Any): The language model.
+        output_parser (Any): The output parser applied to the model response.
+    """
+
+    def __init__(self, prompt: ChatPromptTemplate, llm: Any, output_parser: Any):
+        self.prompt = prompt
+        self.llm = llm
+        self.output_parser = output_parser
+        self.chain = prompt | llm | output_parser
+        self.model_chain = llm | output_parser
+        self._llm_string: Optional[str] = None
+
+    def _cache_key(self, prompt_value: Any) -> str:
+        if self._llm_string is None:
+            self._llm_string = llm_string(self.llm)
+        return cache_key(self._llm_string, prompt_value, self.output_parser)
+
+    def invoke(self, inputs: Dict[str, Any]) -> Any:
+        cache = get_llm_cache()
+        if cache is None:
+            limit_rate()
+            return self.chain.invoke(inputs, config=llm_config())
+
+        prompt_value = self.prompt.invoke(inputs)
+        key = self._cache_key(prompt_value)
+
+        result = cache.get(key)
+        record_cache("llm", result is not MISSING)
+        if result is MISSING:
+            limit_rate()
+            result = self.model_chain.invoke(prompt_value, config=llm_config())
+            cache.set(key, result)
+
+        return result
+
+    async def ainvoke(self, inputs: Dict[str, Any]) -> Any:
+        cache = get_llm_cache()
+        if cache is None:
+            await alimit_rate()
+            return await self.chain.ainvoke(inputs, config=llm_config())
+
+        prompt_value = await self.prompt.ainvoke(inputs)
+        key = self._cache_key(prompt_value)
+
+        result = cache.get(key)
+        record_cache("llm", result is not MISSING)
+        if result is MISSING:
+            await alimit_rate()
+            result = await self.model_chain.ainvoke(prompt_value, config=llm_config())
+            cache.set(key, result)
+
+        return result
+
+
+# Chains by (name, id(llm)). Each entry keeps its llm alive, so an id is never reused
+# while its entry exists; the least recently used entries are dropped past the limit.
+MAX_CHAINS = 256
+_chains: "OrderedDict[Tuple[str, int], CachedChain]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_chain(
+    name: str,
+    llm: Any,
+    build_prompt: Callable[[], ChatPromptTemplate],
+    output_parser_class: Type = RepairingJsonOutputParser,
+) -> CachedChain:
+    """
+    Return the chain for a (function, llm) pair, building it on first use.
+
+    Args:
+        name (str): Name of the function the chain belongs to.
+        llm (Any): The language model.
+        build_prompt (Callable[[], ChatPromptTemplate]): Builds the prompt template.
+        output_parser_class (Type): Class of the output parser. Defaults to RepairingJsonOutputParser,
+            which repairs malformed JSON locally before the call is retried.
+
+    Returns:
+        CachedChain: The shared chain.
+    """
+
+    key = (name, id(llm))
+    with _lock:
+        chain = _chains.get(key)
+        if chain is not None and chain.llm is llm:
+            _chains.move_to_end(key)
+            return chain
+
+    chain = CachedChain(build_prompt(), llm, output_parser_class())
+
+    with _lock:
+        _chains[key] = chain
+        while len(_chains) > MAX_CHAINS:
+            _chains.popitem(last=False)
+
+    return chain
@@ -0,0 +1,138 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Tuple, TypeVar
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+import re
+
+from annotate import Span, sentence_spans
+from kg_index import normalize_entity
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def chunk_spans(text: str, max_chars: int = 2000, overlap: int = 1) -> List[Span]:
+    """
+    Split a text into chunks of whole sentences, with overlap between consecutive chunks.
+
+    Paragraph breaks are preferred: a chunk ends at a blank line once it is at least
+    half full. A single sentence longer than max_chars becomes its own chunk.
+
+    Args:
+        text (str): The text to split.
+        max_chars (int): Maximum chunk length in characters.
+        overlap (int): Number of sentences repeated at the start of the next chunk,
+            so facts spanning a chunk boundary are seen whole.
+
+    Returns:
+        List[Span]: (start, end) offsets of the chunks in the text.
+    """
+
+    sentences = sentence_spans(text)
+    if not sentences:
+        return []
+
+    chunks = []
+    first = 0
+    while first < len(sentences):
+        last = first
+        while last + 1 < len(sentences):
+            end = sentences[last + 1][1]
+            if end - sentences[first][0] > max_chars:
+                break
+            gap = text[sentences[last][1] : sentences[last + 1][0]]
+            if "\n\n" in gap and sentences[last][1] - sentences[first][0] >= max_chars // 2:
+                break
+            last += 1
+        chunks.append((sentences[first][0], sentences[last][1]))
+        if last + 1 >= len(sentences):
+            break
+        # Step back for the overlap, but always make progress
+        first = max(first + 1, last + 1 - overlap)
+    return chunks
+
+
+def parallel_map(fn: Callable[[T], R], items: List[T], max_concurrency: int) -> List[R]:
+    """
+    Map fn over items with up to max_concurrency threads, keeping the item order.
+
+    Each call runs in a copy of the caller's context, so tracing stages and observers
+    carry over to the worker threads.
+    """
+
+    if max_concurrency <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    contexts = [copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as executor:
+        return list(executor.map(lambda ctx, item: ctx.run(fn, item), contexts, items))
+
+
+def parallel_as_completed(
+    fn: Callable[[T], R], items: List[T], max_concurrency: int
+) -> Iterator[Tuple[T, R]]:
+    """
+    Like parallel_map, but yield (item, result) pairs as soon as each call finishes.
+
+    Stopping the iteration early cancels the calls that have not started yet.
+    """
+
+    if max_concurrency <= 1 or len(items) <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+    executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(items)))
+    try:
+        futures = {
+            executor.submit(copy_context().run, fn, item): item for item in items
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def normalize_relation(relation: Any) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", str(relation).lower()).split())
+
+
+def fact_key(fact: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (
+        normalize_entity(fact.get("entity", "")),
+        normalize_relation(fact.get("relation", "")),
+        normalize_entity(fact.get("value", "")),
+    )
+
+
+def dedupe(items: Iterable[T], key: Callable[[T], Hashable]) -> List[T]:
+    """
+    Keep the first item for each key, in order.
+    """
+
+    seen = set()
+    unique = []
+    for item in items:
+        k = key(item)
+        if k not in seen:
+            seen.add(k)
+            unique.append(item)
+    return unique
+
+
+def dedupe_facts(facts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Drop repeated (entity, relation, value) triples, e.g. facts extracted twice from chunk overlaps.
+    """
+
+    return dedupe((fact for fact in facts if isinstance(fact, dict)), fact_key)
+
+
+def shift_spans(facts: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+    """
+    Move the spans of facts located in a chunk to offsets in the whole text.
+    """
+
+    return [
+        {**fact, "span": [fact["span"][0] + offset, fact["span"][1] + offset]}
+        if fact.get("span")
+        else fact
+        for fact in facts
+    ]
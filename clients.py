@@ -0,0 +1,68 @@
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import threading
+
+if TYPE_CHECKING:
+    from langchain_upstage import ChatUpstage as Chat
+
+
+MODEL_NAME = "solar-pro"
+
+# One shared client per (model, config). Clients are created on first use, so importing
+# fc or un2structured neither builds clients nor loads the LangChain integrations.
+_llms: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], "Chat"] = {}
+_search_tool: Optional[Any] = None
+_lock = threading.Lock()
+
+
+def get_chat_class():
+    """
+    Import and return the chat model class. Swap the import here to change provider.
+    """
+
+    # from langchain_groq import ChatGroq as Chat
+    from langchain_upstage import ChatUpstage as Chat
+
+    return Chat
+
+
+def get_llm(model: str = MODEL_NAME, **kwargs: Any) -> "Chat":
+    """
+    Return the shared chat client for a model and config, creating it on first use.
+
+    Clients are shared across callers and threads, so they also share their HTTP
+    connection pool.
+
+    Args:
+        model (str): The model name.
+        **kwargs: Extra client parameters, e.g. temperature. Each distinct config gets its own client.
+
+    Returns:
+        Chat: The shared chat client.
+    """
+
+    key = (model, tuple(sorted(kwargs.items())))
+    llm = _llms.get(key)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                llm = get_chat_class()(model=model, **kwargs)
+                _llms[key] = llm
+    return llm
+
+
+def get_search_tool() -> Any:
+    """
+    Return the shared, cached DuckDuckGo search tool, creating it on first use.
+    """
+
+    global _search_tool
+    if _search_tool is None:
+        with _lock:
+            if _search_tool is None:
+                from langchain_community.tools import DuckDuckGoSearchResults
+                from search_cache import CachedSearch
+
+                # Repeated and reordered keyword searches are answered from the cache
+                _search_tool = CachedSearch(DuckDuckGoSearchResults())
+    return _search_tool
@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional
+from collections import Counter
+import math
+import re
+
+from search_cache import split_snippets
+
+
+# Words too common to tell snippets apart
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "to", "was", "were",
+    "with",
+}
+
+MAX_SNIPPET_CHARS = 600
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of LLM tokens in a text (about 4 characters per token).
+    """
+
+    return len(text) // 4 + 1
+
+
+def split_context(context: str, max_chars: int = MAX_SNIPPET_CHARS) -> List[str]:
+    """
+    Split a context string into snippets: search results first, then sentences of long results.
+
+    Args:
+        context (str): The context information retrieved from the search.
+        max_chars (int): Snippets longer than this are split into groups of sentences.
+
+    Returns:
+        List[str]: The snippets, in their original order.
+    """
+
+    snippets = []
+    for snippet in split_snippets(context):
+        if len(snippet) <= max_chars:
+            snippets.append(snippet)
+            continue
+        chunk = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", snippet):
+            if chunk and len(chunk) + len(sentence) + 1 > max_chars:
+                snippets.append(chunk)
+                chunk = ""
+            chunk = f"{chunk} {sentence}" if chunk else sentence
+        if chunk:
+            snippets.append(chunk)
+    return snippets
+
+
+class BM25:
+    """
+    Okapi BM25 ranking over a fixed list of snippets.
+
+    Args:
+        snippets (List[str]): The snippets to rank.
+        k1 (float): Term frequency saturation.
+        b (float): Length normalization.
+    """
+
+    def __init__(self, snippets: List[str], k1: float = 1.5, b: float = 0.75):
+        self.snippets = snippets
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(snippet)) for snippet in snippets]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if snippets else 0.0
+
+        doc_freqs = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(snippets)
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        terms = set(tokenize(query))
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+
+class EvidenceSelector:
+    """
+    Picks the context snippets most relevant to a claim, within a token budget.
+
+    The context is split and indexed once, then queried per claim.
+
+    Args:
+        context (str): The context information retrieved from the search.
+        top_k (Optional[int]): Maximum number of snippets per claim. None for no limit.
+        token_budget (Optional[int]): Maximum estimated tokens of evidence per claim. None for no limit.
+    """
+
+    def __init__(
+        self,
+        context: str,
+        top_k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+    ):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.index = BM25(split_context(context))
+
+    def select(self, query: str, scale: int = 1) -> str:
+        """
+        Return the best snippets for a query, joined in their original order.
+
+        Args:
+            query (str): The claim, e.g. "entity relation value".
+            scale (int): Multiplier for top_k and token_budget, e.g. the number of claims in a batch query.
+
+        Returns:
+            str: The selected snippets. Empty if no snippet shares a term with the query.
+        """
+
+        scores = self.index.scores(query)
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        if self.top_k is not None:
+            ranked = ranked[: self.top_k * scale]
+
+        budget = self.token_budget * scale if self.token_budget is not None else None
+        selected = {}
+        used = 0
+        for i in ranked:
+            snippet = self.index.snippets[i]
+            tokens = estimate_tokens(snippet)
+            if budget is not None and used + tokens > budget:
+                if not selected:
+                    # Keep at least the best snippet, cut to the budget
+                    selected[i] = snippet[: budget * 4]
+                break
+            selected[i] = snippet
+            used += tokens
+
+        return "\n".join(selected[i] for i in sorted(selected))
@@ -0,0 +1,288 @@
+"""
+Offline stand-ins for the chat model and search tool, for tests and benchmarks.
+
+FakeChat answers every prompt of fc.py and un2structured.py with a deterministic,
+well-formed response, optionally after a simulated latency, and records which
+pipeline stage each call belongs to and how many tokens it used. FakeSearch does
+the same for the search tool.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import defaultdict
+import asyncio
+import json
+import re
+import threading
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict, Field, PrivateAttr
+
+from evidence import estimate_tokens
+
+
+# (stage, marker) pairs, checked in order against the lowercased prompt
+STAGE_MARKERS: List[Tuple[str, str]] = [
+    ("extract", "now, extract facts from the following text"),
+    ("keywords", "search keywords"),
+    ("build_kg", "construct the knowledge graph as a json object"),
+    ("verify_batch", "provide the verification results as a json array"),
+    ("verify", "claimed fact:"),
+    ("annotate", "adding fact-check annotations"),
+    ("text2kvpairs", "now, extract key-value pairs from the following text"),
+    ("text2kg", "now, extract the knowledge graph from the following text"),
+    ("text2questions", "now, break down the following complex question"),
+    ("prf_docs", "short, informative passages"),
+    ("query_expansion", "expanding search queries"),
+]
+
+# Documents built by make_document() state facts in this form
+FACT_SENTENCE = re.compile(r"(\w+) was founded in (\d{4})")
+
+
+def classify_prompt(prompt: str) -> str:
+    lowered = prompt.lower()
+    for stage, marker in STAGE_MARKERS:
+        if marker in lowered:
+            return stage
+    return "other"
+
+
+def make_document(n_facts: int) -> str:
+    """
+    Build a test document stating n_facts facts that FakeChat can extract and verify.
+    """
+
+    return " ".join(
+        f"Company{i} was founded in {1900 + i}." for i in range(n_facts)
+    )
+
+
+def _section(prompt: str, start: str, end: Optional[str] = None) -> str:
+    """
+    Return the part of a prompt after the last occurrence of start, up to end.
+    """
+
+    section = prompt.rsplit(start, 1)[-1]
+    return section.split(end, 1)[0] if end else section
+
+
+def pipeline_response(prompt: str) -> str:
+    """
+    Deterministic response for every prompt used by fc.py and un2structured.py.
+    """
+
+    stage = classify_prompt(prompt)
+
+    if stage == "extract":
+        text = _section(prompt, "from the following text:", "Respond with")
+        return json.dumps(
+            [
+                {
+                    "entity": entity,
+                    "relation": "founded in",
+                    "value": year,
+                    "source": f"{entity} was founded in {year}",
+                }
+                for entity, year in FACT_SENTENCE.findall(text)
+            ]
+        )
+
+    if stage == "keywords":
+        facts = _section(prompt, "Extracted Facts:", "Provide only")
+        entities = re.findall(r"- (\S+)", facts)
+        return ", ".join(f"{entity} founded" for entity in entities[:5]) or "news"
+
+    if stage == "build_kg":
+        context = _section(prompt, "Context:", "Claimed Facts")
+        return json.dumps(
+            {
+                entity: {
+                    "founded in": {
+                        "value": year,
+                        "source": f"{entity} was founded in {year}",
+                    }
+                }
+                for entity, year in FACT_SENTENCE.findall(context)
+            }
+        )
+
+    if stage == "verify_batch":
+        facts = _section(prompt, "Claimed Facts:", "Knowledge Graph:")
+        return json.dumps(
+            [
+                {
+                    "id": fact_id,
+                    "status": "true",
+                    "confidence": 0.9,
+                    "explanation": "Supported by the context.",
+                }
+                for fact_id in re.findall(r"^\[(\d+)\]", facts, re.MULTILINE)
+            ]
+        )
+
+    if stage == "verify":
+        return json.dumps(
+            {
+                "status": "true",
+                "confidence": 0.9,
+                "explanation": "Supported by the context.",
+            }
+        )
+
+    if stage == "annotate":
+        text = _section(prompt, "Original text:", "Verified facts:").strip()
+        return re.sub(r"(\.)(\s|$)", r" [Fact: True (Confidence: 0.90) - Supported]\1\2", text)
+
+    if stage == "text2kvpairs":
+        text = _section(prompt, "from the following text. Be thorough")
+        return json.dumps(
+            [
+                {"key": f"{entity} Year Founded", "value": year}
+                for entity, year in FACT_SENTENCE.findall(text)
+            ]
+        )
+
+    if stage == "text2kg":
+        text = _section(prompt, "Now, extract the knowledge graph", "Key-Value Pairs:")
+        return json.dumps(
+            {
+                entity: {"type": "Company", "attributes": {"yearFounded": int(year)}}
+                for entity, year in FACT_SENTENCE.findall(text)
+            }
+        )
+
+    if stage == "text2questions":
+        return json.dumps(
+            [
+                {
+                    "sub_question": "When were the companies founded?",
+                    "search_terms": ["company founding year"],
+                }
+            ]
+        )
+
+    if stage == "prf_docs":
+        return "Passage one.\n\nPassage two.\n\nPassage three."
+
+    if stage == "query_expansion":
+        return json.dumps(
+            {
+                "analysis": "The query asks about companies.",
+                "expansion_terms": [{"term": "founding", "rationale": "Related."}],
+            }
+        )
+
+    return "OK"
+
+
+class FakeChat(BaseChatModel):
+    """
+    Offline chat model with scripted responses and configurable latency.
+
+    Every call is recorded with its pipeline stage and estimated prompt and
+    completion tokens; see calls and stage_stats().
+
+    Args:
+        responder (Callable[[str], str]): Maps the prompt text to the response text. Defaults to pipeline_response.
+        latency (float): Simulated seconds per call.
+        model (str): Model name reported in cache keys.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    responder: Callable[[str], str] = pipeline_response
+    latency: float = 0.0
+    model: str = "fake-chat"
+    calls: List[Dict[str, Any]] = Field(default_factory=list)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model}
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        content = self.responder(prompt)
+        with self._lock:
+            self.calls.append(
+                {
+                    "stage": classify_prompt(prompt),
+                    "prompt_tokens": estimate_tokens(prompt),
+                    "completion_tokens": estimate_tokens(content),
+                }
+            )
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+    def stage_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Return the number of calls and prompt/completion tokens per stage.
+        """
+
+        stats = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        with self._lock:
+            for call in self.calls:
+                stage = stats[call["stage"]]
+                stage["calls"] += 1
+                stage["prompt_tokens"] += call["prompt_tokens"]
+                stage["completion_tokens"] += call["completion_tokens"]
+        return dict(stats)
+
+
+class FakeSearch:
+    """
+    Offline search tool returning one DuckDuckGo-style result per fact sentence found for the query.
+
+    Args:
+        latency (float): Simulated seconds per search.
+        results_per_query (int): Number of results returned per query.
+    """
+
+    def __init__(self, latency: float = 0.0, results_per_query: int = 4):
+        self.latency = latency
+        self.results_per_query = results_per_query
+        self.queries: List[str] = []
+
+    def _results(self, query: str) -> str:
+        self.queries.append(query)
+        entities = re.findall(r"Company(\d+)", query) or ["0"]
+        results = []
+        for n in entities[: self.results_per_query]:
+            i = int(n)
+            results.append(
+                f"snippet: Company{i} was founded in {1900 + i}., "
+                f"title: Company{i} history, link: https://example.com/company{i}"
+            )
+        return ", ".join(results)
+
+    def run(self, query: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._results(query)
+
+    async def arun(self, query: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._results(query)
@@ -1,99 +1,456 @@
-from typing import List, Dict, Optional, Any, Union
-import json
-
-# from langchain_groq import ChatGroq as Chat
-
-from langchain_upstage import ChatUpstage as Chat
-from langchain_community.tools import DuckDuckGoSearchResults
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
-
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import (
-    ChatPromptTemplate,
-    MessagesPlaceholder,
-    PromptTemplate,
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
 )
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from functools import lru_cache
+import asyncio
 import json
-from typing import Optional, Dict, Union, List, Any
+import logging
 
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import HumanMessage
+
+from clients import MODEL_NAME, get_chat_class, get_llm, get_search_tool
+from chains import get_chain
+from annotate import annotate_text, attach_spans
+from canonical import canonicalize_facts, get_verdict_memo
+from chunking import (
+    chunk_spans,
+    dedupe_facts,
+    parallel_as_completed,
+    parallel_map,
+    shift_spans,
+)
+from evidence import EvidenceSelector
+from kg_index import KGIndex
+from kg_store import KGStore, get_kg_store, merge_kgs, store_kg
+from kg_verify import KGVerifier
+from search_cache import merge_search_results, normalize_query
+from search_pool import SearchPool, rank_results
+from retries import alimit_rate, is_parse_error, limit_rate, with_retries
+from tracing import llm_config, record_cache, traced
+
+if TYPE_CHECKING:
+    from langchain_upstage import ChatUpstage as Chat
+
+
+__all__ = [
+    # Re-exported from clients, where the model name now lives
+    "MODEL_NAME",
+    "MAX_SEAERCH_RESULTS",
+    "fc",
+    "afc",
+    "extracted_claimed_facts",
+    "aextracted_claimed_facts",
+    "search_context",
+    "asearch_context",
+    "build_kg",
+    "abuild_kg",
+    "verify_facts",
+    "averify_facts",
+    "iter_verify_facts",
+    "aiter_verify_facts",
+    "verify_one_fact",
+    "averify_one_fact",
+    "verify_fact_batch",
+    "averify_fact_batch",
+    "verify_fact_batch_with_fallback",
+    "averify_fact_batch_with_fallback",
+    "apply_confidence_threshold",
+    "format_verification",
+    "raw_verdict",
+    "claim_str",
+    "lookup_kg_store",
+    "add_fact_check_to_text",
+    "aadd_fact_check_to_text",
+    "stream_fact_check_to_text",
+    "astream_fact_check_to_text",
+]
 
 MAX_SEAERCH_RESULTS = 5
 
-MODEL_NAME = "llama-3.1-70b-versatile"
-MODEL_NAME = "solar-pro"
-ddg_search = DuckDuckGoSearchResults()
+logger = logging.getLogger(__name__)
 
 
-from typing import List, Dict, Any, Union, Optional
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+def __getattr__(name: str) -> Any:
+    # Chat, DuckDuckGoSearchResults and ddg_search used to be created at import time.
+    # They are still importable from here, but are only loaded on first access.
+    if name == "Chat":
+        return get_chat_class()
+    if name == "DuckDuckGoSearchResults":
+        from langchain_community.tools import DuckDuckGoSearchResults
 
+        return DuckDuckGoSearchResults
+    if name == "ddg_search":
+        return get_search_tool()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
+
+@traced("verify")
 def verify_facts(
     claimed_facts: List[Dict[str, Any]],
     context: str,
     kg: Dict[str, Any],
     confidence_threshold: float,
-    llm: Optional[Chat] = Chat(model=MODEL_NAME),
+    llm: Optional[Chat] = None,
+    max_concurrency: int = 1,
+    batch_size: int = 1,
+    evidence_top_k: Optional[int] = None,
+    evidence_token_budget: Optional[int] = None,
+    kg_slicing: bool = False,
+    kg_fast_path: bool = False,
 ) -> Dict[str, Dict[str, Any]]:
     """
     Verify the claimed facts against the knowledge graph and context.
 
+    If a verdict memo is set with canonical.set_verdict_memo(), claims it knows are
+    answered from it without the LLM, and the LLM's verdicts are added to it.
+
     Args:
         claimed_facts (List[Dict[str, Any]]): The list of extracted claimed facts.
         context (str): The context information retrieved from the search.
         kg (Dict[str, Any]): The constructed knowledge graph.
         confidence_threshold (float): The confidence threshold for fact verification.
         llm (Optional[Chat]): The language model to use for verification, if needed.
+        max_concurrency (int): Maximum number of facts verified at the same time.
+            1 (the default) verifies the facts one after another.
+        batch_size (int): Number of facts judged together in one LLM call.
+            1 (the default) sends one prompt per fact. Batches that come back
+            malformed are re-verified fact by fact.
+        evidence_top_k (Optional[int]): If set, each prompt gets at most this many
+            context snippets, ranked by BM25 relevance to the claim.
+        evidence_token_budget (Optional[int]): If set, each prompt gets at most about
+            this many tokens of context, taking the most relevant snippets first.
+        kg_slicing (bool): If True, each prompt gets only the KG neighborhood of its
+            claims' entities and values instead of the whole KG.
+        kg_fast_path (bool): If True, claims the KG settles on its own (the stored value
+            matches, or clearly contradicts, the claimed one after normalizing numbers,
+            dates and units) are decided without the LLM, citing the KG entry's source.
 
     Returns:
         Dict[str, Dict[str, Any]]: Verified facts with status, confidence, and explanation.
         The structure is: {fact_id: {"claimed": str, "status": str, "confidence": float, "explanation": str}}
     """
 
-    kg_str = json.dumps(kg, indent=2)
-    verified_facts = {}
+    if llm is None:
+        llm = get_llm()
+
+    local_results, batches = _plan_verification(claimed_facts, kg, batch_size, kg_fast_path)
+    verify = _verifier(
+        context, kg, llm, batch_size, evidence_top_k, evidence_token_budget, kg_slicing
+    )
+
+    # Results come back in submission order, i.e. the original fact order
+    batch_results = parallel_map(verify, batches, max_concurrency)
+
+    return _collect_results(
+        claimed_facts, local_results, zip(batches, batch_results), confidence_threshold
+    )
+
+
+@traced("verify")
+def iter_verify_facts(
+    claimed_facts: List[Dict[str, Any]],
+    context: str,
+    kg: Dict[str, Any],
+    confidence_threshold: float,
+    llm: Optional[Chat] = None,
+    max_concurrency: int = 1,
+    batch_size: int = 1,
+    evidence_top_k: Optional[int] = None,
+    evidence_token_budget: Optional[int] = None,
+    kg_slicing: bool = False,
+    kg_fast_path: bool = False,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming version of verify_facts(): yield (fact_id, result) as soon as each fact is verified.
+
+    Claims decided by the KG fast path come first, then the others in the order their
+    verifications finish. Takes the same arguments as verify_facts(); collecting the
+    pairs into a dict gives the same results.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    local_results, batches = _plan_verification(claimed_facts, kg, batch_size, kg_fast_path)
+    for i, result in enumerate(local_results):
+        if result is not None:
+            yield str(i), format_verification(claimed_facts[i], result, confidence_threshold)
+
+    verify = _verifier(
+        context, kg, llm, batch_size, evidence_top_k, evidence_token_budget, kg_slicing
+    )
+    for batch, results in parallel_as_completed(verify, batches, max_concurrency):
+        for (i, fact), result in zip(batch, results):
+            yield str(i), format_verification(fact, result, confidence_threshold)
+
+
+def _plan_verification(
+    claimed_facts: List[Dict[str, Any]],
+    kg: Dict[str, Any],
+    batch_size: int,
+    kg_fast_path: bool,
+) -> Tuple[List[Optional[Dict[str, Any]]], List[List[Tuple[int, Dict[str, Any]]]]]:
+    """
+    Return the KG's own verdicts (None where the LLM is needed) and the batches of
+    (fact_id, fact) pairs left for the LLM.
+    """
+
+    local_results = _decide_locally(claimed_facts, kg, kg_fast_path)
+    pending = [
+        (i, fact)
+        for i, (fact, result) in enumerate(zip(claimed_facts, local_results))
+        if result is None
+    ]
+    size = max(1, batch_size)
+    return local_results, [pending[i : i + size] for i in range(0, len(pending), size)]
+
+
+def _verifier(
+    context: str,
+    kg: Dict[str, Any],
+    llm: Chat,
+    batch_size: int,
+    evidence_top_k: Optional[int],
+    evidence_token_budget: Optional[int],
+    kg_slicing: bool,
+) -> Callable[[List[Tuple[int, Dict[str, Any]]]], List[Dict[str, Any]]]:
+    """
+    Return a function verifying one batch of (fact_id, fact) pairs, giving raw results in batch order.
+    """
+
+    kg_for = _kg_for(kg, kg_slicing)
+    evidence_for = _evidence_for(context, evidence_top_k, evidence_token_budget)
+
+    def verify(batch):
+        facts = [fact for _, fact in batch]
+        if batch_size > 1:
+            # Batches that come back malformed are re-verified fact by fact
+            return _remember(
+                facts,
+                verify_fact_batch_with_fallback(evidence_for(facts), kg_for(facts), batch, llm),
+            )
+        # Single facts still go through verify_one_fact, so the per-fact retry applies
+        return _remember(
+            facts, [verify_one_fact(evidence_for(facts), kg_for(facts), facts[0], llm)]
+        )
+
+    return verify
+
+
+def _collect_results(
+    claimed_facts: List[Dict[str, Any]],
+    local_results: List[Optional[Dict[str, Any]]],
+    batch_results: Iterable[Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]],
+    confidence_threshold: float,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Combine the local verdicts and the LLM's batch results into verify_facts output, in fact order.
+    """
+
+    raw_results = list(local_results)
+    for batch, results in batch_results:
+        for (i, _), result in zip(batch, results):
+            raw_results[i] = result
+
+    return {
+        str(i): format_verification(fact, result or {}, confidence_threshold)
+        for i, (fact, result) in enumerate(zip(claimed_facts, raw_results))
+    }
+
+
+def _decide_locally(
+    claimed_facts: List[Dict[str, Any]], kg: Dict[str, Any], kg_fast_path: bool
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Return the verdict for each claim the KG settles or the verdict memo knows, None for the others.
+    """
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(claimed_facts)
+    if kg_fast_path:
+        results = KGVerifier(kg).verify_all(claimed_facts)
+        for result in results:
+            record_cache("kg_verdict", result is not None)
+
+    memo = get_verdict_memo()
+    if memo is not None:
+        for i, fact in enumerate(claimed_facts):
+            if results[i] is None:
+                results[i] = memo.get(fact)
+                record_cache("verdict_memo", results[i] is not None)
+    return results
+
+
+def _remember(facts: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Store the LLM's verdicts in the verdict memo, if one is set.
+    """
+
+    memo = get_verdict_memo()
+    if memo is not None:
+        for fact, result in zip(facts, results):
+            memo.set(fact, result)
+    return results
+
+
+def _kg_for(
+    kg: Dict[str, Any], kg_slicing: bool
+) -> Callable[[List[Dict[str, Any]]], str]:
+    """
+    Return a function giving the serialized KG to send along with a group of claimed facts.
+
+    Without slicing that is the whole KG. With slicing the KG is indexed once, and each
+    group gets only the neighborhood of its entities and values.
+    """
+
+    if not kg_slicing:
+        kg_str = json.dumps(kg, indent=2)
+        return lambda facts: kg_str
+
+    index = KGIndex(kg)
+    return index.subgraph_str
+
+
+def _evidence_for(
+    context: str, top_k: Optional[int], token_budget: Optional[int]
+) -> Callable[[List[Dict[str, Any]]], str]:
+    """
+    Return a function giving the context to send along with a group of claimed facts.
+
+    Without a top_k or token_budget that is the whole context. Otherwise the context
+    is split into snippets and indexed once, and each group gets its most relevant
+    snippets, with the limits scaled by the group size.
+    """
+
+    if top_k is None and token_budget is None:
+        return lambda facts: context
+
+    selector = EvidenceSelector(context, top_k=top_k, token_budget=token_budget)
+    return lambda facts: selector.select(
+        " ".join(claim_str(fact) for fact in facts), scale=len(facts)
+    )
+
+
+def claim_str(fact: Dict[str, Any]) -> str:
+    """
+    The claim as one line of text, "entity relation value".
+    """
+
+    return f"{fact['entity']} {fact['relation']} {fact['value']}"
+
+
+def format_verification(
+    fact: Dict[str, Any],
+    verification_result: Dict[str, Any],
+    confidence_threshold: float,
+) -> Dict[str, Any]:
+    """
+    Validate a raw verification result and convert it to the verify_facts output format.
+
+    Args:
+        fact (Dict[str, Any]): The claimed fact.
+        verification_result (Dict[str, Any]): The raw verdict: status, confidence, explanation and optional provenance.
+        confidence_threshold (float): Verdicts below this confidence become "not sure".
+
+    Returns:
+        Dict[str, Any]: The result as in verify_facts(): claimed, status, confidence, explanation,
+            and span and provenance if known.
+    """
 
     valid_statuses = {"true", "false", "probably true", "probably false", "not sure"}
 
-    for i, fact in enumerate(claimed_facts):
-        verification_result = verify_one_fact(context, kg_str, fact, llm)
+    status = verification_result.get("status", "not sure").lower()
+    confidence = verification_result.get("confidence", 0.0)
+    explanation = verification_result.get("explanation", "")
 
-        status = verification_result.get("status", "not sure").lower()
-        confidence = verification_result.get("confidence", 0.0)
-        explanation = verification_result.get("explanation", "")
+    # Validate status
+    if status not in valid_statuses:
+        status = "not sure"
 
-        # Validate status
-        if status not in valid_statuses:
-            status = "not sure"
+    # Validate confidence score
+    if not isinstance(confidence, (int, float)) or not (0.0 <= confidence <= 1.0):
+        confidence = 0.0
 
-        # Validate confidence score
-        if not isinstance(confidence, (int, float)) or not (0.0 <= confidence <= 1.0):
-            confidence = 0.0
+    # Apply confidence threshold
+    if confidence < confidence_threshold:
+        status = "not sure"
 
-        # Apply confidence threshold
-        if confidence < confidence_threshold:
-            status = "not sure"
+    formatted = {
+        "claimed": claim_str(fact),
+        "status": status,
+        "confidence": confidence,
+        "explanation": explanation,
+    }
+    if "span" in fact:
+        formatted["span"] = fact["span"]
+    if verification_result.get("provenance"):
+        formatted["provenance"] = verification_result["provenance"]
+    return formatted
 
-        verified_facts[str(i)] = {
-            "claimed": f"{fact['entity']} {fact['relation']} {fact['value']}",
-            "status": status,
-            "confidence": confidence,
-            "explanation": explanation,
-        }
 
-    return verified_facts
+def raw_verdict(verification_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The raw verdict in a verification result, as taken by format_verification().
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_fixed(0),
-    retry=retry_if_exception_type(Exception),
-    reraise=True,
-)
-def verify_one_fact(context, kg_str, fact, llm):
-    prompt = ChatPromptTemplate.from_messages(
+    Args:
+        verification_result (Dict[str, Any]): A raw or formatted verification result.
+
+    Returns:
+        Dict[str, Any]: Its status, confidence, explanation and provenance, those it has.
+    """
+
+    return {
+        key: verification_result[key]
+        for key in ("status", "confidence", "explanation", "provenance")
+        if key in verification_result
+    }
+
+
+def apply_confidence_threshold(
+    verified_facts: Dict[str, Dict[str, Any]], confidence_threshold: float
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Re-apply a confidence threshold to verification results, without calling the LLM.
+
+    Results below the threshold become "not sure". To move the threshold both ways,
+    keep the raw results, i.e. verify with a confidence_threshold of 0.0.
+
+    Args:
+        verified_facts (Dict[str, Dict[str, Any]]): Results of verify_facts().
+        confidence_threshold (float): The new confidence threshold.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Copies of the results with the threshold applied.
+    """
+
+    return {
+        fact_id: {**result, "status": "not sure"}
+        if result.get("confidence", 0.0) < confidence_threshold
+        else dict(result)
+        for fact_id, result in verified_facts.items()
+    }
+
+
+@lru_cache(maxsize=None)
+def _verify_one_fact_prompt() -> ChatPromptTemplate:
+    """
+    Build (once) the prompt used to verify a single claimed fact.
+    """
+
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "system",
@@ -136,8 +493,10 @@ Provide the verification result:""",
         ]
     )
 
-    output_parser = JsonOutputParser()
-    chain = prompt | llm | output_parser
+
+@with_retries
+def verify_one_fact(context, kg_str, fact, llm):
+    chain = get_chain("verify_one_fact", llm, _verify_one_fact_prompt)
 
     verification_result = chain.invoke(
         {
@@ -152,13 +511,184 @@ Provide the verification result:""",
     return verification_result
 
 
+def verify_fact_batch_with_fallback(
+    context: str,
+    kg_str: str,
+    batch: List[Tuple[int, Dict[str, Any]]],
+    llm: Chat,
+) -> List[Dict[str, Any]]:
+    """
+    Verify a batch of facts in one LLM call, falling back to per-fact calls.
+
+    Facts whose entry in the batch response is missing or malformed (or the
+    whole batch, if the response is still not a valid JSON array after the
+    retries) are verified again with verify_one_fact. Transport and client
+    errors are raised, not fanned out into per-fact calls.
+
+    Args:
+        context (str): The context information retrieved from the search.
+        kg_str (str): The serialized knowledge graph.
+        batch (List[Tuple[int, Dict[str, Any]]]): (fact_id, fact) pairs to verify.
+        llm (Chat): The language model to use for verification.
+
+    Returns:
+        List[Dict[str, Any]]: Raw verification results, in the order of the batch.
+    """
+
+    try:
+        batch_results = verify_fact_batch(context, kg_str, batch, llm)
+    except Exception as e:
+        if not is_parse_error(e):
+            raise
+        logger.warning(f"Batch verification failed, verifying facts one by one: {e}")
+        batch_results = {}
+
+    results = []
+    for fact_id, fact in batch:
+        result = batch_results.get(str(fact_id))
+        if result is None:
+            result = verify_one_fact(context, kg_str, fact, llm)
+        results.append(result)
+
+    return results
+
+
+@lru_cache(maxsize=None)
+def _verify_fact_batch_prompt() -> ChatPromptTemplate:
+    """
+    Build (once) the prompt used to verify a batch of claimed facts.
+    """
+
+    return ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "You are an expert fact-checker. Your task is to verify a list of claimed facts against a knowledge graph and context information. Categorize each verification result into one of the following five categories: true, false, probably true, probably false, or not sure.",
+            ),
+            (
+                "human",
+                """Verify each of the following claimed facts using the provided knowledge graph and context. Categorize each verification result into one of the following:
+
+1. **true**: Supporting evidence found in context.
+2. **false**: Contradicting evidence found in context.
+3. **probably true**: No context available, but based on your knowledge and common sense, the fact is likely true.
+4. **probably false**: No contradicting evidence in context, but based on your knowledge and common sense, the fact is likely false.
+5. **not sure**: Cannot judge due to subjectivity or unknowns.
+
+Additionally, assign each fact a confidence score between 0.0 and 1.0 that reflects the certainty of the categorization.
+
+Provide the results as a JSON array with one object per claimed fact, using the fact id given in brackets:
+[
+  {{
+    "id": "<FACT_ID>",
+    "status": "<CATEGORY>",
+    "confidence": <CONFIDENCE_SCORE>,
+    "explanation": "<BRIEF_EXPLANATION>"
+  }}
+]
+
+Ensure that:
+1. Every claimed fact gets exactly one result, judged independently of the others.
+2. The categorization is based on the information in the knowledge graph and context.
+3. The confidence score accurately reflects the certainty of the categorization.
+4. The explanation briefly justifies the verification decision and confidence score.
+
+Claimed Facts:
+{facts}
+
+Knowledge Graph:
+{kg}
+
+Context:
+{context}
+
+Provide the verification results as a JSON array only:""",
+            ),
+        ]
+    )
+
+
+@with_retries
+def verify_fact_batch(
+    context: str,
+    kg_str: str,
+    batch: List[Tuple[int, Dict[str, Any]]],
+    llm: Chat,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Verify several claimed facts with a single LLM call.
+
+    Args:
+        context (str): The context information retrieved from the search.
+        kg_str (str): The serialized knowledge graph.
+        batch (List[Tuple[int, Dict[str, Any]]]): (fact_id, fact) pairs to verify.
+        llm (Chat): The language model to use for verification.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Raw verification results keyed by fact id.
+        Entries that are missing or malformed in the response are left out.
+    """
+
+    chain = get_chain("verify_fact_batch", llm, _verify_fact_batch_prompt)
+
+    response = chain.invoke(
+        {"facts": _batch_facts_str(batch), "kg": kg_str, "context": context}
+    )
+
+    return _parse_batch_response(response, batch)
+
+
+def _batch_facts_str(batch: List[Tuple[int, Dict[str, Any]]]) -> str:
+    return "\n".join(
+        [
+            f"[{fact_id}] {fact['entity']} {fact['relation']} {fact['value']}"
+            for fact_id, fact in batch
+        ]
+    )
+
+
+def _parse_batch_response(
+    response: Any, batch: List[Tuple[int, Dict[str, Any]]]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Key a batch verification response by fact id, dropping malformed entries.
+    """
+
+    if not isinstance(response, list):
+        raise ValueError(f"Expected a JSON array, got {type(response).__name__}")
+
+    expected_ids = {str(fact_id) for fact_id, _ in batch}
+    results = {}
+    for item in response:
+        if not isinstance(item, dict) or not isinstance(item.get("status"), str):
+            continue
+        fact_id = str(item.get("id", "")).strip("[] ")
+        if fact_id in expected_ids and fact_id not in results:
+            results[fact_id] = item
+
+    return results
+
+
+@traced("fc")
 def fc(
     text: str,
     context: Optional[str] = None,
     kg: Optional[Dict] = None,
     verify_sources: bool = True,
     confidence_threshold: float = 0.7,
-    llm=Chat(model=MODEL_NAME),
+    llm: Optional[Chat] = None,
+    max_concurrency: int = 1,
+    batch_size: int = 1,
+    evidence_top_k: Optional[int] = None,
+    evidence_token_budget: Optional[int] = None,
+    kg_slicing: bool = False,
+    kg_fast_path: bool = False,
+    search_tool: Any = None,
+    search_mode: str = "keywords",
+    max_context_tokens: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    extract_concurrency: int = 4,
+    kg_store: Optional[KGStore] = None,
 ) -> Dict[str, Dict[str, Union[str, float, bool]]]:
     """
     Function to perform fact checking on a given text using a knowledge graph.
@@ -170,73 +700,143 @@ def fc(
         verify_sources (bool): Whether to verify the sources of the information.
         confidence_threshold (float): The confidence threshold for the fact checking.
         llm (Optional[Chat]): The language model to use for processing, if needed.
+        max_concurrency (int): Maximum number of facts verified at the same time.
+        batch_size (int): Number of facts judged together in one verification call.
+        evidence_top_k (Optional[int]): Maximum number of context snippets per verification prompt.
+        evidence_token_budget (Optional[int]): Approximate token budget of context per verification prompt.
+        kg_slicing (bool): Send each verification prompt only the KG neighborhood of its claim.
+        kg_fast_path (bool): Decide claims the KG clearly confirms or contradicts without the LLM.
+        search_tool (Any): The search tool to use for finding information. Defaults to the shared DuckDuckGo tool.
+        search_mode (str): How to search, see search_context(): "keywords", "claims" or "questions".
+        max_context_tokens (Optional[int]): Rank the search results and keep about this many tokens of them.
+        chunk_size (Optional[int]): Extract facts from chunks of at most this many characters, in parallel.
+        extract_concurrency (int): Maximum number of chunks extracted at the same time.
+        kg_store (Optional[KGStore]): Persistent KG to look claims up in first. Search and KG construction
+            are skipped for claims it already covers, and new graphs are added to it.
+            Defaults to the one set with set_kg_store().
 
     Returns:
         Dict[str, Dict[str, Union[str, float, bool]]]: The fact checked information.
         The structure is: {fact_id: {"claimed": str, "verified": bool, "confidence": float, "explanation": str}}
     """
 
-    print("\n--- Starting Fact Checking Process ---")
-    print(f"Input text: {text}")
+    if llm is None:
+        llm = get_llm()
+    if search_tool is None:
+        search_tool = get_search_tool()
+
+    logger.info("Starting fact checking process")
+    logger.debug("Input text: %s", text)
+
+    logger.info("Step 1: Extracting claimed facts")
+    claimed_facts = extracted_claimed_facts(
+        text, llm, chunk_size=chunk_size, max_concurrency=extract_concurrency
+    )
+    claimed_facts = canonicalize_facts(claimed_facts)
+    logger.info("Extracted %d claimed facts", len(claimed_facts))
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, fact in enumerate(claimed_facts):
+            logger.debug("  %d. %s", i + 1, claim_str(fact))
 
-    print("\nStep 1: Extracting claimed facts")
-    claimed_facts = extracted_claimed_facts(text, llm)
-    print(f"Extracted {len(claimed_facts)} claimed facts:")
-    for i, fact in enumerate(claimed_facts):
-        print(f"  {i+1}. {fact['entity']} {fact['relation']} {fact['value']}")
+    if kg_store is None:
+        kg_store = get_kg_store()
+    stored_kg, new_facts = lookup_kg_store(claimed_facts, kg_store, kg)
 
     if context is None:
-        print("\nStep 2: Searching for relevant context")
-        context = search_context(text, claimed_facts, ddg_search, llm)
-        print(f"Retrieved context (first 100 characters): {context[:100]}...")
+        logger.info("Step 2: Searching for relevant context")
+        context = (
+            search_context(
+                text,
+                new_facts,
+                search_tool,
+                llm,
+                search_mode=search_mode,
+                max_context_tokens=max_context_tokens,
+            )
+            if new_facts
+            else ""
+        )
+        logger.debug("Retrieved context (first 100 characters): %s...", context[:100])
     else:
-        print("\nStep 2: Using provided context")
+        logger.info("Step 2: Using provided context")
 
     if kg is None:
-        print("\nStep 3: Building knowledge graph")
-        kg = build_kg(claimed_facts, context, llm)
-        print(f"Built knowledge graph with {len(kg)} entities")
+        logger.info("Step 3: Building knowledge graph")
+        kg = build_kg(new_facts, context, llm, kg_store=kg_store) if new_facts else {}
+        kg = merge_kgs(stored_kg, kg)
+        logger.info("Built knowledge graph with %d entities", len(kg))
     else:
-        print("\nStep 3: Using provided knowledge graph")
-
-    print("\nStep 4: Verifying facts")
-    verified_facts = verify_facts(claimed_facts, context, kg, confidence_threshold, llm)
-    print(f"Verified {len(verified_facts)} facts:")
-    for fact_id, result in verified_facts.items():
-        print(f"  Fact {fact_id}:")
-        print(f"    Claimed: {result['claimed']}")
-        print(f"    Status: {result['status']}")
-        print(f"    Confidence: {result['confidence']}")
-        print(
-            f"    Explanation: {result['explanation'][:100]}..."
-        )  # Truncate long explanations
-
-    print("\n--- Fact Checking Process Completed ---")
+        logger.info("Step 3: Using provided knowledge graph")
+
+    logger.info("Step 4: Verifying facts")
+    verified_facts = verify_facts(
+        claimed_facts,
+        context,
+        kg,
+        confidence_threshold,
+        llm,
+        max_concurrency=max_concurrency,
+        batch_size=batch_size,
+        evidence_top_k=evidence_top_k,
+        evidence_token_budget=evidence_token_budget,
+        kg_slicing=kg_slicing,
+        kg_fast_path=kg_fast_path,
+    )
+    logger.info("Verified %d facts", len(verified_facts))
+    if logger.isEnabledFor(logging.DEBUG):
+        for fact_id, result in verified_facts.items():
+            logger.debug(
+                "  Fact %s: %s -> %s (confidence %s): %s",
+                fact_id,
+                result["claimed"],
+                result["status"],
+                result["confidence"],
+                result["explanation"][:100],  # Truncate long explanations
+            )
 
     # Final step
-    print("\nStep 5: Adding fact-check annotations to the original text")
+    logger.info("Step 5: Adding fact-check annotations to the original text")
     fact_checked_text = add_fact_check_to_text(text, verified_facts, llm)
-    print("Fact-checked text generated")
 
     return verified_facts, fact_checked_text
 
 
-def extracted_claimed_facts(
-    text: str, llm: Optional[Chat] = Chat(model=MODEL_NAME)
-) -> List[Dict[str, Any]]:
+def lookup_kg_store(
+    claimed_facts: List[Dict[str, Any]], kg_store: Optional[KGStore], kg: Optional[Dict]
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
     """
-    Extract claimed facts from the given text, including entities and their relationships.
+    Split the claims into what the KG store already knows and the claims still to search for.
 
     Args:
-        text (str): The input text to extract facts from.
-        llm (Optional[Chat]): The language model to use for extraction, if needed.
+        claimed_facts (List[Dict[str, Any]]): The claimed facts.
+        kg_store (Optional[KGStore]): The store to look the claims up in.
+        kg (Optional[Dict]): The knowledge graph given by the caller, if any.
 
     Returns:
-        List[Dict[str, Any]]: A list of extracted facts, where each fact is represented as a dictionary.
+        Tuple[Dict[str, Any], List[Dict[str, Any]]]: The stored subgraph around the claims,
+            and the claims the store does not cover. Without a store, or with a KG given
+            by the caller, nothing is looked up.
+    """
+
+    if kg_store is None or kg is not None:
+        return {}, claimed_facts
+    stored_kg = kg_store.subgraph(claimed_facts)
+    new_facts = [fact for fact in claimed_facts if not kg_store.covers(fact)]
+    logger.info(
+        "KG store covers %d of %d claimed facts",
+        len(claimed_facts) - len(new_facts),
+        len(claimed_facts),
+    )
+    return stored_kg, new_facts
+
+
+@lru_cache(maxsize=None)
+def _extract_facts_prompt() -> ChatPromptTemplate:
+    """
+    Build (once) the prompt used to extract claimed facts from a text.
     """
 
-    # Create the prompt template
-    prompt = ChatPromptTemplate.from_messages(
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "system",
@@ -244,19 +844,19 @@ def extracted_claimed_facts(
             ),
             (
                 "human",
-                """Extract the claimed facts from the following text, providing a list of dictionaries. Each dictionary should represent a fact and include keys for 'entity', 'relation', and 'value'. Be specific and precise with the relations.
+                """Extract the claimed facts from the following text, providing a list of dictionaries. Each dictionary should represent a fact and include keys for 'entity', 'relation', 'value' and 'source'. Be specific and precise with the relations. The 'source' is the shortest passage of the text stating the fact, copied verbatim.
 
 Examples:
 Input: "Albert Einstein developed the theory of relativity in 1915."
 Output: [
-    {{"entity": "Albert Einstein", "relation": "developed", "value": "theory of relativity"}},
-    {{"entity": "theory of relativity", "relation": "developed in", "value": "1915"}}
+    {{"entity": "Albert Einstein", "relation": "developed", "value": "theory of relativity", "source": "Albert Einstein developed the theory of relativity"}},
+    {{"entity": "theory of relativity", "relation": "developed in", "value": "1915", "source": "developed the theory of relativity in 1915"}}
 ]
 
 Input: "The Eiffel Tower, completed in 1889, stands at a height of 324 meters."
 Output: [
-    {{"entity": "Eiffel Tower", "relation": "completed in", "value": "1889"}},
-    {{"entity": "Eiffel Tower", "relation": "height", "value": "324 meters"}}
+    {{"entity": "Eiffel Tower", "relation": "completed in", "value": "1889", "source": "The Eiffel Tower, completed in 1889"}},
+    {{"entity": "Eiffel Tower", "relation": "height", "value": "324 meters", "source": "stands at a height of 324 meters"}}
 ]
 
 Now, extract facts from the following text:
@@ -269,16 +869,58 @@ Now, extract facts from the following text:
         ]
     )
 
-    # Create the output parser
-    output_parser = JsonOutputParser()
 
-    # Create the chain
-    chain = prompt | llm | output_parser
+@traced("extract")
+def extracted_claimed_facts(
+    text: str,
+    llm: Optional[Chat] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: int = 1,
+    max_concurrency: int = 4,
+) -> List[Dict[str, Any]]:
+    """
+    Extract claimed facts from the given text, including entities and their relationships.
+
+    Long texts can be split into overlapping chunks of whole sentences, extracted in
+    parallel; facts repeated across chunks are merged by their normalized triple.
+
+    Args:
+        text (str): The input text to extract facts from.
+        llm (Optional[Chat]): The language model to use for extraction, if needed.
+        chunk_size (Optional[int]): Maximum characters per extraction call. None to send the whole text.
+        chunk_overlap (int): Number of sentences shared by consecutive chunks.
+        max_concurrency (int): Maximum number of chunks extracted at the same time.
+
+    Returns:
+        List[Dict[str, Any]]: A list of extracted facts, where each fact is represented as a dictionary.
+        Each fact has a "span": the [start, end] character offsets of the text stating it, or None.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    if chunk_size is None or len(text) <= chunk_size:
+        return _extract_facts(text, llm)
+
+    def extract(span):
+        facts = _extract_facts(text[span[0] : span[1]], llm)
+        return shift_spans(facts, span[0]) if isinstance(facts, list) else []
+
+    results = parallel_map(
+        extract, chunk_spans(text, chunk_size, chunk_overlap), max_concurrency
+    )
+    return dedupe_facts(fact for facts in results for fact in facts)
+
+
+@with_retries
+def _extract_facts(text: str, llm: Chat) -> List[Dict[str, Any]]:
+    # Get the chain, built once per llm
+    chain = get_chain("extracted_claimed_facts", llm, _extract_facts_prompt)
 
     # Run the chain
     result = chain.invoke({"input_text": text})
 
-    return result
+    return attach_spans(text, result) if isinstance(result, list) else result
 
 
 # Example usage:
@@ -286,27 +928,13 @@ Now, extract facts from the following text:
 
 
 
-def search_context(
-    text: str,
-    claimed_facts: List[Dict[str, Any]],
-    search_tool: Any,
-    llm: Optional[Chat] = Chat(model=MODEL_NAME),
-) -> str:
+@lru_cache(maxsize=None)
+def _search_keywords_prompt() -> ChatPromptTemplate:
     """
-    Search for relevant information using claimed facts.
-
-    Args:
-        text (str): The original input text.
-        claimed_facts (List[Dict[str, Any]]): The list of extracted claimed facts.
-        search_tool (Any): The search tool to use for finding information (e.g., DuckDuckGoSearchResults).
-        llm (Optional[Chat]): The language model to use for processing, if needed.
-
-    Returns:
-        str: The relevant context information found from the search.
+    Build (once) the prompt used to generate search keywords for the claimed facts.
     """
 
-    # Step 1: Generate search keywords
-    prompt = ChatPromptTemplate.from_messages(
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "system",
@@ -326,51 +954,137 @@ Provide only the keywords or short phrases, separated by commas.""",
         ]
     )
 
-    facts_str = "\n".join(
-        [
-            f"- {fact['entity']} {fact['relation']} {fact['value']}"
-            for fact in claimed_facts
-        ]
+
+@traced("search")
+def search_context(
+    text: str,
+    claimed_facts: List[Dict[str, Any]],
+    search_tool: Any,
+    llm: Optional[Chat] = None,
+    search_mode: str = "keywords",
+    max_context_tokens: Optional[int] = None,
+    max_searches: int = 4,
+) -> str:
+    """
+    Search for relevant information using claimed facts.
+
+    Args:
+        text (str): The original input text.
+        claimed_facts (List[Dict[str, Any]]): The list of extracted claimed facts.
+        search_tool (Any): The search tool to use for finding information (e.g., DuckDuckGoSearchResults),
+            or a SearchPool.
+        llm (Optional[Chat]): The language model to use for processing, if needed.
+        search_mode (str): "keywords" (the default) makes one search for LLM-generated keywords.
+            "claims" searches for each claim, and "questions" for the search terms of the
+            sub-questions from text2questions(); these searches run in parallel.
+        max_context_tokens (Optional[int]): If set, the results are ranked by relevance to the
+            claims and cut to about this many tokens.
+        max_searches (int): Maximum number of searches in flight, unless search_tool is a SearchPool.
+
+    Returns:
+        str: The relevant context information found from the search.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    if search_mode != "keywords":
+        queries = _search_queries(text, claimed_facts, llm, search_mode)
+        pool = _search_pool(search_tool, max_searches)
+        return _rank_context(pool.run_many(queries), claimed_facts, max_context_tokens)
+
+    # Step 1: Generate search keywords
+    prompt = _search_keywords_prompt()
+
+    facts_str = _facts_str(claimed_facts)
+    limit_rate()
+    keywords_response = llm.invoke(
+        prompt.format(text=text, facts=facts_str), config=llm_config()
     )
-    keywords_response = llm.invoke(prompt.format(text=text, facts=facts_str))
 
     # Parse the keywords from the response
-    keywords = [kw.strip() for kw in keywords_response.content.split(",") if kw.strip()]
+    keywords = _parse_keywords(keywords_response.content)
 
     # Step 2: Perform search using the generated keywords
     search_query = " ".join(keywords)
     search_results = search_tool.run(search_query)
 
-    # Step 3: Return the search results
-    return search_results
+    # Step 3: Return the search results, without repeated snippets
+    return _rank_context([search_results], claimed_facts, max_context_tokens)
 
 
+def _search_pool(search_tool: Any, size: int) -> SearchPool:
+    return search_tool if isinstance(search_tool, SearchPool) else SearchPool(search_tool, size)
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_fixed(0),
-    retry=retry_if_exception_type(Exception),
-    reraise=True,
-)
-def build_kg(
-    claimed_facts: List[Dict[str, Any]],
-    context: str,
-    llm: Optional[Chat] = Chat(model=MODEL_NAME),
-) -> Dict[str, Any]:
+def _search_queries(
+    text: str, claimed_facts: List[Dict[str, Any]], llm: Chat, search_mode: str
+) -> List[str]:
+    """
+    Return the distinct queries of the "claims" or "questions" search mode.
     """
-    Build a knowledge graph from claimed facts and context information.
 
-    Args:
-        claimed_facts (List[Dict[str, Any]]): The list of extracted claimed facts.
-        context (str): The context information retrieved from the search.
-        llm (Optional[Chat]): The language model to use for processing, if needed.
+    if search_mode == "claims":
+        queries = [claim_str(fact) for fact in claimed_facts]
+    elif search_mode == "questions":
+        # Imported here: un2structured is only needed for this mode
+        from un2structured import text2questions
 
-    Returns:
-        Dict[str, Any]: The constructed knowledge graph with source information.
+        queries = _question_terms(text2questions(text, llm))
+    else:
+        raise ValueError(f"Unknown search mode: {search_mode!r}")
+    return _unique_queries(queries)
+
+
+def _question_terms(questions: Any) -> List[str]:
+    terms = []
+    for question in questions if isinstance(questions, list) else []:
+        if isinstance(question, dict):
+            terms.extend(str(term) for term in question.get("search_terms") or [])
+    return terms
+
+
+def _unique_queries(queries: List[str]) -> List[str]:
+    seen = set()
+    unique = []
+    for query in queries:
+        key = normalize_query(query)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(query)
+    return unique
+
+
+def _rank_context(
+    results: List[str], claimed_facts: List[Dict[str, Any]], max_context_tokens: Optional[int]
+) -> str:
+    if max_context_tokens is None:
+        return merge_search_results(results)
+    return rank_results(results, [claim_str(fact) for fact in claimed_facts], max_context_tokens)
+
+
+def _facts_str(claimed_facts: List[Dict[str, Any]]) -> str:
+    return "\n".join(
+        [
+            f"- {fact['entity']} {fact['relation']} {fact['value']}"
+            for fact in claimed_facts
+        ]
+    )
+
+
+def _parse_keywords(content: str) -> List[str]:
+    return [kw.strip() for kw in content.split(",") if kw.strip()]
+
+
+
+
+@lru_cache(maxsize=None)
+def _build_kg_prompt() -> ChatPromptTemplate:
+    """
+    Build (once) the prompt used to construct a knowledge graph from the context.
     """
 
-    prompt = ChatPromptTemplate.from_messages(
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "system",
@@ -415,24 +1129,100 @@ Construct the knowledge graph:""",
         ]
     )
 
-    output_parser = JsonOutputParser()
-    chain = prompt | llm | output_parser
 
-    facts_str = "\n".join(
-        [
-            f"- {fact['entity']} {fact['relation']} {fact['value']}"
-            for fact in claimed_facts
-        ]
-    )
+@traced("build_kg")
+@with_retries
+def build_kg(
+    claimed_facts: List[Dict[str, Any]],
+    context: str,
+    llm: Optional[Chat] = None,
+    kg_store: Optional[KGStore] = None,
+) -> Dict[str, Any]:
+    """
+    Build a knowledge graph from claimed facts and context information.
+
+    Args:
+        claimed_facts (List[Dict[str, Any]]): The list of extracted claimed facts.
+        context (str): The context information retrieved from the search.
+        llm (Optional[Chat]): The language model to use for processing, if needed.
+        kg_store (Optional[KGStore]): Store to add the graph to. Defaults to the one set with set_kg_store().
+
+    Returns:
+        Dict[str, Any]: The constructed knowledge graph with source information.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    chain = get_chain("build_kg", llm, _build_kg_prompt)
+
+    facts_str = _facts_str(claimed_facts)
 
     kg = chain.invoke({"context": context, "claimed_facts": facts_str})
+    store_kg(kg, "build_kg", kg_store)
 
     return kg
 
 
 
 
-def add_fact_check_to_text(text, verified_facts, llm=Chat(model=MODEL_NAME)):
+@traced("annotate")
+@with_retries
+def add_fact_check_to_text(text, verified_facts, llm=None):
+    if _has_spans(verified_facts):
+        return annotate_text(text, verified_facts)
+
+    if llm is None:
+        llm = get_llm()
+
+    messages = _fact_check_messages(text, verified_facts)
+    limit_rate()
+    # Chat models are runnables; plain callables (e.g. test doubles) are still accepted
+    response = (
+        llm.invoke(messages, config=llm_config())
+        if hasattr(llm, "invoke")
+        else llm(messages)
+    )
+
+    return response.content
+
+
+@traced("annotate")
+def stream_fact_check_to_text(text, verified_facts, llm=None) -> Iterator[str]:
+    """
+    Streaming version of add_fact_check_to_text(): yield the annotated text in pieces.
+
+    Locally annotated texts come as one piece; otherwise the LLM's tokens are yielded
+    as they arrive. Joining the pieces gives the annotated text. A streamed call is not
+    retried, since part of it has already been yielded.
+    """
+
+    if _has_spans(verified_facts):
+        yield annotate_text(text, verified_facts)
+        return
+
+    if llm is None:
+        llm = get_llm()
+
+    messages = _fact_check_messages(text, verified_facts)
+    limit_rate()
+    if not hasattr(llm, "stream"):
+        yield llm(messages).content
+        return
+    for chunk in llm.stream(messages, config=llm_config()):
+        if chunk.content:
+            yield chunk.content
+
+
+def _has_spans(verified_facts) -> bool:
+    # Facts located in the text are annotated locally; the LLM pass is only
+    # needed for results without spans (e.g. built by hand or from older extractions)
+    return bool(verified_facts) and all(
+        result.get("span") for result in verified_facts.values()
+    )
+
+
+def _fact_check_messages(text, verified_facts):
     # First, let's create a mapping of claimed facts to their verifications
     fact_map = {fact["claimed"]: fact for fact in verified_facts.values()}
 
@@ -460,8 +1250,435 @@ def add_fact_check_to_text(text, verified_facts, llm=Chat(model=MODEL_NAME)):
     """
     )
 
-    response = llm([system_message, human_message])
+    return [system_message, human_message]
+
+
+# Async variants. These mirror the functions above but use ainvoke/arun, so that
+# one event loop can fact-check many documents without a thread per request.
+
+
+@traced("fc")
+async def afc(
+    text: str,
+    context: Optional[str] = None,
+    kg: Optional[Dict] = None,
+    verify_sources: bool = True,
+    confidence_threshold: float = 0.7,
+    llm: Optional[Chat] = None,
+    max_concurrency: int = 4,
+    batch_size: int = 1,
+    evidence_top_k: Optional[int] = None,
+    evidence_token_budget: Optional[int] = None,
+    kg_slicing: bool = False,
+    kg_fast_path: bool = False,
+    search_tool: Any = None,
+    search_mode: str = "keywords",
+    max_context_tokens: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    extract_concurrency: int = 4,
+    kg_store: Optional[KGStore] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], str]:
+    """
+    Async version of fc() that overlaps independent stages.
+
+    Per-keyword searches run in parallel, and facts are verified concurrently
+    (at most max_concurrency LLM calls at a time) as soon as the knowledge
+    graph is ready.
+
+    Args:
+        text (str): The text to be checked.
+        context (Optional[str]): Additional context to be used for fact checking.
+        kg (Optional[Dict]): The knowledge graph to be used for fact checking.
+        verify_sources (bool): Whether to verify the sources of the information.
+        confidence_threshold (float): The confidence threshold for the fact checking.
+        llm (Optional[Chat]): The language model to use for processing, if needed.
+        max_concurrency (int): Maximum number of verification calls in flight.
+        batch_size (int): Number of facts judged together in one verification call.
+        evidence_top_k (Optional[int]): Maximum number of context snippets per verification prompt.
+        evidence_token_budget (Optional[int]): Approximate token budget of context per verification prompt.
+        kg_slicing (bool): Send each verification prompt only the KG neighborhood of its claim.
+        kg_fast_path (bool): Decide claims the KG clearly confirms or contradicts without the LLM.
+        search_tool (Any): The search tool to use for finding information.
+        search_mode (str): How to search, see search_context(): "keywords", "claims" or "questions".
+        max_context_tokens (Optional[int]): Rank the search results and keep about this many tokens of them.
+        chunk_size (Optional[int]): Extract facts from chunks of at most this many characters, in parallel.
+        extract_concurrency (int): Maximum number of chunks extracted at the same time.
+        kg_store (Optional[KGStore]): Persistent KG to look claims up in first. Search and KG construction
+            are skipped for claims it already covers, and new graphs are added to it.
+            Defaults to the one set with set_kg_store().
+
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], str]: The verified facts, in the same
+        format as fc(), and the fact-checked text.
+    """
+
+    if llm is None:
+        llm = get_llm()
+    if search_tool is None:
+        search_tool = get_search_tool()
+
+    claimed_facts = canonicalize_facts(
+        await aextracted_claimed_facts(
+            text, llm, chunk_size=chunk_size, max_concurrency=extract_concurrency
+        )
+    )
+
+    if kg_store is None:
+        kg_store = get_kg_store()
+    stored_kg, new_facts = lookup_kg_store(claimed_facts, kg_store, kg)
+
+    if context is None:
+        context = (
+            await asearch_context(
+                text,
+                new_facts,
+                search_tool,
+                llm,
+                search_mode=search_mode,
+                max_context_tokens=max_context_tokens,
+            )
+            if new_facts
+            else ""
+        )
+
+    if kg is None:
+        kg = await abuild_kg(new_facts, context, llm, kg_store=kg_store) if new_facts else {}
+        kg = merge_kgs(stored_kg, kg)
+
+    verified_facts = await averify_facts(
+        claimed_facts,
+        context,
+        kg,
+        confidence_threshold,
+        llm,
+        max_concurrency=max_concurrency,
+        batch_size=batch_size,
+        evidence_top_k=evidence_top_k,
+        evidence_token_budget=evidence_token_budget,
+        kg_slicing=kg_slicing,
+        kg_fast_path=kg_fast_path,
+    )
+
+    fact_checked_text = await aadd_fact_check_to_text(text, verified_facts, llm)
+
+    return verified_facts, fact_checked_text
+
+
+@traced("extract")
+async def aextracted_claimed_facts(
+    text: str,
+    llm: Optional[Chat] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: int = 1,
+    max_concurrency: int = 4,
+) -> List[Dict[str, Any]]:
+    """
+    Async version of extracted_claimed_facts().
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    if chunk_size is None or len(text) <= chunk_size:
+        return await _aextract_facts(text, llm)
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def extract(span):
+        async with semaphore:
+            facts = await _aextract_facts(text[span[0] : span[1]], llm)
+        return shift_spans(facts, span[0]) if isinstance(facts, list) else []
+
+    results = await asyncio.gather(
+        *[extract(span) for span in chunk_spans(text, chunk_size, chunk_overlap)]
+    )
+    return dedupe_facts(fact for facts in results for fact in facts)
+
+
+@with_retries
+async def _aextract_facts(text: str, llm: Chat) -> List[Dict[str, Any]]:
+    chain = get_chain("extracted_claimed_facts", llm, _extract_facts_prompt)
+
+    result = await chain.ainvoke({"input_text": text})
+
+    return attach_spans(text, result) if isinstance(result, list) else result
+
+
+@traced("search")
+async def asearch_context(
+    text: str,
+    claimed_facts: List[Dict[str, Any]],
+    search_tool: Any,
+    llm: Optional[Chat] = None,
+    search_mode: str = "keywords",
+    max_context_tokens: Optional[int] = None,
+    max_searches: int = 4,
+) -> str:
+    """
+    Async version of search_context().
+
+    In the "keywords" mode, instead of one concatenated query, each generated keyword
+    is searched separately and the searches run in parallel. The results are joined in
+    keyword order, and snippets returned by more than one search are kept once.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    pool = _search_pool(search_tool, max_searches)
+    if search_mode != "keywords":
+        if search_mode == "questions":
+            # text2questions has no async version; its chain call runs in a worker thread
+            queries = await asyncio.to_thread(_search_queries, text, claimed_facts, llm, search_mode)
+        else:
+            queries = _search_queries(text, claimed_facts, llm, search_mode)
+        return _rank_context(await pool.arun_many(queries), claimed_facts, max_context_tokens)
+
+    prompt = _search_keywords_prompt()
+    await alimit_rate()
+    keywords_response = await llm.ainvoke(
+        prompt.format(text=text, facts=_facts_str(claimed_facts)), config=llm_config()
+    )
+    keywords = _parse_keywords(keywords_response.content)
+
+    search_results = await pool.arun_many(keywords)
+
+    return _rank_context(search_results, claimed_facts, max_context_tokens)
+
+
+@traced("build_kg")
+@with_retries
+async def abuild_kg(
+    claimed_facts: List[Dict[str, Any]],
+    context: str,
+    llm: Optional[Chat] = None,
+    kg_store: Optional[KGStore] = None,
+) -> Dict[str, Any]:
+    """
+    Async version of build_kg().
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    chain = get_chain("build_kg", llm, _build_kg_prompt)
+
+    kg = await chain.ainvoke(
+        {"context": context, "claimed_facts": _facts_str(claimed_facts)}
+    )
+    store_kg(kg, "build_kg", kg_store)
+    return kg
+
+
+@traced("verify")
+async def averify_facts(
+    claimed_facts: List[Dict[str, Any]],
+    context: str,
+    kg: Dict[str, Any],
+    confidence_threshold: float,
+    llm: Optional[Chat] = None,
+    max_concurrency: int = 4,
+    batch_size: int = 1,
+    evidence_top_k: Optional[int] = None,
+    evidence_token_budget: Optional[int] = None,
+    kg_slicing: bool = False,
+    kg_fast_path: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Async version of verify_facts().
+
+    At most max_concurrency verification calls are in flight at a time. The
+    result keeps the original fact order.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    local_results, batches = _plan_verification(claimed_facts, kg, batch_size, kg_fast_path)
+    verify = _averifier(
+        context, kg, llm, max_concurrency, batch_size, evidence_top_k, evidence_token_budget, kg_slicing
+    )
+
+    batch_results = await asyncio.gather(*[verify(batch) for batch in batches])
+
+    return _collect_results(
+        claimed_facts, local_results, zip(batches, batch_results), confidence_threshold
+    )
+
+
+@traced("verify")
+async def aiter_verify_facts(
+    claimed_facts: List[Dict[str, Any]],
+    context: str,
+    kg: Dict[str, Any],
+    confidence_threshold: float,
+    llm: Optional[Chat] = None,
+    max_concurrency: int = 4,
+    batch_size: int = 1,
+    evidence_top_k: Optional[int] = None,
+    evidence_token_budget: Optional[int] = None,
+    kg_slicing: bool = False,
+    kg_fast_path: bool = False,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Async version of iter_verify_facts(): an async iterator of (fact_id, result) pairs,
+    in the order the verifications finish.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    local_results, batches = _plan_verification(claimed_facts, kg, batch_size, kg_fast_path)
+    for i, result in enumerate(local_results):
+        if result is not None:
+            yield str(i), format_verification(claimed_facts[i], result, confidence_threshold)
+
+    verify = _averifier(
+        context, kg, llm, max_concurrency, batch_size, evidence_top_k, evidence_token_budget, kg_slicing
+    )
+
+    async def verify_batch(batch):
+        return batch, await verify(batch)
+
+    tasks = [asyncio.ensure_future(verify_batch(batch)) for batch in batches]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            batch, results = await next_done
+            for (i, fact), result in zip(batch, results):
+                yield str(i), format_verification(fact, result, confidence_threshold)
+    finally:
+        # The consumer stopped early: do not leave verifications running
+        for task in tasks:
+            task.cancel()
+
+
+def _averifier(
+    context: str,
+    kg: Dict[str, Any],
+    llm: Chat,
+    max_concurrency: int,
+    batch_size: int,
+    evidence_top_k: Optional[int],
+    evidence_token_budget: Optional[int],
+    kg_slicing: bool,
+) -> Callable[[List[Tuple[int, Dict[str, Any]]]], Awaitable[List[Dict[str, Any]]]]:
+    """
+    Async version of _verifier(), with at most max_concurrency verification calls in flight.
+    """
+
+    kg_for = _kg_for(kg, kg_slicing)
+    evidence_for = _evidence_for(context, evidence_top_k, evidence_token_budget)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def verify(batch):
+        facts = [fact for _, fact in batch]
+        batch_context, batch_kg_str = evidence_for(facts), kg_for(facts)
+        async with semaphore:
+            if batch_size > 1:
+                results = await averify_fact_batch_with_fallback(
+                    batch_context, batch_kg_str, batch, llm
+                )
+            else:
+                results = [await averify_one_fact(batch_context, batch_kg_str, facts[0], llm)]
+        return _remember(facts, results)
+
+    return verify
+
+
+@with_retries
+async def averify_one_fact(context, kg_str, fact, llm):
+    chain = get_chain("verify_one_fact", llm, _verify_one_fact_prompt)
+
+    return await chain.ainvoke(
+        {
+            "entity": fact["entity"],
+            "relation": fact["relation"],
+            "value": fact["value"],
+            "kg": kg_str,
+            "context": context,
+        }
+    )
+
+
+@with_retries
+async def averify_fact_batch(
+    context: str,
+    kg_str: str,
+    batch: List[Tuple[int, Dict[str, Any]]],
+    llm: Chat,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Async version of verify_fact_batch().
+    """
+
+    chain = get_chain("verify_fact_batch", llm, _verify_fact_batch_prompt)
+    response = await chain.ainvoke(
+        {"facts": _batch_facts_str(batch), "kg": kg_str, "context": context}
+    )
+    return _parse_batch_response(response, batch)
+
+
+async def averify_fact_batch_with_fallback(
+    context: str,
+    kg_str: str,
+    batch: List[Tuple[int, Dict[str, Any]]],
+    llm: Chat,
+) -> List[Dict[str, Any]]:
+    """
+    Async version of verify_fact_batch_with_fallback().
+    """
+
+    try:
+        batch_results = await averify_fact_batch(context, kg_str, batch, llm)
+    except Exception as e:
+        if not is_parse_error(e):
+            raise
+        logger.warning(f"Batch verification failed, verifying facts one by one: {e}")
+        batch_results = {}
+
+    results = []
+    for fact_id, fact in batch:
+        result = batch_results.get(str(fact_id))
+        if result is None:
+            result = await averify_one_fact(context, kg_str, fact, llm)
+        results.append(result)
+
+    return results
+
+
+@traced("annotate")
+@with_retries
+async def aadd_fact_check_to_text(text, verified_facts, llm=None):
+    if _has_spans(verified_facts):
+        return annotate_text(text, verified_facts)
+
+    if llm is None:
+        llm = get_llm()
+
+    await alimit_rate()
+    response = await llm.ainvoke(
+        _fact_check_messages(text, verified_facts), config=llm_config()
+    )
 
     return response.content
 
 
+@traced("annotate")
+async def astream_fact_check_to_text(text, verified_facts, llm=None) -> AsyncIterator[str]:
+    """
+    Async version of stream_fact_check_to_text().
+    """
+
+    if _has_spans(verified_facts):
+        yield annotate_text(text, verified_facts)
+        return
+
+    if llm is None:
+        llm = get_llm()
+
+    await alimit_rate()
+    async for chunk in llm.astream(
+        _fact_check_messages(text, verified_facts), config=llm_config()
+    ):
+        if chunk.content:
+            yield chunk.content
@@ -0,0 +1,247 @@
+"""
+Incremental fact checking of a re-submitted text.
+
+fc_incremental() diffs the text against the previous run at sentence level, extracts
+facts only from changed sentences, and re-verifies only claims without a stored
+verdict. It returns the same (verified_facts, fact_checked_text) as fc(), plus the
+run record to pass back in next time.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import difflib
+import hashlib
+import json
+
+from annotate import Span, sentence_spans
+from canonical import canonical_key
+from chunking import dedupe_facts, fact_key, parallel_map, shift_spans
+from clients import get_llm, get_search_tool
+from evidence import tokenize
+from fc import (
+    add_fact_check_to_text,
+    build_kg,
+    extracted_claimed_facts,
+    format_verification,
+    raw_verdict,
+    search_context,
+    verify_facts,
+)
+from kg_store import merge_kgs
+from llm_cache import MISSING, MemoryCache, SQLiteCache
+from search_cache import merge_search_results
+
+
+def context_hash(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+
+
+class VerdictCache:
+    """
+    Verdicts keyed on the canonical (entity, relation, value) triple and the hash of
+    the context the claim was verified against.
+
+    Args:
+        max_entries (int): Maximum number of verdicts kept.
+        ttl (Optional[float]): Time to live of a verdict in seconds. None keeps verdicts until evicted.
+        path (Optional[str]): Path of a SQLite database to persist verdicts to. None keeps them in memory only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+    ):
+        self.cache = (
+            SQLiteCache(path, max_entries=max_entries, ttl=ttl)
+            if path
+            else MemoryCache(max_entries=max_entries, ttl=ttl)
+        )
+
+    @staticmethod
+    def _key(fact: Dict[str, Any], context_hash: str) -> str:
+        return json.dumps([*canonical_key(fact), context_hash])
+
+    def get(self, fact: Dict[str, Any], context_hash: str) -> Optional[Dict[str, Any]]:
+        verdict = self.cache.get(self._key(fact, context_hash))
+        return None if verdict is MISSING else verdict
+
+    def set(self, fact: Dict[str, Any], context_hash: str, verdict: Dict[str, Any]) -> None:
+        self.cache.set(self._key(fact, context_hash), verdict)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.cache.hits, "misses": self.cache.misses}
+
+
+_verdict_cache = VerdictCache()
+
+
+def _sentence_for(sentences: List[Span], position: int) -> Optional[int]:
+    for i, (start, end) in enumerate(sentences):
+        if start <= position < end:
+            return i
+    return None
+
+
+def _carry_over(
+    previous: Dict[str, Any], text: str, sentences: List[Span]
+) -> Tuple[List[Dict[str, Any]], List[Span]]:
+    """
+    Split the new text into facts kept from the previous run and regions to re-extract.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Span]]: The kept facts, with spans moved to the
+            new text, and the spans of the runs of changed sentences.
+    """
+
+    old_text = previous["text"]
+    old_sentences = sentence_spans(old_text)
+    matcher = difflib.SequenceMatcher(
+        None,
+        [old_text[start:end] for start, end in old_sentences],
+        [text[start:end] for start, end in sentences],
+        autojunk=False,
+    )
+
+    moved: Dict[int, int] = {}  # old sentence index -> new sentence index
+    changed: List[Span] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            moved.update(zip(range(i1, i2), range(j1, j2)))
+        elif j2 > j1:
+            changed.append((sentences[j1][0], sentences[j2 - 1][1]))
+
+    words = set(tokenize(text))
+    kept = []
+    for fact in previous["facts"]:
+        span = fact.get("span")
+        if not span:
+            # Not located last time: keep it while the text still mentions it
+            if set(tokenize(f"{fact.get('entity', '')} {fact.get('value', '')}")) <= words:
+                kept.append(fact)
+            continue
+        first = _sentence_for(old_sentences, span[0])
+        last = _sentence_for(old_sentences, span[1] - 1)
+        if first is None or last is None or first not in moved or last not in moved:
+            continue
+        if moved[last] - moved[first] != last - first:
+            continue
+        offset = sentences[moved[first]][0] - old_sentences[first][0]
+        kept.append({**fact, "span": [span[0] + offset, span[1] + offset]})
+    return kept, changed
+
+
+def fc_incremental(
+    text: str,
+    previous: Optional[Dict[str, Any]] = None,
+    confidence_threshold: float = 0.7,
+    llm: Any = None,
+    search_tool: Any = None,
+    verdict_cache: Optional[VerdictCache] = None,
+    max_concurrency: int = 1,
+    chunk_size: Optional[int] = None,
+    **verify_kwargs: Any,
+) -> Tuple[Dict[str, Dict[str, Any]], str, Dict[str, Any]]:
+    """
+    Fact-check a text, reusing the work of a previous run on an earlier version of it.
+
+    Facts in unchanged sentences keep their stored verdicts. Changed or new sentences
+    are re-extracted; their claims are searched for, added to the previous context and
+    knowledge graph, and verified. Verdicts are also looked up in the verdict cache by
+    normalized triple and context hash, so repeated claims are verified once.
+
+    Args:
+        text (str): The text to check.
+        previous (Optional[Dict[str, Any]]): The run record returned by the previous call. None for a full run.
+        confidence_threshold (float): The confidence threshold for the fact checking.
+        llm (Any): The language model to use. Defaults to the shared client.
+        search_tool (Any): The search tool to use. Defaults to the shared DuckDuckGo tool.
+        verdict_cache (Optional[VerdictCache]): Where verdicts are looked up and stored. Defaults to a shared in-memory cache.
+        max_concurrency (int): Maximum number of parallel extraction or verification calls.
+        chunk_size (Optional[int]): Extraction chunk size, see extracted_claimed_facts().
+        **verify_kwargs: Further arguments for verify_facts(), e.g. batch_size or kg_fast_path.
+
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], str, Dict[str, Any]]: The verified facts and the
+            fact-checked text, as returned by fc(), and the run record to store.
+    """
+
+    if llm is None:
+        llm = get_llm()
+    if search_tool is None:
+        search_tool = get_search_tool()
+    if verdict_cache is None:
+        verdict_cache = _verdict_cache
+
+    sentences = sentence_spans(text)
+    if previous is None:
+        kept, changed = [], ([(0, len(text))] if text.strip() else [])
+        context, kg = "", {}
+    else:
+        kept, changed = _carry_over(previous, text, sentences)
+        context, kg = previous["context"], previous["kg"]
+
+    def extract(span):
+        facts = extracted_claimed_facts(
+            text[span[0] : span[1]], llm, chunk_size=chunk_size, max_concurrency=max_concurrency
+        )
+        return shift_spans(facts, span[0]) if isinstance(facts, list) else []
+
+    new_facts = dedupe_facts(
+        fact for facts in parallel_map(extract, changed, max_concurrency) for fact in facts
+    )
+    # Drop re-extracted claims that were kept anyway
+    kept_keys = {fact_key(fact) for fact in kept}
+    new_facts = [fact for fact in new_facts if fact_key(fact) not in kept_keys]
+
+    if new_facts:
+        new_context = search_context(text, new_facts, search_tool, llm)
+        context = merge_search_results([context, new_context]) if context else new_context
+        # Per relation, so an entity mentioned again keeps its earlier relations
+        kg = merge_kgs(kg, build_kg(new_facts, new_context, llm))
+    current_hash = context_hash(context)
+
+    claims = sorted(
+        kept + new_facts,
+        key=lambda fact: fact["span"][0] if fact.get("span") else len(text),
+    )
+
+    verdicts: List[Optional[Dict[str, Any]]] = []
+    for fact in claims:
+        verdict = fact.get("verdict")
+        if verdict is None:
+            verdict = verdict_cache.get(fact, current_hash)
+        verdicts.append(verdict)
+
+    missing = [i for i, verdict in enumerate(verdicts) if verdict is None]
+    if missing:
+        results = verify_facts(
+            [claims[i] for i in missing],
+            context,
+            kg,
+            # Keep the model's own status; the threshold is applied below
+            0.0,
+            llm,
+            max_concurrency=max_concurrency,
+            **verify_kwargs,
+        )
+        for i, result in zip(missing, results.values()):
+            verdicts[i] = raw_verdict(result)
+            verdict_cache.set(claims[i], current_hash, verdicts[i])
+
+    verified_facts = {}
+    run_facts = []
+    for i, (fact, verdict) in enumerate(zip(claims, verdicts)):
+        verified_facts[str(i)] = format_verification(fact, verdict, confidence_threshold)
+        run_facts.append(
+            {
+                **{key: value for key, value in fact.items() if key not in ("verdict", "context_hash")},
+                "verdict": verdict,
+                # Kept facts were verified against an earlier context
+                "context_hash": fact.get("context_hash", current_hash),
+            }
+        )
+
+    fact_checked_text = add_fact_check_to_text(text, verified_facts, llm)
+    run = {"text": text, "context": context, "kg": kg, "facts": run_facts}
+    return verified_facts, fact_checked_text, run
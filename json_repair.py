@@ -0,0 +1,122 @@
+from typing import Any, List
+import json
+import re
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+
+from tracing import record_repair
+
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _strip_code_fence(text: str) -> str:
+    match = _CODE_FENCE.search(text)
+    return match.group(1) if match else text
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    """
+    Remove a comma (and the whitespace after it) at the end of the output so far.
+    """
+
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse the first JSON value in an LLM response, fixing common formatting mistakes.
+
+    Handles code fences, prose before or after the value, trailing commas, and values
+    cut off before their closing quotes, brackets or braces.
+
+    Args:
+        text (str): The raw model output.
+
+    Returns:
+        Any: The parsed value.
+
+    Raises:
+        ValueError: If no JSON value can be recovered.
+    """
+
+    text = _strip_code_fence(text)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("No JSON object or array in the response")
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text[min(starts):]:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if not stack or stack[-1] != char:
+                break
+            stack.pop()
+            out.append(char)
+            if not stack:
+                # End of the first value; anything after it is prose
+                break
+            continue
+        out.append(char)
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    _drop_trailing_comma(out)
+    # Cut after a key: the whitespace after the colon is in separate characters of out
+    if "".join(out).rstrip().endswith(":"):
+        out.append(" null")
+    out.extend(reversed(stack))
+
+    try:
+        return json.loads("".join(out))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Could not repair JSON: {e}") from e
+
+
+class RepairingJsonOutputParser(JsonOutputParser):
+    """
+    JsonOutputParser that repairs malformed output locally before giving up.
+
+    A parse failure normally makes the caller retry the whole LLM call; repairing
+    the response first avoids paying for the prompt again. Repair attempts are
+    reported to the tracing observers.
+    """
+
+    def parse_result(self, result, *, partial: bool = False) -> Any:
+        try:
+            return super().parse_result(result, partial=partial)
+        except OutputParserException as e:
+            if partial:
+                raise
+            try:
+                value = repair_json(result[0].text)
+            except ValueError:
+                record_repair(False)
+                raise e
+            record_repair(True)
+            return value
@@ -0,0 +1,144 @@
+from typing import Any, Dict, Iterable, List, Set
+from collections import defaultdict
+import difflib
+import json
+import re
+
+
+# Trailing words that do not change which entity a name refers to
+ENTITY_SUFFIXES = {"inc", "corp", "corporation", "co", "ltd", "llc", "ai", "company"}
+
+
+def normalize_entity(name: Any) -> str:
+    """
+    Normalize an entity name: lowercase, punctuation to spaces, no leading "the".
+    """
+
+    text = re.sub(r"[^\w\s]", " ", str(name).lower())
+    text = " ".join(text.split())
+    return text[4:] if text.startswith("the ") else text
+
+
+def entity_alias(normalized: str) -> str:
+    """
+    Strip trailing corporate suffixes, so "Upstage.AI" and "Upstage Inc." both alias "upstage".
+    """
+
+    tokens = normalized.split()
+    while len(tokens) > 1 and tokens[-1] in ENTITY_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def _value_texts(value: Any) -> Iterable[str]:
+    """
+    Yield the strings in a relation value, skipping source quotes.
+    """
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key != "source":
+                yield from _value_texts(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _value_texts(item)
+    elif value is not None:
+        yield str(value)
+
+
+class KGIndex:
+    """
+    Index over a knowledge graph dict ({entity: {relation: value}}) for per-claim slicing.
+
+    Entities are looked up by normalized name, by alias (without corporate suffixes),
+    by token containment ("Einstein" / "Albert Einstein") and by fuzzy match. Relation
+    values are indexed too, so an entity's incoming edges can be found.
+
+    Args:
+        kg (Dict[str, Any]): The knowledge graph.
+        fuzzy_cutoff (float): Minimum difflib similarity for a fuzzy entity match.
+    """
+
+    def __init__(self, kg: Dict[str, Any], fuzzy_cutoff: float = 0.85):
+        self.kg = kg
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.by_name: Dict[str, Set[str]] = defaultdict(set)
+        self.by_alias: Dict[str, Set[str]] = defaultdict(set)
+        self.by_token: Dict[str, Set[str]] = defaultdict(set)
+        # normalized value -> entities with a relation pointing at it
+        self.referrers: Dict[str, Set[str]] = defaultdict(set)
+
+        for entity, relations in kg.items():
+            name = normalize_entity(entity)
+            self.by_name[name].add(entity)
+            self.by_alias[entity_alias(name)].add(entity)
+            for token in name.split():
+                self.by_token[token].add(entity)
+            if isinstance(relations, dict):
+                for value in relations.values():
+                    for text in _value_texts(value):
+                        self.referrers[entity_alias(normalize_entity(text))].add(entity)
+
+    def find_entities(self, name: Any) -> Set[str]:
+        """
+        Return the KG entities matching a name, trying exact, alias, containment and fuzzy matches in turn.
+        """
+
+        normalized = normalize_entity(name)
+        if not normalized:
+            return set()
+        if normalized in self.by_name:
+            return set(self.by_name[normalized])
+
+        alias = entity_alias(normalized)
+        if alias in self.by_alias:
+            return set(self.by_alias[alias])
+
+        # Entities whose names contain every token of the query, or are contained in it
+        tokens = alias.split()
+        candidates = set.intersection(*(self.by_token.get(t, set()) for t in tokens))
+        for token in tokens:
+            for entity in self.by_token.get(token, ()):
+                if set(entity_alias(normalize_entity(entity)).split()) <= set(tokens):
+                    candidates.add(entity)
+        if candidates:
+            return candidates
+
+        matches = difflib.get_close_matches(
+            alias, list(self.by_alias), n=3, cutoff=self.fuzzy_cutoff
+        )
+        return {entity for match in matches for entity in self.by_alias[match]}
+
+    def neighborhood(self, facts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return the part of the KG around the claims' entities and values.
+
+        That is the relations of every entity matching a claim's entity or value, plus
+        the relations of entities pointing at them.
+
+        Args:
+            facts (List[Dict[str, Any]]): Claimed facts with "entity" and "value" keys.
+
+        Returns:
+            Dict[str, Any]: The subgraph, in the same format as the KG.
+        """
+
+        entities = set()
+        for fact in facts:
+            for name in (fact.get("entity"), fact.get("value")):
+                matched = self.find_entities(name)
+                entities |= matched
+                for entity in matched:
+                    entities |= self.referrers.get(
+                        entity_alias(normalize_entity(entity)), set()
+                    )
+                if name is not None:
+                    entities |= self.referrers.get(
+                        entity_alias(normalize_entity(name)), set()
+                    )
+
+        # Keep the KG's own entity order, so the serialization is deterministic
+        return {entity: self.kg[entity] for entity in self.kg if entity in entities}
+
+    def subgraph_str(self, facts: List[Dict[str, Any]]) -> str:
+        return json.dumps(self.neighborhood(facts), indent=2)
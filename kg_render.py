@@ -0,0 +1,197 @@
+"""
+Rendering of knowledge graphs as interactive vis.js (pyvis) HTML.
+
+The node and edge payload is built straight from the KG dict. Graphs with more
+than max_nodes nodes are sampled: the most connected entities are kept, and each
+entity shows at most max_values values, the rest collapsed into one "+N more"
+node. Large graphs get a static layout computed here, so the browser does not
+run the physics simulation. The HTML is cached by KG hash.
+"""
+
+from typing import Any, Dict, List, Tuple
+from collections import defaultdict
+import hashlib
+import json
+import math
+
+from kg_store import flatten_kg
+from llm_cache import MISSING, MemoryCache
+
+ENTITY_COLOR = "#97c2fc"
+VALUE_COLOR = "#b8e0a8"
+MORE_COLOR = "#888888"
+MAX_LABEL_CHARS = 40
+
+_html_cache = MemoryCache(max_entries=32)
+
+
+def kg_hash(kg: Dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(kg, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _label(value: Any) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return text if len(text) <= MAX_LABEL_CHARS else text[: MAX_LABEL_CHARS - 3] + "..."
+
+
+def kg_graph(
+    kg: Dict[str, Any], max_nodes: int = 300, max_values: int = 12
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Build vis.js nodes and edges for a KG dict.
+
+    Entities and values are nodes; each (entity, relation, value) triple is an edge
+    titled with the relation and its source quote. A value that is also an entity is
+    the same node.
+
+    Args:
+        kg (Dict[str, Any]): The knowledge graph.
+        max_nodes (int): Approximate maximum number of nodes. Less connected entities are left out beyond it.
+        max_values (int): Maximum number of values shown per entity; the rest become one "+N more" node.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: The nodes ({"id", "label", "title", "color",
+            "entity"}) and edges ({"from", "to", "title"}).
+    """
+
+    triples = defaultdict(list)
+    for entity, relation, value, source in flatten_kg(kg):
+        triples[entity].append((relation, value, source))
+
+    nodes: Dict[str, Dict[str, Any]] = {}
+    edges: List[Dict[str, Any]] = []
+
+    def add_node(node_id: str, value: Any, entity: bool) -> None:
+        node = nodes.get(node_id)
+        if node is None:
+            nodes[node_id] = {
+                "id": node_id,
+                "label": _label(value),
+                "title": node_id,
+                "color": ENTITY_COLOR if entity else VALUE_COLOR,
+                "entity": entity,
+            }
+        elif entity:
+            node["color"], node["entity"] = ENTITY_COLOR, True
+
+    # Most connected entities first, so sampling keeps the core of the graph
+    for entity in sorted(triples, key=lambda e: -len(triples[e])):
+        entity_triples = triples[entity]
+        shown = entity_triples[:max_values]
+        needed = 1 + len(shown) + (len(entity_triples) > max_values)
+        if nodes and len(nodes) + needed > max_nodes:
+            break
+        add_node(entity, entity, True)
+        for relation, value, source in shown:
+            value_id = value if isinstance(value, str) else json.dumps(value, default=str)
+            add_node(value_id, value, value_id in triples)
+            title = f"{relation}: {source}" if source else relation
+            edges.append({"from": entity, "to": value_id, "title": title})
+
+        hidden = entity_triples[max_values:]
+        if hidden:
+            more_id = f"{entity} (+{len(hidden)} more)"
+            nodes[more_id] = {
+                "id": more_id,
+                "label": f"+{len(hidden)} more",
+                "title": "\n".join(f"{r}: {_label(v)}" for r, v, _ in hidden),
+                "color": MORE_COLOR,
+                "entity": False,
+            }
+            edges.append({"from": entity, "to": more_id, "title": f"{len(hidden)} more relations"})
+
+    return list(nodes.values()), edges
+
+
+def static_layout(
+    nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], spacing: float = 160.0
+) -> Dict[str, Tuple[float, float]]:
+    """
+    Place entities on a sunflower spiral and each entity's own values on a ring around it.
+
+    Linear in the graph size, and deterministic, so the same KG always looks the same.
+
+    Returns:
+        Dict[str, Tuple[float, float]]: Position of each node id.
+    """
+
+    golden_angle = math.pi * (3 - math.sqrt(5))
+    leaves = defaultdict(list)
+    placed = {node["id"] for node in nodes if node["entity"]}
+    for edge in edges:
+        if edge["to"] not in placed:
+            placed.add(edge["to"])
+            leaves[edge["from"]].append(edge["to"])
+
+    positions = {}
+    entities = [node["id"] for node in nodes if node["entity"]]
+    for i, entity in enumerate(entities):
+        # Sunflower spiral: evenly spaced entities, wide enough apart for their rings
+        radius = spacing * math.sqrt(i) * 1.5
+        x, y = radius * math.cos(i * golden_angle), radius * math.sin(i * golden_angle)
+        positions[entity] = (x, y)
+        ring = leaves[entity]
+        ring_radius = spacing * (0.5 + len(ring) / 24)
+        for j, leaf in enumerate(ring):
+            angle = 2 * math.pi * j / len(ring)
+            positions[leaf] = (x + ring_radius * math.cos(angle), y + ring_radius * math.sin(angle))
+    return positions
+
+
+def kg_html(
+    kg: Dict[str, Any],
+    height: str = "500px",
+    max_nodes: int = 300,
+    max_values: int = 12,
+    physics_max_nodes: int = 100,
+) -> str:
+    """
+    Render a KG as pyvis HTML, cached by the KG's hash and the rendering options.
+
+    Args:
+        kg (Dict[str, Any]): The knowledge graph.
+        height (str): Height of the graph area.
+        max_nodes (int): Approximate maximum number of nodes drawn, see kg_graph().
+        max_values (int): Maximum number of values drawn per entity, see kg_graph().
+        physics_max_nodes (int): Larger graphs get a static layout instead of the browser's physics simulation.
+
+    Returns:
+        str: A standalone HTML page.
+    """
+
+    key = json.dumps([kg_hash(kg), height, max_nodes, max_values, physics_max_nodes])
+    html = _html_cache.get(key)
+    if html is not MISSING:
+        return html
+
+    # Imported here: only rendering needs pyvis
+    from pyvis.network import Network
+
+    nodes, edges = kg_graph(kg, max_nodes=max_nodes, max_values=max_values)
+    net = Network(
+        notebook=True,
+        width="100%",
+        height=height,
+        bgcolor="#222222",
+        font_color="white",
+    )
+    physics = len(nodes) <= physics_max_nodes
+    positions = {} if physics else static_layout(nodes, edges)
+    for node in nodes:
+        options = {"title": node["title"]}
+        if not physics:
+            options["x"], options["y"] = positions[node["id"]]
+            options["physics"] = False
+        net.add_node(node["id"], label=node["label"], color=node["color"], **options)
+    for edge in edges:
+        net.add_edge(edge["from"], edge["to"], title=edge["title"])
+    if physics:
+        net.repulsion(node_distance=200, spring_length=200)
+    else:
+        net.toggle_physics(False)
+
+    html = net.generate_html()
+    _html_cache.set(key, html)
+    return html
@@ -0,0 +1,255 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import sqlite3
+import threading
+import time
+
+from chunking import normalize_relation
+from kg_index import entity_alias, normalize_entity
+
+
+# text2kg groups whose keys are the relations themselves
+_GROUPS = {"attributes", "properties", "relationships", "relations"}
+
+
+def entity_key(name: Any) -> str:
+    return entity_alias(normalize_entity(name))
+
+
+def flatten_kg(kg: Dict[str, Any]) -> Iterator[Tuple[str, str, Any, Optional[str]]]:
+    """
+    Yield (entity, relation, value, source) triples from a KG dict.
+
+    Understands the build_kg format ({entity: {relation: {"value": ..., "source": ...}}})
+    and the nested text2kg format: the keys of "attributes"/"relationships" groups are
+    relations, other nested keys are joined with spaces, and {"name": ...} objects stand
+    for the named entity. List values give one triple per item.
+    """
+
+    def walk(entity: str, relation: str, value: Any) -> Iterator[Tuple[str, str, Any, Optional[str]]]:
+        if isinstance(value, dict) and "value" in value:
+            yield entity, relation, value["value"], value.get("source")
+        elif isinstance(value, dict) and "name" in value:
+            yield entity, relation, value["name"], value.get("source")
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                nested = key if relation.lower() in _GROUPS else f"{relation} {key}"
+                yield from walk(entity, nested, item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from walk(entity, relation, item)
+        elif value is not None:
+            yield entity, relation, value, None
+
+    for entity, relations in kg.items():
+        if not isinstance(relations, dict):
+            continue
+        for relation, value in relations.items():
+            yield from walk(str(entity), str(relation), value)
+
+
+def merge_kgs(*kgs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge KG dicts entity by entity; later KGs win for the same (entity, relation).
+    """
+
+    merged: Dict[str, Any] = {}
+    for kg in kgs:
+        for entity, relations in kg.items():
+            if isinstance(relations, dict) and isinstance(merged.get(entity), dict):
+                merged[entity] = {**merged[entity], **relations}
+            else:
+                merged[entity] = relations
+    return merged
+
+
+class KGStore:
+    """
+    Persistent knowledge graph shared across documents, stored in SQLite.
+
+    Triples are indexed by entity and by (entity, relation), on normalized keys:
+    entities are compared by alias (case, punctuation and corporate suffixes ignored),
+    relations by lowercased words. Each triple keeps its source quote, its origin
+    (e.g. the function that produced it) and when it was added.
+
+    Args:
+        path (str): Path of the SQLite database file. ":memory:" for a throwaway store.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS triples ("
+            "id INTEGER PRIMARY KEY, "
+            "entity TEXT NOT NULL, entity_key TEXT NOT NULL, "
+            "relation TEXT NOT NULL, relation_key TEXT NOT NULL, "
+            "value TEXT NOT NULL, value_key TEXT NOT NULL, "
+            "source TEXT, origin TEXT, created_at REAL NOT NULL, "
+            "UNIQUE (entity_key, relation_key, value_key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS triples_entity ON triples (entity_key)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS triples_entity_relation "
+            "ON triples (entity_key, relation_key)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS triples_value ON triples (value_key)"
+        )
+        self._conn.commit()
+
+    def add_kg(self, kg: Dict[str, Any], origin: Optional[str] = None) -> int:
+        """
+        Add the triples of a KG dict. Known triples get the new source if they had none.
+
+        Args:
+            kg (Dict[str, Any]): The knowledge graph, as returned by build_kg or text2kg.
+            origin (Optional[str]): Where the triples come from, stored as provenance.
+
+        Returns:
+            int: The number of new triples.
+        """
+
+        now = time.time()
+        rows = [
+            (
+                entity,
+                entity_key(entity),
+                relation,
+                normalize_relation(relation),
+                json.dumps(value),
+                normalize_entity(value),
+                source,
+                origin,
+                now,
+            )
+            for entity, relation, value, source in flatten_kg(kg)
+        ]
+        with self._lock:
+            before = self._count()
+            self._conn.executemany(
+                "INSERT INTO triples (entity, entity_key, relation, relation_key, value, "
+                "value_key, source, origin, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (entity_key, relation_key, value_key) DO UPDATE SET "
+                "source = COALESCE(triples.source, excluded.source) "
+                "WHERE triples.source IS NULL AND excluded.source IS NOT NULL",
+                rows,
+            )
+            self._conn.commit()
+            return self._count() - before
+
+    def triples(
+        self, entity: Any, relation: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the stored triples of an entity, optionally only for one relation.
+        """
+
+        query = (
+            "SELECT entity, relation, value, source, origin, created_at "
+            "FROM triples WHERE entity_key = ?"
+        )
+        params: Tuple = (entity_key(entity),)
+        if relation is not None:
+            query += " AND relation_key = ?"
+            params += (normalize_relation(relation),)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [
+            {
+                "entity": row[0],
+                "relation": row[1],
+                "value": json.loads(row[2]),
+                "source": row[3],
+                "origin": row[4],
+                "created_at": row[5],
+            }
+            for row in rows
+        ]
+
+    def covers(self, fact: Dict[str, Any]) -> bool:
+        """
+        Whether the store already knows the claim's entity with the claim's relation or value.
+        """
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM triples WHERE entity_key = ? "
+                "AND (relation_key = ? OR value_key = ?) LIMIT 1",
+                (
+                    entity_key(fact.get("entity", "")),
+                    normalize_relation(fact.get("relation", "")),
+                    normalize_entity(fact.get("value", "")),
+                ),
+            ).fetchone()
+        return row is not None
+
+    def subgraph(self, facts: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return the stored relations of the claims' entities and values, in the build_kg format.
+
+        A relation with several values maps to a list of {"value", "source"} dicts.
+        """
+
+        keys = set()
+        for fact in facts:
+            for name in (fact.get("entity"), fact.get("value")):
+                if name is not None:
+                    keys.add(entity_key(name))
+        if not keys:
+            return {}
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entity, relation, value, source FROM triples "
+                f"WHERE entity_key IN ({', '.join('?' * len(keys))}) ORDER BY id",
+                tuple(keys),
+            ).fetchall()
+
+        kg: Dict[str, Dict[str, Any]] = {}
+        for entity, relation, value, source in rows:
+            item = {"value": json.loads(value), "source": source}
+            relations = kg.setdefault(entity, {})
+            if relation not in relations:
+                relations[relation] = item
+            elif isinstance(relations[relation], list):
+                relations[relation].append(item)
+            else:
+                relations[relation] = [relations[relation], item]
+        return kg
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+
+_kg_store: Optional[KGStore] = None
+
+
+def set_kg_store(store: Optional[KGStore]) -> None:
+    """
+    Set the store build_kg and text2kg write into, and fc() looks claims up in. None disables it.
+    """
+
+    global _kg_store
+    _kg_store = store
+
+
+def get_kg_store() -> Optional[KGStore]:
+    return _kg_store
+
+
+def store_kg(kg: Any, origin: str, store: Optional[KGStore] = None) -> None:
+    """
+    Write a freshly built KG into the given store, or the one set with set_kg_store().
+    """
+
+    store = store if store is not None else _kg_store
+    if store is not None and isinstance(kg, dict):
+        store.add_kg(kg, origin=origin)
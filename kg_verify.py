@@ -0,0 +1,308 @@
+"""
+Deterministic verification of claims against the knowledge graph.
+
+A claim is decided locally when the KG has the claim's entity and relation, and the
+stored value either matches the claimed one or clearly contradicts it. Values are
+compared after normalization: case and whitespace for text, numbers with thousands
+separators, scale words ("3.2 billion") and units ("$", "%", "km"), and dates in
+ISO or written form compared at the precision of the claim. Anything else (no
+match in the KG, text that merely differs, numbers that differ only by rounding)
+is left to the LLM.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import re
+
+from chunking import normalize_relation
+from kg_index import KGIndex, entity_alias, normalize_entity
+
+TRUE_CONFIDENCE = 0.95
+FALSE_CONFIDENCE = 0.9
+
+MONTHS = {
+    name: i + 1
+    for i, names in enumerate(
+        [
+            ("january", "jan"),
+            ("february", "feb"),
+            ("march", "mar"),
+            ("april", "apr"),
+            ("may",),
+            ("june", "jun"),
+            ("july", "jul"),
+            ("august", "aug"),
+            ("september", "sep", "sept"),
+            ("october", "oct"),
+            ("november", "nov"),
+            ("december", "dec"),
+        ]
+    )
+    for name in names
+}
+
+SCALES = {
+    "thousand": 1e3,
+    "k": 1e3,
+    "million": 1e6,
+    "mn": 1e6,
+    "m": 1e6,
+    "billion": 1e9,
+    "bn": 1e9,
+    "b": 1e9,
+    "trillion": 1e12,
+    "tn": 1e12,
+}
+
+UNITS = {
+    "$": "usd",
+    "usd": "usd",
+    "dollar": "usd",
+    "dollars": "usd",
+    "€": "eur",
+    "eur": "eur",
+    "euro": "eur",
+    "euros": "eur",
+    "£": "gbp",
+    "gbp": "gbp",
+    "₩": "krw",
+    "krw": "krw",
+    "won": "krw",
+    "%": "percent",
+    "percent": "percent",
+    "km": "km",
+    "kilometers": "km",
+    "kilometres": "km",
+    "kg": "kg",
+    "kilograms": "kg",
+}
+
+# Relation words that do not change what a relation means: articles and auxiliaries.
+# Prepositions stay, they give the direction: "acquired" is not "acquired by".
+RELATION_STOPWORDS = {
+    "a", "an", "the", "is", "was", "are", "were", "be", "been", "has", "had", "have",
+}
+
+_DATE_ISO = re.compile(r"^(\d{4})-(\d{1,2})(?:-(\d{1,2}))?$")
+_DATE_WORDS = re.compile(
+    r"^(?:(\d{1,2})\s+([a-z]+)|([a-z]+)(?:\s+(\d{1,2}))?)\s*,?\s+(\d{4})$"
+)
+_QUANTITY = re.compile(
+    r"^(?P<pre>[$€£₩])?\s*(?P<num>-?\d[\d,]*(?:\.\d+)?)\s*(?P<scale>[a-z]+)?\s*(?P<unit>%|[a-z]+)?$"
+)
+
+Value = Tuple[Any, ...]
+
+
+def _parse_date(text: str) -> Optional[Value]:
+    match = _DATE_ISO.match(text)
+    if match:
+        year, month, day = match.groups()
+        return ("date", int(year), int(month), int(day) if day else None)
+    match = _DATE_WORDS.match(text)
+    if match:
+        day1, month1, month2, day2, year = match.groups()
+        month = MONTHS.get(month1 or month2)
+        if month is None:
+            return None
+        day = day1 or day2
+        return ("date", int(year), month, int(day) if day else None)
+    return None
+
+
+def _parse_quantity(text: str) -> Optional[Value]:
+    match = _QUANTITY.match(text)
+    if not match:
+        return None
+    scale, unit = match.group("scale"), match.group("unit")
+    if scale is not None and scale not in SCALES:
+        # e.g. "32 sports": the word is the unit
+        scale, unit = None, scale if unit is None else None
+        if unit is None:
+            return None
+    if unit is not None and unit not in UNITS and not re.fullmatch(r"[a-z]+", unit):
+        return None
+    mantissa = match.group("num").replace(",", "")
+    decimals = len(mantissa.split(".")[1]) if "." in mantissa else 0
+    factor = SCALES.get(scale, 1.0)
+    number = float(mantissa) * factor
+    unit = UNITS.get(match.group("pre") or unit, unit)
+    if unit is None and factor == 1.0 and decimals == 0 and 1000 <= number <= 2999:
+        # A bare four digit number in a claim is nearly always a year
+        return ("date", int(number), None, None)
+    # The smallest step the claim's wording can express
+    return ("quantity", number, unit, factor * 10 ** -decimals)
+
+
+def parse_value(value: Any) -> Value:
+    """
+    Parse a claimed or stored value into ("date", year, month, day),
+    ("quantity", number, unit, precision) or ("text", normalized text).
+    """
+
+    if isinstance(value, bool):
+        return ("text", str(value).lower())
+    if isinstance(value, (int, float)):
+        value = repr(value) if isinstance(value, float) else str(value)
+    # "over 200" or "about $3 billion" stay text: they only match the same wording
+    text = " ".join(str(value).lower().split())
+    return _parse_date(text) or _parse_quantity(text) or ("text", entity_alias(normalize_entity(text)))
+
+
+def compare_values(claimed: Any, stored: Any) -> Optional[bool]:
+    """
+    Compare a claimed value with a value from the KG.
+
+    Returns:
+        Optional[bool]: True if they match, False if they clearly contradict each other,
+            None if it cannot be decided without reading the evidence.
+    """
+
+    a, b = parse_value(claimed), parse_value(stored)
+    if a[0] != b[0]:
+        return None
+
+    if a[0] == "text":
+        return True if a[1] and a[1] == b[1] else None
+
+    if a[0] == "date":
+        # Compare at the precision of the claim: "2024" matches "2024-07-26"
+        for claimed_part, stored_part in zip(a[1:], b[1:]):
+            if claimed_part is None:
+                return True
+            if stored_part is None:
+                return None
+            if claimed_part != stored_part:
+                return False
+        return True
+
+    _, number, unit, precision = a
+    _, stored_number, stored_unit, _ = b
+    if unit != stored_unit:
+        return None
+    if abs(number - stored_number) <= 1e-9 * max(abs(number), abs(stored_number), 1.0):
+        return True
+    if abs(number - stored_number) <= precision / 2:
+        # "3 billion" for 3.2 billion: rounded, not necessarily wrong
+        return None
+    return False
+
+
+def relation_tokens(relation: Any) -> List[str]:
+    """
+    The words of a relation in order, crudely stemmed, without articles and
+    auxiliaries: "foundedIn" and "was founded in" both give ["found", "in"].
+    """
+
+    spaced = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", str(relation))
+    tokens = []
+    for word in normalize_relation(spaced).replace("_", " ").split():
+        if word in RELATION_STOPWORDS:
+            continue
+        for suffix in ("ing", "ed", "s"):
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[: -len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+
+def relation_words(relation: Any) -> frozenset:
+    """
+    The set of relation_tokens(): "foundedIn", "founded in" and "was founded in" all
+    give {"found", "in"}, while "acquired" and "acquired by" stay apart.
+    """
+
+    return frozenset(relation_tokens(relation))
+
+
+def _stored_values(value: Any) -> Iterable[Tuple[Any, Optional[str]]]:
+    """
+    Yield (value, source quote) pairs from a KG relation value.
+    """
+
+    if isinstance(value, dict):
+        if "value" in value:
+            yield from (
+                (item, source or value.get("source"))
+                for item, source in _stored_values(value["value"])
+            )
+        elif "name" in value:
+            yield value["name"], value.get("source")
+    elif isinstance(value, list):
+        for item in value:
+            yield from _stored_values(item)
+    elif value is not None:
+        yield value, None
+
+
+def _explanation(entity: str, relation: str, value: Any, source: Optional[str], match: bool) -> str:
+    stated = f"The knowledge graph states {entity} {relation} {value}"
+    if source:
+        stated += f' (source: "{source}")'
+    return stated + ("." if match else ", which contradicts the claim.")
+
+
+class KGVerifier:
+    """
+    Decides claims that the knowledge graph settles on its own.
+
+    Args:
+        kg (Dict[str, Any]): The knowledge graph, as built by build_kg or returned by KGStore.subgraph.
+    """
+
+    def __init__(self, kg: Dict[str, Any]):
+        self.kg = kg if isinstance(kg, dict) else {}
+        self.index = KGIndex(self.kg)
+
+    def verify(self, fact: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Return a verification result for a claim, or None if it needs the LLM.
+
+        A claim is true if a matching relation of a matching entity has the claimed
+        value, and false if the only value stored for it clearly contradicts the claim.
+        The result has the usual status, confidence and explanation, plus the
+        "provenance" quote of the deciding KG entry.
+        """
+
+        if not isinstance(fact, dict) or "value" not in fact:
+            return None
+        words = relation_words(fact.get("relation", ""))
+        if not words:
+            return None
+
+        # Only exact name or alias matches: a fuzzy match is no ground for a verdict
+        name = normalize_entity(fact.get("entity", ""))
+        entities = self.index.by_name.get(name) or self.index.by_alias.get(entity_alias(name), ())
+
+        candidates = []
+        for entity in entities:
+            relations = self.kg.get(entity)
+            if not isinstance(relations, dict):
+                continue
+            for relation, value in relations.items():
+                if relation_words(relation) == words:
+                    candidates.extend(
+                        (entity, relation, stored, source)
+                        for stored, source in _stored_values(value)
+                    )
+
+        outcomes = [compare_values(fact["value"], c[2]) for c in candidates]
+        for candidate, outcome in zip(candidates, outcomes):
+            if outcome is True:
+                return self._result("true", TRUE_CONFIDENCE, candidate, True)
+        if len(candidates) == 1 and outcomes[0] is False:
+            return self._result("false", FALSE_CONFIDENCE, candidates[0], False)
+        return None
+
+    @staticmethod
+    def _result(status: str, confidence: float, candidate: Tuple, match: bool) -> Dict[str, Any]:
+        entity, relation, value, source = candidate
+        return {
+            "status": status,
+            "confidence": confidence,
+            "explanation": _explanation(entity, relation, value, source, match),
+            "provenance": source,
+        }
+
+    def verify_all(self, facts: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        return [self.verify(fact) for fact in facts]
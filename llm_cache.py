@@ -0,0 +1,248 @@
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+# Sentinel returned by the cache tiers on a miss, since None can be a cached value
+MISSING = object()
+
+
+class MemoryCache:
+    """
+    In-memory LRU cache with optional TTL.
+
+    Args:
+        max_entries (int): Maximum number of entries kept; the least recently used entry is evicted first.
+        ttl (Optional[float]): Time to live of an entry in seconds. None keeps entries until evicted.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if self.ttl is None or time.time() - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key: str, value: Any, created_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (created_at or time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache stored in a SQLite database, with optional TTL.
+
+    Values must be JSON serializable.
+
+    Args:
+        path (str): Path of the SQLite database file.
+        max_entries (int): Maximum number of entries kept; the least recently used entries are evicted first.
+        ttl (Optional[float]): Time to live of an entry in seconds. None keeps entries until evicted.
+    """
+
+    def __init__(
+        self, path: str, max_entries: int = 100_000, ttl: Optional[float] = None
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is not None:
+                value, created_at = row
+                if self.ttl is None or now - created_at < self.ttl:
+                    self._conn.execute(
+                        "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+                    )
+                    self._conn.commit()
+                    self.hits += 1
+                    return json.loads(value)
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            return MISSING
+
+    def get_created_at(self, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM results: an in-memory LRU in front of an optional SQLite database.
+
+    Args:
+        max_entries (int): Maximum number of entries in the in-memory tier.
+        ttl (Optional[float]): Time to live of an entry in seconds, for both tiers.
+        path (Optional[str]): Path of the SQLite database. None disables the on-disk tier.
+        disk_max_entries (int): Maximum number of entries in the on-disk tier.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ):
+        self.memory = MemoryCache(max_entries=max_entries, ttl=ttl)
+        self.disk = (
+            SQLiteCache(path, max_entries=disk_max_entries, ttl=ttl) if path else None
+        )
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is MISSING and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISSING:
+                # Promote to the memory tier, keeping the original age for the TTL
+                self.memory.set(key, value, created_at=self.disk.get_created_at(key))
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit/miss counters. A lookup that misses memory but hits disk counts as one hit.
+        """
+
+        disk_hits = self.disk.hits if self.disk is not None else 0
+        lookups = self.memory.hits + self.memory.misses
+        return {
+            "hits": self.memory.hits + disk_hits,
+            "misses": lookups - self.memory.hits - disk_hits,
+            "memory_hits": self.memory.hits,
+            "disk_hits": disk_hits,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+        }
+
+
+_llm_cache: Optional[LLMCache] = None
+
+
+def set_llm_cache(cache: Optional[LLMCache]) -> None:
+    """
+    Set the cache used by the fact-checking and structuring functions. None disables caching.
+    """
+
+    global _llm_cache
+    _llm_cache = cache
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    return _llm_cache
+
+
+def llm_string(llm: Any) -> str:
+    """
+    Describe a model and its generation parameters, for use in cache keys.
+    """
+
+    if hasattr(llm, "_get_llm_string"):
+        # Includes the model name and its generation parameters
+        return llm._get_llm_string()
+    return repr(llm)
+
+
+def cache_key(llm_str: str, prompt_value: Any, output_parser: Any) -> str:
+    """
+    Build a content-addressed key from the model string, the rendered prompt and the parser.
+    """
+
+    messages = [
+        {"type": message.type, "content": message.content}
+        for message in prompt_value.to_messages()
+    ]
+
+    payload = json.dumps(
+        {
+            "llm": llm_str,
+            "messages": messages,
+            "parser": type(output_parser).__name__,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
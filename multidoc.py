@@ -0,0 +1,150 @@
+"""
+Fact checking of several related texts with shared search and knowledge graphs.
+
+fc_batch() extracts the claims of every text, groups them into topics by entity,
+and searches and builds a knowledge graph once per topic. Each distinct claim is
+verified once against its topic's evidence, and the verdicts are mapped back to
+the texts that made the claim. Searches and KG builds grow with the number of
+topics in the batch, not with the number of texts.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from canonical import canonical_key, canonicalize_facts
+from chunking import dedupe, parallel_map
+from clients import get_llm, get_search_tool
+from fc import (
+    add_fact_check_to_text,
+    build_kg,
+    claim_str,
+    extracted_claimed_facts,
+    format_verification,
+    lookup_kg_store,
+    raw_verdict,
+    search_context,
+    verify_facts,
+)
+from kg_store import KGStore, entity_key, get_kg_store, merge_kgs
+
+
+def cluster_facts(facts: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Group claims into topics: claims about the same entity share a topic, and so do
+    claims whose value is an entity another claim is about.
+
+    Entities are compared by alias, so "Upstage" and "Upstage.AI" are one topic.
+
+    Args:
+        facts (List[Dict[str, Any]]): The claimed facts.
+
+    Returns:
+        List[List[int]]: The indices of the facts in each topic, topics in order of first appearance.
+    """
+
+    parent: Dict[str, str] = {}
+
+    def find(key: str) -> str:
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    keys = [entity_key(fact.get("entity", "")) for fact in facts]
+    for key in keys:
+        parent.setdefault(key, key)
+    for key, fact in zip(keys, facts):
+        value_key = entity_key(fact.get("value", ""))
+        if value_key in parent:
+            parent[find(value_key)] = find(key)
+
+    topics: Dict[str, List[int]] = {}
+    for i, key in enumerate(keys):
+        topics.setdefault(find(key), []).append(i)
+    return list(topics.values())
+
+
+def fc_batch(
+    texts: List[str],
+    confidence_threshold: float = 0.7,
+    llm: Any = None,
+    search_tool: Any = None,
+    max_concurrency: int = 4,
+    chunk_size: Optional[int] = None,
+    search_mode: str = "keywords",
+    max_context_tokens: Optional[int] = None,
+    kg_store: Optional[KGStore] = None,
+    **verify_kwargs: Any,
+) -> List[Tuple[Dict[str, Dict[str, Any]], str]]:
+    """
+    Fact-check several texts about related events, sharing search and KG work between them.
+
+    Claims are extracted from every text, canonicalized, de-duplicated across texts and grouped into
+    topics with cluster_facts(). Each topic gets one search, one knowledge graph and one
+    verification of each of its distinct claims; topics are processed in parallel.
+
+    Args:
+        texts (List[str]): The texts to check.
+        confidence_threshold (float): The confidence threshold for the fact checking.
+        llm (Any): The language model to use. Defaults to the shared client.
+        search_tool (Any): The search tool to use. Defaults to the shared DuckDuckGo tool.
+        max_concurrency (int): Maximum number of texts extracted, or topics processed, at the same time.
+        chunk_size (Optional[int]): Extraction chunk size, see extracted_claimed_facts().
+        search_mode (str): How each topic is searched, see search_context().
+        max_context_tokens (Optional[int]): Token budget of each topic's ranked context, see search_context().
+        kg_store (Optional[KGStore]): Persistent KG to look claims up in and add the topic graphs to.
+            Defaults to the one set with set_kg_store().
+        **verify_kwargs: Further arguments for verify_facts(), e.g. batch_size or kg_fast_path.
+
+    Returns:
+        List[Tuple[Dict[str, Dict[str, Any]], str]]: For each text, in input order, the verified
+            facts and the fact-checked text, as returned by fc().
+    """
+
+    if llm is None:
+        llm = get_llm()
+    if search_tool is None:
+        search_tool = get_search_tool()
+    if kg_store is None:
+        kg_store = get_kg_store()
+
+    def extract(text):
+        facts = extracted_claimed_facts(text, llm, chunk_size=chunk_size)
+        return canonicalize_facts(facts) if isinstance(facts, list) else []
+
+    doc_facts = parallel_map(extract, texts, max_concurrency)
+    claims = dedupe((fact for facts in doc_facts for fact in facts), canonical_key)
+
+    def check_topic(topic):
+        facts = [claims[i] for i in topic]
+        stored_kg, new_facts = lookup_kg_store(facts, kg_store, None)
+        context, kg = "", {}
+        if new_facts:
+            # The claims' own sources stand in for the text in the keyword prompt
+            text = "\n".join(dict.fromkeys(fact.get("source") or claim_str(fact) for fact in new_facts))
+            context = search_context(
+                text,
+                new_facts,
+                search_tool,
+                llm,
+                search_mode=search_mode,
+                max_context_tokens=max_context_tokens,
+            )
+            kg = build_kg(new_facts, context, llm, kg_store=kg_store)
+        kg = merge_kgs(stored_kg, kg)
+        # Keep the model's own status; each text's threshold is applied below
+        results = verify_facts(facts, context, kg, 0.0, llm, **verify_kwargs)
+        return list(zip(facts, results.values()))
+
+    verdicts = {}
+    for topic_results in parallel_map(check_topic, cluster_facts(claims), max_concurrency):
+        for fact, result in topic_results:
+            verdicts[canonical_key(fact)] = raw_verdict(result)
+
+    checked = []
+    for text, facts in zip(texts, doc_facts):
+        verified_facts = {
+            str(i): format_verification(fact, verdicts[canonical_key(fact)], confidence_threshold)
+            for i, fact in enumerate(facts)
+        }
+        checked.append((verified_facts, add_fact_check_to_text(text, verified_facts, llm)))
+    return checked
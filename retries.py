@@ -0,0 +1,290 @@
+from typing import Any, Callable, Optional
+from email.utils import parsedate_to_datetime
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+
+from tenacity import AsyncRetrying, Retrying, retry_if_exception
+
+from tracing import record_retry
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying besides 5xx: request timeout and rate limiting
+RETRYABLE_STATUSES = {408, 429}
+
+# Client library errors that are not OSErrors are recognized by name,
+# e.g. httpx.ConnectError, httpx.ReadTimeout or openai.APIConnectionError
+_TRANSPORT_ERROR_NAMES = ("Timeout", "Connection", "Connect", "Transport")
+
+
+def status_code(exception: BaseException) -> Optional[int]:
+    code = getattr(exception, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exception, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after(exception: BaseException) -> Optional[float]:
+    """
+    Return the seconds to wait requested by the provider, from a retry_after attribute
+    or the Retry-After / Retry-After-Ms headers of the error's HTTP response.
+    """
+
+    seconds = getattr(exception, "retry_after", None)
+    if isinstance(seconds, (int, float)):
+        return float(seconds)
+
+    headers = getattr(getattr(exception, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP date
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_parse_error(exception: BaseException) -> bool:
+    # JSONDecodeError and langchain's OutputParserException are ValueErrors,
+    # as are the validation errors raised while parsing model responses here
+    return isinstance(exception, ValueError) and status_code(exception) is None
+
+
+def is_transport_error(exception: BaseException) -> bool:
+    if isinstance(exception, (OSError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return any(
+        name in cls.__name__
+        for cls in type(exception).__mro__
+        for name in _TRANSPORT_ERROR_NAMES
+    )
+
+
+def is_retryable(exception: BaseException) -> bool:
+    """
+    Retry transport errors, timeouts, 429 and 5xx responses, and malformed responses.
+    Anything else (client errors, or bugs such as a KeyError on an unexpected result) fails at once.
+    """
+
+    code = status_code(exception)
+    if code is not None:
+        return code in RETRYABLE_STATUSES or code >= 500
+    return is_parse_error(exception) or is_transport_error(exception)
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter, safe to share between threads and asyncio tasks.
+
+    Args:
+        rate (float): Tokens (requests) added per second.
+        capacity (Optional[float]): Maximum burst size. Defaults to max(1, rate).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """
+        Take tokens, possibly going into debt, and return how long the caller must wait.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1.0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold every caller for the given time, e.g. after the provider asked to retry later.
+        """
+
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RetryPolicy:
+    """
+    Retry policy shared by every LLM-calling function.
+
+    Transport errors (timeouts, 5xx, 429) back off exponentially with jitter, and
+    wait at least as long as the provider's Retry-After, which also pauses the
+    shared rate limiter. Parse errors (malformed JSON) are retried right away,
+    since waiting does not make the model answer better. Client errors such as
+    401 or 400, and any other exception, are not retried.
+
+    Args:
+        max_attempts (int): Maximum number of attempts on transport errors.
+        parse_attempts (int): Maximum number of attempts on parse errors.
+        initial_wait (float): Backoff before the first transport retry, in seconds.
+        max_wait (float): Maximum backoff, in seconds.
+        max_retry_after (float): Maximum Retry-After honored, in seconds.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        parse_attempts: int = 3,
+        initial_wait: float = 0.5,
+        max_wait: float = 20.0,
+        max_retry_after: float = 60.0,
+    ):
+        self.max_attempts = max_attempts
+        self.parse_attempts = parse_attempts
+        self.initial_wait = initial_wait
+        self.max_wait = max_wait
+        self.max_retry_after = max_retry_after
+
+    def backoff(self, failures: int) -> float:
+        """
+        Exponential backoff with "equal jitter": half fixed, half random.
+        """
+
+        backoff = min(self.max_wait, self.initial_wait * 2 ** (failures - 1))
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    @staticmethod
+    def _failures(retry_state: Any) -> int:
+        """
+        Count the failures of the last attempt's kind (parse or transport), once per attempt.
+        """
+
+        parse = is_parse_error(retry_state.outcome.exception())
+        counts = retry_state.__dict__.setdefault("failures", {"parse": 0, "transport": 0})
+        if retry_state.__dict__.get("counted_attempt") != retry_state.attempt_number:
+            retry_state.counted_attempt = retry_state.attempt_number
+            counts["parse" if parse else "transport"] += 1
+        return counts["parse" if parse else "transport"]
+
+    def stop(self, retry_state: Any) -> bool:
+        failures = self._failures(retry_state)
+        if is_parse_error(retry_state.outcome.exception()):
+            return failures >= self.parse_attempts
+        return failures >= self.max_attempts
+
+    def wait(self, retry_state: Any) -> float:
+        failures = self._failures(retry_state)
+        exception = retry_state.outcome.exception()
+        if is_parse_error(exception):
+            return 0.0
+
+        wait = self.backoff(failures)
+        requested = retry_after(exception)
+        if requested is not None:
+            requested = min(requested, self.max_retry_after)
+            limiter = get_rate_limiter()
+            if limiter is not None:
+                limiter.pause(requested)
+            wait = max(wait, requested)
+        return wait
+
+    def retrying_kwargs(self) -> dict:
+        return {
+            "stop": self.stop,
+            "wait": self.wait,
+            "retry": retry_if_exception(is_retryable),
+            "before_sleep": _before_sleep,
+            "reraise": True,
+        }
+
+
+def _before_sleep(retry_state: Any) -> None:
+    logger.warning(
+        "Retrying %s in %.2f seconds as it raised %r (attempt %d)",
+        getattr(retry_state.fn, "__qualname__", retry_state.fn),
+        retry_state.next_action.sleep,
+        retry_state.outcome.exception(),
+        retry_state.attempt_number,
+    )
+    record_retry(retry_state)
+
+
+_retry_policy = RetryPolicy()
+_rate_limiter: Optional[TokenBucket] = None
+
+
+def set_retry_policy(policy: RetryPolicy) -> None:
+    global _retry_policy
+    _retry_policy = policy
+
+
+def get_retry_policy() -> RetryPolicy:
+    return _retry_policy
+
+
+def set_rate_limiter(limiter: Optional[TokenBucket]) -> None:
+    """
+    Set the rate limiter applied to every LLM call, or None for no limit.
+    """
+
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+def get_rate_limiter() -> Optional[TokenBucket]:
+    return _rate_limiter
+
+
+def limit_rate() -> None:
+    if _rate_limiter is not None:
+        _rate_limiter.acquire()
+
+
+async def alimit_rate() -> None:
+    if _rate_limiter is not None:
+        await _rate_limiter.aacquire()
+
+
+def with_retries(fn: Callable) -> Callable:
+    """
+    Decorator retrying a function, sync or async, under the current retry policy.
+
+    The policy is read at call time, so set_retry_policy() applies to already
+    decorated functions.
+    """
+
+    if asyncio.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            retrying = AsyncRetrying(**_retry_policy.retrying_kwargs())
+            return await retrying(fn, *args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        retrying = Retrying(**_retry_policy.retrying_kwargs())
+        return retrying(fn, *args, **kwargs)
+
+    return wrapper
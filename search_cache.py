@@ -0,0 +1,119 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+import re
+
+from llm_cache import MISSING, MemoryCache, SQLiteCache
+from tracing import record_cache
+
+
+# DuckDuckGoSearchResults formats each result as "snippet: ..., title: ..., link: ...",
+# optionally wrapped in brackets, and joins the results with ", "
+_SNIPPET_START = re.compile(r"(?:^|,\s*|\n)(?=\[?snippet: )")
+_LINK = re.compile(r"link: (\S+?)\]?$")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a search query to its sorted set of lowercase keywords.
+
+    "Upstage CEO, upstage ceo" and "CEO Upstage" both normalize to "ceo upstage".
+    """
+
+    return " ".join(sorted(set(re.findall(r"\w+", query.lower()))))
+
+
+def split_snippets(results: str) -> List[str]:
+    """
+    Split a search tool result string into individual result snippets.
+
+    Strings that are not in the DuckDuckGoSearchResults format are returned as a single snippet.
+    """
+
+    snippets = [s.strip().rstrip(",").strip() for s in _SNIPPET_START.split(results)]
+    return [s for s in snippets if s]
+
+
+def dedupe_snippets(snippets: Iterable[str], seen: Optional[Set[str]] = None) -> List[str]:
+    """
+    Drop repeated snippets, identified by their link or by their normalized text.
+
+    Args:
+        snippets (Iterable[str]): The snippets to de-duplicate.
+        seen (Optional[Set[str]]): Keys of snippets already kept elsewhere; updated in place.
+
+    Returns:
+        List[str]: The snippets in their original order, without repeats.
+    """
+
+    seen = set() if seen is None else seen
+    unique = []
+    for snippet in snippets:
+        link = _LINK.search(snippet)
+        key = link.group(1) if link else " ".join(snippet.lower().split())
+        if key not in seen:
+            seen.add(key)
+            unique.append(snippet)
+    return unique
+
+
+def merge_search_results(results: Iterable[str]) -> str:
+    """
+    Merge several search result strings into one, without repeated snippets.
+    """
+
+    seen = set()
+    snippets = []
+    for result in results:
+        if result:
+            snippets.extend(dedupe_snippets(split_snippets(result), seen))
+    return "\n".join(snippets)
+
+
+class CachedSearch:
+    """
+    Caching, de-duplicating wrapper around a search tool such as DuckDuckGoSearchResults.
+
+    Results are cached under the normalized keyword set of the query, so reordered
+    or repeated keywords reuse the same search. Repeated snippets are removed
+    before the result is cached and returned.
+
+    Args:
+        search_tool (Any): The search tool to wrap; must provide run() and, for async use, arun().
+        ttl (Optional[float]): Time to live of a cached result in seconds. None keeps results until evicted.
+        max_entries (int): Maximum number of results kept in memory.
+        path (Optional[str]): Path of a SQLite database to persist results to. None keeps them in memory only.
+    """
+
+    def __init__(
+        self,
+        search_tool: Any,
+        ttl: Optional[float] = 3600,
+        max_entries: int = 1024,
+        path: Optional[str] = None,
+    ):
+        self.search_tool = search_tool
+        self.cache = (
+            SQLiteCache(path, max_entries=max_entries, ttl=ttl)
+            if path
+            else MemoryCache(max_entries=max_entries, ttl=ttl)
+        )
+
+    def run(self, query: str) -> str:
+        key = normalize_query(query)
+        result = self.cache.get(key)
+        record_cache("search", result is not MISSING)
+        if result is MISSING:
+            result = merge_search_results([self.search_tool.run(query)])
+            self.cache.set(key, result)
+        return result
+
+    async def arun(self, query: str) -> str:
+        key = normalize_query(query)
+        result = self.cache.get(key)
+        record_cache("search", result is not MISSING)
+        if result is MISSING:
+            result = merge_search_results([await self.search_tool.arun(query)])
+            self.cache.set(key, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.cache.hits, "misses": self.cache.misses}
@@ -0,0 +1,152 @@
+from typing import Any, Callable, List, Optional
+import asyncio
+import queue
+
+from chunking import parallel_map
+from evidence import BM25, estimate_tokens
+from search_cache import dedupe_snippets, split_snippets
+
+
+class SearchPool:
+    """
+    Runs many searches in parallel through a bounded pool of search clients.
+
+    Any object with run() and, for async use, arun() works as a backend: the
+    DuckDuckGo tool, a CachedSearch, or a client for another search API. With a
+    factory, the pool creates up to size clients on demand and lends each to one
+    search at a time, so clients holding an HTTP session or connection are reused
+    but never shared between concurrent searches. Without one, all searches go
+    through the single search_tool.
+
+    A SearchPool is itself a search tool, and can be passed wherever one is expected.
+
+    Args:
+        search_tool (Any): The search backend shared by all searches. Ignored if factory is given.
+        size (int): Maximum number of searches in flight, and of clients created by the factory.
+        factory (Optional[Callable[[], Any]]): Creates a new search client.
+    """
+
+    def __init__(
+        self,
+        search_tool: Any = None,
+        size: int = 4,
+        factory: Optional[Callable[[], Any]] = None,
+    ):
+        if search_tool is None and factory is None:
+            raise ValueError("SearchPool needs a search_tool or a factory")
+        self.search_tool = search_tool
+        self.size = max(1, size)
+        self.factory = factory
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+
+    def _acquire(self) -> Any:
+        if self.factory is None:
+            return self.search_tool
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.factory()
+
+    def _release(self, client: Any) -> None:
+        if self.factory is not None and self._idle.qsize() < self.size:
+            self._idle.put(client)
+
+    def run(self, query: str) -> str:
+        client = self._acquire()
+        try:
+            return client.run(query)
+        finally:
+            self._release(client)
+
+    async def arun(self, query: str) -> str:
+        client = self._acquire()
+        try:
+            return await client.arun(query)
+        finally:
+            self._release(client)
+
+    def run_many(self, queries: List[str]) -> List[str]:
+        """
+        Run the queries in parallel, at most size at a time. Results keep the query order.
+        """
+
+        return parallel_map(self.run, queries, self.size)
+
+    async def arun_many(self, queries: List[str]) -> List[str]:
+        """
+        Async version of run_many().
+        """
+
+        semaphore = asyncio.Semaphore(self.size)
+
+        async def search(query):
+            async with semaphore:
+                return await self.arun(query)
+
+        return list(await asyncio.gather(*[search(query) for query in queries]))
+
+
+def rank_results(
+    results: List[str], claims: List[str], max_tokens: Optional[int] = None
+) -> str:
+    """
+    Merge search results into one context, ranked by relevance to the claims.
+
+    Snippets are de-duplicated and ranked with BM25 against each claim. The context
+    takes each claim's best remaining snippet in turn, so every claim gets evidence
+    before any claim gets a second snippet, until the token budget is used up.
+    Snippets matching no claim come last.
+
+    Args:
+        results (List[str]): Search result strings, e.g. one per query.
+        claims (List[str]): The claims the context is for, e.g. "entity relation value".
+        max_tokens (Optional[int]): Approximate token budget of the context. None keeps every snippet.
+
+    Returns:
+        str: The selected snippets, one per line, best first.
+    """
+
+    seen = set()
+    snippets = []
+    for result in results:
+        if result:
+            snippets.extend(dedupe_snippets(split_snippets(result), seen))
+    if not snippets:
+        return ""
+
+    index = BM25(snippets)
+    rankings = []
+    for claim in claims:
+        scores = index.scores(claim)
+        rankings.append(
+            sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: -scores[i])
+        )
+    # Then everything else, in search order
+    rankings.append(list(range(len(snippets))))
+
+    order = []
+    chosen = set()
+    depth = 0
+    while len(chosen) < len(snippets):
+        for ranking in rankings:
+            while depth < len(ranking) and ranking[depth] in chosen:
+                # Already taken for another claim: this claim's next best moves up
+                ranking.pop(depth)
+            if depth < len(ranking):
+                chosen.add(ranking[depth])
+                order.append(ranking[depth])
+        depth += 1
+
+    selected = []
+    used = 0
+    for i in order:
+        tokens = estimate_tokens(snippets[i])
+        if max_tokens is not None and used + tokens > max_tokens:
+            if selected:
+                continue
+            # Keep at least the best snippet, cut to the budget
+            selected.append(snippets[i][: max_tokens * 4])
+            break
+        selected.append(snippets[i])
+        used += tokens
+    return "\n".join(selected)
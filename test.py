@@ -1,23 +1,125 @@
-
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
+
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from annotate import annotate_text, attach_spans
+from batch import Checkpoint, run_batch
+from canonical import (
+    VerdictMemo,
+    canonical_key,
+    canonicalize_facts,
+    set_entity_aliases,
+    set_verdict_memo,
+)
+from chains import get_chain
+from chunking import chunk_spans, dedupe_facts
+from clients import get_llm, get_search_tool
+from evidence import EvidenceSelector
+from fakes import (
+    FakeChat,
+    FakeSearch,
+    classify_prompt,
+    make_document,
+    pipeline_response,
+)
 from fc import (
+    add_fact_check_to_text,
+    afc,
+    aiter_verify_facts,
+    apply_confidence_threshold,
+    averify_facts,
+    build_kg,
     extracted_claimed_facts,
+    fc,
+    iter_verify_facts,
     search_context,
-    build_kg,
+    stream_fact_check_to_text,
     verify_facts,
-    add_fact_check_to_text,
-    Chat,
-    DuckDuckGoSearchResults,
-    MODEL_NAME,
 )
-import json
-from langchain.schema import AIMessage
+from incremental import VerdictCache, fc_incremental
+from json_repair import repair_json
+from kg_index import KGIndex
+from kg_render import kg_graph, kg_html, static_layout
+from kg_store import KGStore
+from kg_verify import KGVerifier, compare_values
+from llm_cache import LLMCache, MemoryCache, MISSING, set_llm_cache
+from multidoc import cluster_facts, fc_batch
+from retries import (
+    RetryPolicy,
+    TokenBucket,
+    set_rate_limiter,
+    set_retry_policy,
+    with_retries,
+)
+from search_cache import CachedSearch, merge_search_results
+from search_pool import SearchPool, rank_results
+from tracing import MetricsCollector, observe
+from un2structured import text2kg, text2kvpairs, text2questions_v2
+
+
+EINSTEIN_CONTEXT = "Albert Einstein, born in 1879, was a renowned physicist. He published his theory of general relativity in 1915, which revolutionized our understanding of gravity. Einstein's work on the photoelectric effect earned him the Nobel Prize in Physics in 1921."
+
+
+def einstein_response(prompt):
+    """
+    FakeChat responder answering the Einstein examples of TestFactChecking.
+    """
+
+    stage = classify_prompt(prompt)
+    if stage == "extract":
+        return json.dumps([
+            {"entity": "Albert Einstein", "relation": "developed", "value": "theory of relativity"},
+            {"entity": "theory of relativity", "relation": "developed in", "value": "1915"},
+            {"entity": "Albert Einstein", "relation": "born in", "value": "1879"},
+            {"entity": "Albert Einstein", "relation": "born in", "value": "Ulm, Germany"},
+        ])
+    if stage == "keywords":
+        return "Albert Einstein, theory of relativity, 1915"
+    if stage == "build_kg":
+        return json.dumps({
+            "Albert Einstein": {
+                "born in": {"value": "1879", "source": "Albert Einstein, born in 1879, was a renowned physicist."},
+                "developed": {"value": "theory of general relativity", "source": "He published his theory of general relativity in 1915"},
+            },
+        })
+    if stage == "verify":
+        return '{"status": "true", "confidence": 0.9, "explanation": "The context states it."}'
+    return pipeline_response(prompt)
+
+
+class EinsteinSearch(FakeSearch):
+
+    def _results(self, query):
+        self.queries.append(query)
+        return f"snippet: {EINSTEIN_CONTEXT}, title: Albert Einstein, link: https://example.com/einstein"
+
 
 class TestFactChecking(unittest.TestCase):
+    """
+    Offline by default; set FC_LIVE_TESTS=1 to run against the real model and DuckDuckGo.
+    """
 
     def setUp(self):
-        self.llm = Chat(model=MODEL_NAME)
-        self.ddg_search = DuckDuckGoSearchResults()
+        if os.environ.get("FC_LIVE_TESTS"):
+            self.llm = get_llm()
+            self.ddg_search = get_search_tool()
+        else:
+            self.llm = FakeChat(responder=einstein_response)
+            self.ddg_search = EinsteinSearch()
 
     def test_extracted_claimed_facts(self):
         test_text = "Albert Einstein developed the theory of relativity in 1915. He was born in Ulm, Germany in 1879."
@@ -84,7 +186,7 @@ class TestFactChecking(unittest.TestCase):
             },
             {"entity": "theory of relativity", "relation": "developed in", "value": "1915"},
         ]
-        context = "Albert Einstein, born in 1879, was a renowned physicist. He published his theory of general relativity in 1915, which revolutionized our understanding of gravity. Einstein's work on the photoelectric effect earned him the Nobel Prize in Physics in 1921."
+        context = EINSTEIN_CONTEXT
 
         kg = build_kg(claimed_facts, context, self.llm)
 
@@ -116,7 +218,7 @@ class TestFactChecking(unittest.TestCase):
             {"entity": "theory of relativity", "relation": "developed in", "value": "1915"},
             {"entity": "Albert Einstein", "relation": "born in", "value": "1879"},
         ]
-        context = "Albert Einstein, born in 1879, was a renowned physicist. He published his theory of general relativity in 1915, which revolutionized our understanding of gravity. Einstein's work on the photoelectric effect earned him the Nobel Prize in Physics in 1921."
+        context = EINSTEIN_CONTEXT
         kg = {
             "Albert Einstein": {
                 "born in": {
@@ -151,14 +253,15 @@ class TestFactChecking(unittest.TestCase):
                              "Should have results for at most all claimed facts")
 
         for fact_id, result in verified_facts.items():
-            self.assertIn("verified", result, "Each result should have a 'verified' field")
+            self.assertIn("status", result, "Each result should have a 'status' field")
             self.assertIn("confidence", result, "Each result should have a 'confidence' field")
             self.assertIn("explanation", result, "Each result should have an 'explanation' field")
-            self.assertIsInstance(result["verified"], bool, "'verified' should be a boolean")
+            self.assertIn(result["status"], {"true", "false", "probably true", "probably false", "not sure"})
             self.assertIsInstance(result["confidence"], float, "'confidence' should be a float")
             self.assertIsInstance(result["explanation"], str, "'explanation' should be a string")
-            self.assertGreaterEqual(result["confidence"], confidence_threshold,
-                                    f"Confidence for fact {fact_id} should be above the threshold")
+            if result["status"] != "not sure":
+                self.assertGreaterEqual(result["confidence"], confidence_threshold,
+                                        f"Confidence for fact {fact_id} should be above the threshold")
 
         print("All checks passed!")
 
@@ -209,5 +312,1457 @@ class TestFactChecking(unittest.TestCase):
 
         print("All assertions passed!")
 
+
+class TestConcurrentVerification(unittest.TestCase):
+
+    def test_verify_facts_concurrent_keeps_order(self):
+        claimed_facts = [
+            {"entity": f"Entity{i}", "relation": "has value", "value": str(i)}
+            for i in range(8)
+        ]
+        lock = threading.Lock()
+        running = {"now": 0, "peak": 0}
+
+        def fake_llm(prompt_value):
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            prompt_text = prompt_value.to_string()
+            i = int(prompt_text.split("Claimed Fact: Entity")[1].split(" ")[0])
+            # Later facts finish first, so completion order differs from fact order
+            time.sleep(0.01 * (8 - i))
+            with lock:
+                running["now"] -= 1
+            return json.dumps(
+                {"status": "true", "confidence": 0.9, "explanation": f"fact {i}"}
+            )
+
+        verified_facts = verify_facts(
+            claimed_facts, "", {}, 0.7, RunnableLambda(fake_llm), max_concurrency=4
+        )
+
+        self.assertEqual(list(verified_facts.keys()), [str(i) for i in range(8)])
+        for i in range(8):
+            self.assertEqual(verified_facts[str(i)]["claimed"], f"Entity{i} has value {i}")
+            self.assertEqual(verified_facts[str(i)]["explanation"], f"fact {i}")
+        self.assertGreater(running["peak"], 1, "Facts should be verified concurrently")
+        self.assertLessEqual(running["peak"], 4, "Concurrency limit should be respected")
+
+    def test_verify_facts_concurrent_retries_per_fact(self):
+        claimed_facts = [
+            {"entity": "Entity0", "relation": "is", "value": "flaky"},
+            {"entity": "Entity1", "relation": "is", "value": "fine"},
+        ]
+        attempts = {"flaky": 0}
+
+        def fake_llm(prompt_value):
+            if "Entity0 is flaky" in prompt_value.to_string():
+                attempts["flaky"] += 1
+                if attempts["flaky"] < 3:
+                    return "not json"
+            return '{"status": "true", "confidence": 0.9, "explanation": "ok"}'
+
+        verified_facts = verify_facts(
+            claimed_facts, "", {}, 0.7, RunnableLambda(fake_llm), max_concurrency=2
+        )
+
+        self.assertEqual(attempts["flaky"], 3)
+        self.assertEqual(verified_facts["0"]["status"], "true")
+        self.assertEqual(verified_facts["1"]["status"], "true")
+
+
+class TestBatchedVerification(unittest.TestCase):
+
+    claimed_facts = [
+        {"entity": f"Entity{i}", "relation": "has value", "value": str(i)}
+        for i in range(5)
+    ]
+
+    def test_verify_facts_batched(self):
+        calls = []
+
+        def fake_llm(prompt_value):
+            prompt_text = prompt_value.to_string()
+            calls.append(prompt_text)
+            ids = re.findall(r"^\[(\d+)\] Entity", prompt_text, re.MULTILINE)
+            return json.dumps(
+                [
+                    {"id": i, "status": "true", "confidence": 0.9, "explanation": f"fact {i}"}
+                    for i in ids
+                ]
+            )
+
+        verified_facts = verify_facts(
+            self.claimed_facts, "", {}, 0.7, RunnableLambda(fake_llm), batch_size=2
+        )
+
+        self.assertEqual(len(calls), 3, "5 facts in batches of 2 should take 3 calls")
+        self.assertEqual(list(verified_facts.keys()), [str(i) for i in range(5)])
+        for i in range(5):
+            self.assertEqual(
+                verified_facts[str(i)],
+                {
+                    "claimed": f"Entity{i} has value {i}",
+                    "status": "true",
+                    "confidence": 0.9,
+                    "explanation": f"fact {i}",
+                },
+            )
+
+    def test_verify_facts_batched_falls_back_on_malformed_batch(self):
+        single_calls = []
+
+        def fake_llm(prompt_value):
+            prompt_text = prompt_value.to_string()
+            if "Claimed Facts:" in prompt_text:
+                # Only the first fact of the batch gets a usable entry
+                return '[{"id": "0", "status": "false", "confidence": 0.8, "explanation": "batched"}, {"id": "1"}]'
+            single_calls.append(prompt_text)
+            return '{"status": "true", "confidence": 0.9, "explanation": "single"}'
+
+        verified_facts = verify_facts(
+            self.claimed_facts[:3], "", {}, 0.7, RunnableLambda(fake_llm), batch_size=3
+        )
+
+        self.assertEqual(len(single_calls), 2)
+        self.assertEqual(verified_facts["0"]["explanation"], "batched")
+        self.assertEqual(verified_facts["0"]["status"], "false")
+        self.assertEqual(verified_facts["1"]["explanation"], "single")
+        self.assertEqual(verified_facts["2"]["explanation"], "single")
+
+    def _throttled_llm(self, errors):
+        calls = {"batch": 0, "single": 0}
+
+        def fake_llm(prompt_value):
+            prompt_text = prompt_value.to_string()
+            if "Claimed Facts:" not in prompt_text:
+                calls["single"] += 1
+                return '{"status": "true", "confidence": 0.9, "explanation": "single"}'
+            calls["batch"] += 1
+            if calls["batch"] <= len(errors):
+                raise errors[calls["batch"] - 1]
+            ids = re.findall(r"^\[(\d+)\] Entity", prompt_text, re.MULTILINE)
+            return json.dumps(
+                [{"id": i, "status": "true", "confidence": 0.9, "explanation": "batched"} for i in ids]
+            )
+
+        return RunnableLambda(fake_llm), calls
+
+    def test_throttled_batch_is_retried_not_fanned_out(self):
+        set_retry_policy(RetryPolicy(initial_wait=0))
+        self.addCleanup(set_retry_policy, RetryPolicy())
+
+        llm, calls = self._throttled_llm([ProviderError(429)])
+        verified_facts = verify_facts(self.claimed_facts, "", {}, 0.7, llm, batch_size=5)
+        self.assertEqual(calls, {"batch": 2, "single": 0})
+        self.assertEqual(verified_facts["4"]["explanation"], "batched")
+
+        llm, calls = self._throttled_llm([ProviderError(429)])
+        verified_facts = asyncio.run(
+            averify_facts(self.claimed_facts, "", {}, 0.7, llm, batch_size=5)
+        )
+        self.assertEqual(calls, {"batch": 2, "single": 0})
+        self.assertEqual(verified_facts["4"]["explanation"], "batched")
+
+    def test_batch_client_error_is_raised(self):
+        llm, calls = self._throttled_llm([ProviderError(401)])
+        with self.assertRaises(ProviderError):
+            verify_facts(self.claimed_facts, "", {}, 0.7, llm, batch_size=5)
+        self.assertEqual(calls, {"batch": 1, "single": 0})
+
+        llm, calls = self._throttled_llm([ProviderError(401)])
+        with self.assertRaises(ProviderError):
+            asyncio.run(averify_facts(self.claimed_facts, "", {}, 0.7, llm, batch_size=5))
+        self.assertEqual(calls, {"batch": 1, "single": 0})
+
+
+class TestAsyncPipeline(unittest.TestCase):
+
+    def test_afc(self):
+        searches = {"running": 0, "peak": 0}
+
+        def fake_llm(prompt_input):
+            prompt_text = (
+                prompt_input.to_string()
+                if hasattr(prompt_input, "to_string")
+                else str(prompt_input)
+            )
+            if "extract facts" in prompt_text:
+                content = json.dumps(
+                    [{"entity": "Upstage", "relation": "founded in", "value": "2020"},
+                     {"entity": "Upstage", "relation": "based in", "value": "Seoul"}]
+                )
+            elif "search keywords" in prompt_text:
+                content = "Upstage founded, Upstage headquarters"
+            elif "Construct the knowledge graph" in prompt_text:
+                content = '{"Upstage": {"founded in": {"value": "2020", "source": "Upstage was founded in 2020"}}}'
+            elif "Claimed Fact:" in prompt_text:
+                content = '{"status": "true", "confidence": 0.9, "explanation": "ok"}'
+            else:
+                content = "Upstage was founded in 2020 [Fact: True (Confidence: 0.90) - ok]"
+            return AIMessage(content=content)
+
+        class FakeSearch:
+            async def arun(self, query):
+                searches["running"] += 1
+                searches["peak"] = max(searches["peak"], searches["running"])
+                await asyncio.sleep(0.01)
+                searches["running"] -= 1
+                return f"result for {query}"
+
+        verified_facts, fact_checked_text = asyncio.run(
+            afc(
+                "Upstage was founded in 2020 and is based in Seoul.",
+                llm=RunnableLambda(fake_llm),
+                search_tool=FakeSearch(),
+            )
+        )
+
+        self.assertEqual(searches["peak"], 2, "Keyword searches should run in parallel")
+        self.assertEqual(list(verified_facts.keys()), ["0", "1"])
+        self.assertEqual(verified_facts["0"]["claimed"], "Upstage founded in 2020")
+        self.assertEqual(verified_facts["1"]["status"], "true")
+        self.assertIn("[Fact: True", fact_checked_text)
+
+
+class TestLLMCache(unittest.TestCase):
+
+    def tearDown(self):
+        set_llm_cache(None)
+
+    def test_memory_cache_lru_and_ttl(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)  # evicts "b", the least recently used
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("c"), 3)
+
+        expired = MemoryCache(ttl=0)
+        expired.set("a", 1)
+        self.assertIs(expired.get("a"), MISSING)
+
+    def test_disk_tier_survives_new_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "llm_cache.sqlite")
+            LLMCache(path=path).set("key", [{"entity": "A"}])
+
+            cache = LLMCache(path=path)
+            self.assertEqual(cache.get("key"), [{"entity": "A"}])
+            self.assertEqual(cache.get("key"), [{"entity": "A"}])
+            self.assertIs(cache.get("other"), MISSING)
+            stats = cache.stats()
+            self.assertEqual(stats["disk_hits"], 1)
+            self.assertEqual(stats["memory_hits"], 1)
+            self.assertEqual(stats["hits"], 2)
+            self.assertEqual(stats["misses"], 1)
+
+    def test_repeated_extraction_hits_cache(self):
+        calls = []
+
+        def fake_llm(prompt_value):
+            calls.append(prompt_value)
+            return '[{"entity": "Upstage", "relation": "CEO", "value": "Sung Kim"}]'
+
+        llm = RunnableLambda(fake_llm)
+        cache = LLMCache()
+        set_llm_cache(cache)
+
+        first = extracted_claimed_facts("Sung Kim is CEO of Upstage.", llm)
+        second = extracted_claimed_facts("Sung Kim is CEO of Upstage.", llm)
+        extracted_claimed_facts("Lucy Park is CPO of Upstage.", llm)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def test_cached_search_normalizes_keywords(self):
+        queries = []
+
+        class FakeSearch:
+            def run(self, query):
+                queries.append(query)
+                return "snippet: Sung Kim is CEO, title: Upstage, link: https://upstage.ai"
+
+        search = CachedSearch(FakeSearch())
+        first = search.run("Upstage CEO Sung Kim")
+        second = search.run("sung kim, upstage ceo")
+
+        self.assertEqual(first, second)
+        self.assertEqual(queries, ["Upstage CEO Sung Kim"])
+        self.assertEqual(search.stats(), {"hits": 1, "misses": 1})
+
+    def test_merge_search_results_drops_repeated_snippets(self):
+        merged = merge_search_results(
+            [
+                "snippet: Sung Kim is CEO, title: Upstage, link: https://upstage.ai, "
+                "snippet: Lucy Park is CPO, title: Team, link: https://upstage.ai/team",
+                "snippet: Sung Kim is CEO, title: Upstage, link: https://upstage.ai",
+            ]
+        )
+
+        self.assertEqual(
+            merged.splitlines(),
+            [
+                "snippet: Sung Kim is CEO, title: Upstage, link: https://upstage.ai",
+                "snippet: Lucy Park is CPO, title: Team, link: https://upstage.ai/team",
+            ],
+        )
+
+
+class TestBatch(unittest.TestCase):
+
+    @staticmethod
+    def fake_llm(prompt_input):
+        prompt_text = (
+            prompt_input.to_string() if hasattr(prompt_input, "to_string") else str(prompt_input)
+        )
+        if "extract facts" in prompt_text:
+            content = '[{"entity": "Upstage", "relation": "is", "value": "a company"}]'
+        elif "Claimed Fact:" in prompt_text:
+            content = '{"status": "true", "confidence": 0.9, "explanation": "ok"}'
+        else:
+            content = "annotated"
+        return AIMessage(content=content)
+
+    def test_run_batch_resumes_from_checkpoint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, "docs.jsonl")
+            output_path = os.path.join(tmp_dir, "results.jsonl")
+            checkpoint_path = os.path.join(tmp_dir, "results.jsonl.checkpoint")
+            with open(input_path, "w") as f:
+                for i in range(5):
+                    f.write(json.dumps({"id": f"doc{i}", "text": f"Text {i}"}) + "\n")
+
+            # A previous run finished lines 0, 1 and 3 before crashing
+            checkpoint = Checkpoint(checkpoint_path)
+            for line_no in (0, 1, 3):
+                checkpoint.mark_done(line_no)
+            checkpoint.save()
+
+            counts = asyncio.run(
+                run_batch(
+                    input_path,
+                    output_path,
+                    checkpoint_path=checkpoint_path,
+                    max_concurrency=2,
+                    llm=RunnableLambda(self.fake_llm),
+                    context="",
+                    kg={},
+                )
+            )
+
+            with open(output_path) as f:
+                results = [json.loads(line) for line in f]
+
+            self.assertEqual(counts, {"processed": 2, "failed": 0, "skipped": 3})
+            self.assertEqual(sorted(r["id"] for r in results), ["doc2", "doc4"])
+            self.assertEqual(results[0]["verified_facts"]["0"]["status"], "true")
+            self.assertEqual(Checkpoint(checkpoint_path).next_line, 5)
+
+    def test_slow_record_bounds_checkpoint(self):
+        async def afake_llm(prompt_input):
+            # The first record takes as long as all the others together
+            if "Text 0" in str(prompt_input):
+                await asyncio.sleep(0.3)
+            return self.fake_llm(prompt_input)
+
+        sizes = []
+        mark_done = Checkpoint.mark_done
+
+        def record_size(checkpoint, line_no):
+            mark_done(checkpoint, line_no)
+            sizes.append(len(checkpoint.done))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, "docs.jsonl")
+            output_path = os.path.join(tmp_dir, "results.jsonl")
+            with open(input_path, "w") as f:
+                for i in range(40):
+                    f.write(json.dumps({"id": f"doc{i}", "text": f"Text {i}"}) + "\n")
+
+            with unittest.mock.patch.object(Checkpoint, "mark_done", record_size):
+                counts = asyncio.run(
+                    run_batch(
+                        input_path,
+                        output_path,
+                        max_concurrency=4,
+                        window=8,
+                        llm=RunnableLambda(self.fake_llm, afunc=afake_llm),
+                        context="",
+                        kg={},
+                    )
+                )
+
+        self.assertEqual(counts["processed"], 40)
+        self.assertLess(max(sizes), 8)
+
+
+class TestClients(unittest.TestCase):
+
+    def test_import_does_not_build_clients(self):
+        code = (
+            "import sys, fc, un2structured\n"
+            "assert 'langchain_upstage' not in sys.modules\n"
+            "assert 'langchain_community.tools' not in sys.modules"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_get_llm_shares_clients_per_config(self):
+        # Building a client needs a key, but makes no request
+        if not os.environ.get("UPSTAGE_API_KEY"):
+            self.enterContext(unittest.mock.patch.dict(os.environ, {"UPSTAGE_API_KEY": "dummy"}))
+        self.assertIs(get_llm(), get_llm())
+        self.assertIs(get_llm(temperature=0.0), get_llm(temperature=0.0))
+        self.assertIsNot(get_llm(), get_llm(temperature=0.0))
+
+
+class TestChainReuse(unittest.TestCase):
+
+    def test_chain_built_once_per_function_and_llm(self):
+        builds = []
+
+        def build_prompt():
+            builds.append(1)
+            return ChatPromptTemplate.from_messages([("human", "{text}")])
+
+        llm = RunnableLambda(lambda prompt_value: '{"ok": true}')
+        other_llm = RunnableLambda(lambda prompt_value: '{"ok": false}')
+
+        chain = get_chain("test_fn", llm, build_prompt)
+        self.assertIs(get_chain("test_fn", llm, build_prompt), chain)
+        self.assertEqual(chain.invoke({"text": "hi"}), {"ok": True})
+        self.assertEqual(len(builds), 1)
+
+        other_chain = get_chain("test_fn", other_llm, build_prompt)
+        self.assertIsNot(other_chain, chain)
+        self.assertEqual(other_chain.invoke({"text": "hi"}), {"ok": False})
+        self.assertEqual(len(builds), 2)
+
+
+class TestEvidenceSelection(unittest.TestCase):
+
+    context = (
+        "snippet: Sung Kim is the CEO of Upstage, title: Upstage team, link: https://a, "
+        "snippet: Upstage released the Solar model in 2023, title: Solar, link: https://b, "
+        "snippet: Lucy Park is the CPO of Upstage, title: Upstage team, link: https://c, "
+        "snippet: The weather in Seoul is sunny today, title: Weather, link: https://d"
+    )
+
+    def test_select_ranks_snippets_per_claim(self):
+        selector = EvidenceSelector(self.context, top_k=1)
+        self.assertIn("Sung Kim", selector.select("Upstage CEO Sung Kim"))
+        self.assertNotIn("Lucy Park", selector.select("Upstage CEO Sung Kim"))
+        self.assertIn("Lucy Park", selector.select("Lucy Park CPO"))
+        self.assertEqual(selector.select("Mars rover"), "")
+
+    def test_select_respects_token_budget(self):
+        selector = EvidenceSelector(self.context, token_budget=5)
+        evidence = selector.select("Upstage")
+        self.assertLessEqual(len(evidence), 20)
+        self.assertGreater(len(evidence), 0)
+
+    def test_verify_facts_sends_only_relevant_evidence(self):
+        prompts = []
+
+        def fake_llm(prompt_value):
+            prompts.append(prompt_value.to_string())
+            return '{"status": "true", "confidence": 0.9, "explanation": "ok"}'
+
+        claimed_facts = [
+            {"entity": "Sung Kim", "relation": "is CEO of", "value": "Upstage"},
+            {"entity": "Lucy Park", "relation": "is CPO of", "value": "Upstage"},
+        ]
+        verify_facts(
+            claimed_facts, self.context, {}, 0.7, RunnableLambda(fake_llm), evidence_top_k=1
+        )
+
+        context_sections = [p.split("Context:")[1] for p in prompts]
+        self.assertIn("Sung Kim", context_sections[0])
+        self.assertNotIn("weather", context_sections[0])
+        self.assertNotIn("Sung Kim", context_sections[1])
+        self.assertIn("Lucy Park", context_sections[1])
+
+
+class TestKGSlicing(unittest.TestCase):
+
+    kg = {
+        "Albert Einstein": {
+            "born in": {"value": "1879", "source": "Albert Einstein, born in 1879"},
+            "developed": {"value": "theory of general relativity", "source": "..."},
+        },
+        "theory of general relativity": {
+            "published in": {"value": "1915", "source": "..."},
+        },
+        "Upstage.AI": {
+            "CEO": {"value": "Sung Kim", "source": "Sung Kim is CEO of Upstage"},
+        },
+        "Sung Kim": {
+            "role": {"value": "CEO", "source": "..."},
+        },
+    }
+
+    def test_find_entities_with_aliases(self):
+        index = KGIndex(self.kg)
+        self.assertEqual(index.find_entities("the Upstage"), {"Upstage.AI"})
+        self.assertEqual(index.find_entities("Einstein"), {"Albert Einstein"})
+        self.assertEqual(index.find_entities("Albert Einstien"), {"Albert Einstein"})
+        self.assertEqual(index.find_entities("Marie Curie"), set())
+
+    def test_neighborhood_of_claim(self):
+        index = KGIndex(self.kg)
+
+        subgraph = index.neighborhood(
+            [{"entity": "Einstein", "relation": "developed", "value": "theory of relativity"}]
+        )
+        self.assertEqual(
+            list(subgraph), ["Albert Einstein", "theory of general relativity"]
+        )
+
+        # The value's entity and the entities pointing at it are included
+        subgraph = index.neighborhood(
+            [{"entity": "Upstage", "relation": "CEO", "value": "Sung Kim"}]
+        )
+        self.assertEqual(list(subgraph), ["Upstage.AI", "Sung Kim"])
+
+    def test_verify_facts_with_kg_slicing(self):
+        prompts = []
+
+        def fake_llm(prompt_value):
+            prompts.append(prompt_value.to_string())
+            return '{"status": "true", "confidence": 0.9, "explanation": "ok"}'
+
+        verify_facts(
+            [{"entity": "Upstage", "relation": "CEO", "value": "Sung Kim"}],
+            "",
+            self.kg,
+            0.7,
+            RunnableLambda(fake_llm),
+            kg_slicing=True,
+        )
+
+        kg_section = prompts[0].split("Knowledge Graph:")[1].split("Context:")[0]
+        self.assertIn("Upstage.AI", kg_section)
+        self.assertNotIn("Einstein", kg_section)
+
+
+class TestOfflinePipeline(unittest.TestCase):
+
+    def test_fc_with_fakes(self):
+        llm = FakeChat()
+        search = FakeSearch()
+        verified_facts, checked_text = fc(
+            make_document(4), llm=llm, search_tool=search, batch_size=2
+        )
+
+        self.assertEqual(len(verified_facts), 4)
+        self.assertTrue(all(v["status"] == "true" for v in verified_facts.values()))
+        self.assertIn("[Fact: True", checked_text)
+        self.assertEqual(len(search.queries), 1)
+
+        stats = llm.stage_stats()
+        self.assertEqual(stats["extract"]["calls"], 1)
+        self.assertEqual(stats["verify_batch"]["calls"], 2)
+        self.assertGreater(stats["verify_batch"]["prompt_tokens"], 0)
+
+    def test_un2structured_with_fakes(self):
+        llm = FakeChat()
+        text = make_document(2)
+        kv_pairs = text2kvpairs(text, llm)
+        kg = text2kg(text, kv_pairs, llm)
+
+        self.assertEqual(len(kv_pairs), 2)
+        self.assertEqual(kg["Company1"]["attributes"]["yearFounded"], 1901)
+        self.assertEqual(set(llm.stage_stats()), {"text2kvpairs", "text2kg"})
+
+    def test_fake_latency(self):
+        llm = FakeChat(latency=0.05)
+        start = time.perf_counter()
+        asyncio.run(
+            afc(make_document(4), llm=llm, search_tool=FakeSearch(), max_concurrency=4)
+        )
+        # extract, keywords, kg, annotate in sequence; the four verifications overlap
+        self.assertLess(time.perf_counter() - start, 0.05 * 8)
+
+
+class TestTracing(unittest.TestCase):
+
+    def test_stage_metrics(self):
+        metrics = MetricsCollector()
+        llm = FakeChat()
+        with observe(metrics):
+            fc(make_document(4), llm=llm, search_tool=FakeSearch(), max_concurrency=4)
+        stages = metrics.to_dict()
+
+        self.assertEqual(
+            set(stages), {"fc", "extract", "search", "build_kg", "verify", "annotate"}
+        )
+        # Calls made in verification worker threads are still attributed to "verify"
+        self.assertEqual(stages["verify"]["llm_calls"], 4)
+        self.assertEqual(
+            sum(stats["llm_calls"] for stats in stages.values()), len(llm.calls)
+        )
+        self.assertGreater(stages["extract"]["input_tokens"], 0)
+        self.assertGreater(stages["extract"]["output_tokens"], 0)
+        self.assertGreater(stages["fc"]["seconds"], stages["verify"]["seconds"])
+
+        prometheus = metrics.to_prometheus()
+        self.assertIn('fc_stage_llm_calls_total{stage="verify"} 4', prometheus)
+        self.assertEqual(json.loads(metrics.to_json())["verify"]["spans"], 1)
+
+    def test_async_stage_metrics(self):
+        metrics = MetricsCollector()
+        with observe(metrics):
+            asyncio.run(
+                afc(make_document(3), llm=FakeChat(), search_tool=FakeSearch())
+            )
+        self.assertEqual(metrics.to_dict()["verify"]["llm_calls"], 3)
+
+    def test_retries_and_cache_hits(self):
+        attempts = []
+
+        def flaky_llm(prompt_value):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("transient")
+            return '{"status": "true", "confidence": 0.9, "explanation": "ok"}'
+
+        facts = [{"entity": "Upstage", "relation": "CEO", "value": "Sung Kim"}]
+        metrics = MetricsCollector()
+        set_llm_cache(LLMCache())
+        set_retry_policy(RetryPolicy(initial_wait=0))
+        try:
+            with observe(metrics):
+                for _ in range(2):
+                    verify_facts(facts, "", {}, 0.7, RunnableLambda(flaky_llm))
+        finally:
+            set_llm_cache(None)
+            set_retry_policy(RetryPolicy())
+
+        verify = metrics.to_dict()["verify"]
+        self.assertEqual(verify["retries"], 1)
+        self.assertEqual(verify["cache_hits"], {"llm": 1})
+        self.assertEqual(verify["cache_misses"], {"llm": 2})
+
+    def test_fc_does_not_print(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            fc(make_document(2), llm=FakeChat(), search_tool=FakeSearch())
+        self.assertEqual(stdout.getvalue(), "")
+
+
+class ProviderError(Exception):
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def tearDown(self):
+        set_retry_policy(RetryPolicy())
+        set_rate_limiter(None)
+
+    def _flaky(self, errors):
+        calls = []
+
+        @with_retries
+        def call():
+            calls.append(time.perf_counter())
+            if len(calls) <= len(errors):
+                raise errors[len(calls) - 1]
+            return "ok"
+
+        return call, calls
+
+    def test_parse_errors_retry_immediately(self):
+        set_retry_policy(RetryPolicy(initial_wait=10, parse_attempts=3))
+        call, calls = self._flaky([json.JSONDecodeError("bad", "", 0)] * 2)
+        self.assertEqual(call(), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertLess(calls[-1] - calls[0], 1)
+
+        call, calls = self._flaky([ValueError("bad")] * 3)
+        with self.assertRaises(ValueError):
+            call()
+        self.assertEqual(len(calls), 3)
+
+    def test_transport_errors_back_off(self):
+        set_retry_policy(RetryPolicy(initial_wait=0.04, max_attempts=3))
+        call, calls = self._flaky([ConnectionError(), ProviderError(503)])
+        self.assertEqual(call(), "ok")
+        # equal jitter waits at least half the backoff: 0.02, then 0.04
+        self.assertGreaterEqual(calls[1] - calls[0], 0.02)
+        self.assertGreaterEqual(calls[2] - calls[1], 0.04)
+
+    def test_client_errors_are_not_retried(self):
+        call, calls = self._flaky([ProviderError(401)])
+        with self.assertRaises(ProviderError):
+            call()
+        self.assertEqual(len(calls), 1)
+
+    def test_only_transient_errors_are_retried(self):
+        set_retry_policy(RetryPolicy(initial_wait=0))
+        call, calls = self._flaky([KeyError("analysis")])
+        with self.assertRaises(KeyError):
+            call()
+        self.assertEqual(len(calls), 1)
+
+        call, calls = self._flaky([TimeoutError(), ProviderError(429), ProviderError(502)])
+        self.assertEqual(call(), "ok")
+        self.assertEqual(len(calls), 4)
+
+    def test_retries_do_not_nest(self):
+        set_retry_policy(RetryPolicy(initial_wait=0, max_attempts=4))
+
+        attempts = []
+
+        def down(prompt):
+            attempts.append(classify_prompt(prompt))
+            raise ConnectionError("down")
+
+        with self.assertRaises(ConnectionError):
+            text2questions_v2("What is Upstage?", FakeChat(responder=down))
+        # generate_prf_docs' own attempts, not multiplied by an outer retry
+        self.assertEqual(attempts, ["prf_docs"] * 4)
+
+    def test_retry_after_pauses_rate_limiter(self):
+        set_retry_policy(RetryPolicy(initial_wait=0))
+        limiter = TokenBucket(rate=1000)
+        set_rate_limiter(limiter)
+        call, calls = self._flaky([ProviderError(429, {"retry-after": "0.1"})])
+        self.assertEqual(call(), "ok")
+        self.assertGreaterEqual(calls[1] - calls[0], 0.1)
+        self.assertGreater(limiter.paused_until, 0)
+
+    def test_token_bucket_shared_by_threads(self):
+        limiter = TokenBucket(rate=50, capacity=1)
+        start = time.perf_counter()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # one token available up front, the other five at 50 per second
+        self.assertGreaterEqual(time.perf_counter() - start, 5 / 50 - 0.01)
+
+    def test_rate_limit_applies_to_llm_calls(self):
+        set_rate_limiter(TokenBucket(rate=50, capacity=1))
+        start = time.perf_counter()
+        fc(make_document(2), llm=FakeChat(), search_tool=FakeSearch())
+        # extract, keywords, build_kg and 2 verifications; annotation is local
+        self.assertGreaterEqual(time.perf_counter() - start, 4 / 50 - 0.01)
+
+
+class TestJsonRepair(unittest.TestCase):
+
+    def test_repair_json(self):
+        cases = [
+            ('```json\n{"a": 1}\n```', {"a": 1}),
+            ('Here you go: {"a": 1} Let me know if you need more.', {"a": 1}),
+            ('{"a": [1, 2,],}', {"a": [1, 2]}),
+            ('[{"id": 1}, {"id": 2', [{"id": 1}, {"id": 2}]),
+            ('{"a": "unterminated', {"a": "unterminated"}),
+            ('{"a": ', {"a": None}),
+            ('{"a": 1, "b":\n  ', {"a": 1, "b": None}),
+            ('{"a": "}, ]", "b": 2}', {"a": "}, ]", "b": 2}),
+        ]
+        for text, expected in cases:
+            self.assertEqual(repair_json(text), expected, text)
+
+        with self.assertRaises(ValueError):
+            repair_json("I could not verify this claim.")
+
+    def test_repair_avoids_llm_retry(self):
+        calls = []
+
+        def sloppy_llm(prompt_value):
+            calls.append(1)
+            return 'Result: {"status": "true", "confidence": 0.9, "explanation": "ok",} Done.'
+
+        metrics = MetricsCollector()
+        with observe(metrics):
+            verified = verify_facts(
+                [{"entity": "Upstage", "relation": "CEO", "value": "Sung Kim"}],
+                "",
+                {},
+                0.7,
+                RunnableLambda(sloppy_llm),
+            )
+
+        self.assertEqual(verified["0"]["status"], "true")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(metrics.to_dict()["verify"]["repairs"], 1)
+        self.assertEqual(metrics.to_dict()["verify"]["retries"], 0)
+
+
+class TestSpanAnnotation(unittest.TestCase):
+
+    text = "Sung Kim is CEO of Upstage.AI and Lucy Park is CPO of the company.\nHwalsuk Lee is a board member of Upstage.AI."
+
+    def test_attach_spans(self):
+        facts = attach_spans(
+            self.text,
+            [
+                {"entity": "Sung Kim", "relation": "CEO of", "value": "Upstage.AI", "source": "Sung Kim is CEO of Upstage.AI"},
+                # source with different case and spacing
+                {"entity": "Lucy Park", "relation": "CPO of", "value": "Upstage.AI", "source": "lucy park  is CPO"},
+                # no source: the best matching sentence
+                {"entity": "Hwalsuk Lee", "relation": "board member of", "value": "Upstage.AI"},
+                {"entity": "Someone Else", "relation": "is", "value": "unrelated"},
+            ],
+        )
+        spans = [fact["span"] for fact in facts]
+        self.assertEqual(self.text[slice(*spans[0])], "Sung Kim is CEO of Upstage.AI")
+        self.assertEqual(self.text[slice(*spans[1])], "Lucy Park is CPO")
+        self.assertEqual(
+            self.text[slice(*spans[2])], "Hwalsuk Lee is a board member of Upstage.AI."
+        )
+        self.assertIsNone(spans[3])
+
+    def test_annotate_text(self):
+        verified_facts = {
+            "0": {"claimed": "Sung Kim CEO of Upstage.AI", "status": "true", "confidence": 0.95,
+                  "explanation": "Confirmed by the company website. More details.", "span": [0, 29]},
+            "1": {"claimed": "Hwalsuk Lee board member of Upstage.AI", "status": "not sure",
+                  "confidence": 0.4, "explanation": "No source found.", "span": [68, 112]},
+        }
+        self.assertEqual(
+            annotate_text(self.text, verified_facts),
+            "Sung Kim is CEO of Upstage.AI [Fact: True (Confidence: 0.95) - Confirmed by the company website.]"
+            " and Lucy Park is CPO of the company.\n"
+            "Hwalsuk Lee is a board member of Upstage.AI [Fact: Unsure (Confidence: 0.40) - No source found.].",
+        )
+
+    def test_fc_annotates_without_llm(self):
+        llm = FakeChat()
+        verified_facts, checked_text = fc(make_document(3), llm=llm, search_tool=FakeSearch())
+
+        self.assertNotIn("annotate", llm.stage_stats())
+        self.assertTrue(all(result["span"] for result in verified_facts.values()))
+        self.assertIn(
+            "Company1 was founded in 1901 [Fact: True (Confidence: 0.90) - Supported by the context.].",
+            checked_text,
+        )
+
+
+class TestChunkedExtraction(unittest.TestCase):
+
+    def test_chunk_spans(self):
+        text = make_document(20)
+        chunks = chunk_spans(text, max_chars=200, overlap=1)
+
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], len(text))
+        for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+            self.assertLessEqual(end - start, 200)
+            # consecutive chunks share a sentence
+            self.assertLess(next_start, end)
+
+    def test_dedupe_facts(self):
+        facts = dedupe_facts(
+            [
+                {"entity": "Upstage.AI", "relation": "CEO", "value": "Sung Kim"},
+                {"entity": "upstage ai", "relation": "ceo", "value": "Sung  Kim"},
+                {"entity": "Upstage.AI", "relation": "CPO", "value": "Lucy Park"},
+            ]
+        )
+        self.assertEqual([fact["relation"] for fact in facts], ["CEO", "CPO"])
+
+    def test_chunked_extraction(self):
+        text = make_document(30)
+        llm = FakeChat()
+        facts = extracted_claimed_facts(text, llm, chunk_size=300, max_concurrency=4)
+
+        self.assertGreater(llm.stage_stats()["extract"]["calls"], 1)
+        self.assertEqual([fact["entity"] for fact in facts], [f"Company{i}" for i in range(30)])
+        for fact in facts:
+            self.assertEqual(text[slice(*fact["span"])], fact["source"])
+
+        kv_pairs = text2kvpairs(text, llm, chunk_size=300)
+        self.assertEqual(len(kv_pairs), 30)
+
+    def test_fc_extracts_chunks_in_parallel(self):
+        lock = threading.Lock()
+        in_flight, peak = [0], [0]
+
+        def responder(prompt):
+            if classify_prompt(prompt) != "extract":
+                return pipeline_response(prompt)
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.1)
+            with lock:
+                in_flight[0] -= 1
+            return pipeline_response(prompt)
+
+        llm = FakeChat(responder=responder)
+        verified, _ = fc(make_document(16), llm=llm, search_tool=FakeSearch(), chunk_size=120)
+        self.assertGreater(llm.stage_stats()["extract"]["calls"], 4)
+        self.assertEqual(len(verified), 16)
+        # the default extract_concurrency, although fc() verifies one fact at a time
+        self.assertEqual(peak[0], 4)
+
+    def test_async_chunked_extraction(self):
+        text = make_document(12)
+        facts = asyncio.run(
+            afc(text, llm=FakeChat(), search_tool=FakeSearch(), chunk_size=150)
+        )[0]
+        self.assertEqual(len(facts), 12)
+
+
+class TestIncrementalCheck(unittest.TestCase):
+
+    def test_only_changed_sentences_are_rechecked(self):
+        llm = FakeChat()
+        search = FakeSearch()
+        text = make_document(5)
+        verified, _, run = fc_incremental(
+            text, llm=llm, search_tool=search, verdict_cache=VerdictCache()
+        )
+        self.assertEqual(llm.stage_stats()["verify"]["calls"], 5)
+
+        llm.reset()
+        edited = text.replace("Company2 was founded in 1902.", "Company7 was founded in 1907.")
+        edited += " Company9 was founded in 1909."
+        verified, checked_text, run = fc_incremental(
+            edited, run, llm=llm, search_tool=search, verdict_cache=VerdictCache()
+        )
+
+        stats = llm.stage_stats()
+        # the replaced sentence and the appended one
+        self.assertEqual(stats["extract"]["calls"], 2)
+        self.assertEqual(stats["verify"]["calls"], 2)
+        self.assertEqual(
+            [result["claimed"] for result in verified.values()],
+            [f"Company{i} founded in {1900 + i}" for i in (0, 1, 7, 3, 4, 9)],
+        )
+        for result in verified.values():
+            self.assertEqual(edited[slice(*result["span"])], result["claimed"].replace("founded", "was founded"))
+        self.assertIn("Company9 was founded in 1909 [Fact: True", checked_text)
+
+        llm.reset()
+        again, _, _ = fc_incremental(
+            edited, run, llm=llm, search_tool=search, verdict_cache=VerdictCache()
+        )
+        self.assertEqual(llm.calls, [])
+        self.assertEqual(again, verified)
+
+    def test_new_facts_keep_earlier_relations(self):
+        llm = FakeChat()
+        text = make_document(2)
+        _, _, run = fc_incremental(text, llm=llm, search_tool=FakeSearch(), verdict_cache=VerdictCache())
+        run["kg"]["Company0"]["CEO"] = {"value": "Sung Kim", "source": "Sung Kim leads Company0"}
+
+        edited = text + " Company0 was founded in 1905."
+        _, _, run = fc_incremental(edited, run, llm=llm, search_tool=FakeSearch(), verdict_cache=VerdictCache())
+        self.assertEqual(run["kg"]["Company0"]["CEO"]["value"], "Sung Kim")
+        self.assertIn("founded in", run["kg"]["Company0"])
+
+    def test_threshold_applies_to_stored_verdicts(self):
+        llm = FakeChat()
+        text = make_document(2)
+        strict, _, run = fc_incremental(
+            text, llm=llm, search_tool=FakeSearch(), confidence_threshold=0.95
+        )
+        self.assertTrue(all(r["status"] == "not sure" for r in strict.values()))
+
+        llm.reset()
+        relaxed, _, _ = fc_incremental(
+            text, run, llm=llm, search_tool=FakeSearch(), confidence_threshold=0.5
+        )
+        self.assertEqual(llm.calls, [])
+        self.assertTrue(all(r["status"] == "true" for r in relaxed.values()))
+
+    def test_verdict_cache_reuses_claims(self):
+        cache = VerdictCache()
+        llm = FakeChat()
+        text = make_document(2)
+        fc_incremental(text, llm=llm, search_tool=FakeSearch(), verdict_cache=cache)
+
+        llm.reset()
+        # same text without a previous run: extracted again, but verdicts come from the cache
+        fc_incremental(text, llm=llm, search_tool=FakeSearch(), verdict_cache=cache)
+        self.assertNotIn("verify", llm.stage_stats())
+        self.assertEqual(cache.stats()["hits"], 2)
+
+
+class TestMultiDocumentBatch(unittest.TestCase):
+
+    def test_cluster_facts(self):
+        facts = [
+            {"entity": "Sung Kim", "relation": "CEO of", "value": "Upstage.AI"},
+            {"entity": "Upstage", "relation": "founded in", "value": "2020"},
+            {"entity": "Lucy Park", "relation": "CPO of", "value": "Upstage"},
+            {"entity": "Company0", "relation": "founded in", "value": "1900"},
+        ]
+        self.assertEqual(cluster_facts(facts), [[0, 1, 2], [3]])
+
+    def test_shared_search_and_kg(self):
+        llm = FakeChat()
+        search = FakeSearch()
+        texts = [
+            "Company0 was founded in 1900. Company1 was founded in 1901.",
+            "Company1 was founded in 1901. Company2 was founded in 1902.",
+            "Company2 was founded in 1902. Company0 was founded in 1900.",
+        ]
+        checked = fc_batch(texts, llm=llm, search_tool=search)
+
+        stats = llm.stage_stats()
+        # one search, KG and verification per company, not per text
+        self.assertEqual(stats["extract"]["calls"], 3)
+        self.assertEqual(stats["keywords"]["calls"], 3)
+        self.assertEqual(stats["build_kg"]["calls"], 3)
+        self.assertEqual(stats["verify"]["calls"], 3)
+        self.assertEqual(len(search.queries), 3)
+
+        self.assertEqual(len(checked), 3)
+        verified, checked_text = checked[1]
+        self.assertEqual(
+            [result["claimed"] for result in verified.values()],
+            ["Company1 founded in 1901", "Company2 founded in 1902"],
+        )
+        self.assertTrue(all(result["status"] == "true" for result in verified.values()))
+        self.assertIn("Company2 was founded in 1902 [Fact: True", checked_text)
+
+
+class TestCanonicalization(unittest.TestCase):
+
+    def tearDown(self):
+        set_entity_aliases(None)
+        set_verdict_memo(None)
+
+    def test_canonical_key(self):
+        def same(a, b):
+            keys = [canonical_key(dict(zip(("entity", "relation", "value"), triple))) for triple in (a, b)]
+            self.assertEqual(keys[0], keys[1])
+
+        same(("Sung Kim ", "CEO of", "Upstage.AI"), ("sung  kim", "is CEO of", "Upstage"))
+        same(("Upstage", "revenue", "$3.2 billion"), ("Upstage", "revenue", "3,200,000,000 USD"))
+        same(("Upstage", "founded in", "October 2020"), ("Upstage", "was founded in", "2020-10"))
+        self.assertNotEqual(
+            canonical_key({"entity": "Upstage", "relation": "founded in", "value": "2020"}),
+            canonical_key({"entity": "Upstage", "relation": "founded in", "value": "2021"}),
+        )
+
+        set_entity_aliases({"Kim Sung-hoon": "Sung Kim"})
+        same(("Kim Sung-hoon", "CEO of", "Upstage"), ("Sung Kim", "CEO of", "Upstage"))
+
+        facts = canonicalize_facts([
+            {"entity": "Sung Kim ", "relation": "CEO of", "value": "Upstage"},
+            {"entity": "Sung Kim", "relation": "is CEO of", "value": "Upstage Inc."},
+        ])
+        self.assertEqual(len(facts), 1)
+        self.assertEqual(facts[0]["entity"], "Sung Kim")
+        self.assertEqual(facts[0]["canonical"], ["sung kim", "ceo of", "upstage"])
+
+    def test_inverse_claims_stay_apart(self):
+        facts = canonicalize_facts([
+            {"entity": "Microsoft", "relation": "acquired", "value": "GitHub"},
+            {"entity": "Microsoft", "relation": "acquired by", "value": "GitHub"},
+        ])
+        self.assertEqual(len(facts), 2)
+
+        memo = VerdictMemo()
+        memo.set(facts[0], {"status": "true", "confidence": 0.9, "explanation": ""})
+        self.assertIsNone(memo.get(facts[1]))
+
+    def test_verdict_memo_skips_llm(self):
+        memo = VerdictMemo()
+        set_verdict_memo(memo)
+        facts = [{"entity": f"Company{i}", "relation": "founded in", "value": str(1900 + i)} for i in range(2)]
+        llm = FakeChat()
+        first = verify_facts(facts, "", {}, 0.7, llm)
+        self.assertEqual(llm.stage_stats()["verify"]["calls"], 2)
+
+        llm.reset()
+        variants = [{"entity": f" company{i}", "relation": "was founded in", "value": f"{1900 + i}"} for i in range(2)]
+        again = verify_facts(variants, "", {}, 0.7, llm)
+        self.assertEqual(llm.calls, [])
+        self.assertEqual(memo.stats()["hits"], 2)
+        self.assertEqual(
+            [r["status"] for r in again.values()], [r["status"] for r in first.values()]
+        )
+
+    def test_verdict_memo_expires(self):
+        memo = VerdictMemo(ttl=0.05)
+        fact = {"entity": "Company0", "relation": "founded in", "value": "1900"}
+        memo.set(fact, {"status": "true", "confidence": 0.9, "explanation": ""})
+        self.assertEqual(memo.get(fact)["status"], "true")
+        time.sleep(0.1)
+        self.assertIsNone(memo.get(fact))
+
+        memo.set(fact, {"status": "not sure", "confidence": 0.2, "explanation": ""})
+        self.assertIsNone(memo.get(fact))
+
+
+class TestKGStore(unittest.TestCase):
+
+    def test_add_and_lookup(self):
+        store = KGStore(":memory:")
+        kg = {
+            "Upstage AI": {"founded in": {"value": 2020, "source": "Upstage was founded in 2020"}},
+            "2024 Paris Olympics": {
+                "type": "SportingEvent",
+                "attributes": {"location": "Paris", "numberOfSports": 32},
+                "relationships": {"organizer": {"name": "International Olympic Committee"}},
+            },
+        }
+        self.assertEqual(store.add_kg(kg, origin="test"), 5)
+        # the same triples again add nothing
+        self.assertEqual(store.add_kg(kg, origin="test"), 0)
+        self.assertEqual(len(store), 5)
+
+        (triple,) = store.triples("upstage", "Founded In")
+        self.assertEqual(triple["value"], 2020)
+        self.assertEqual(triple["source"], "Upstage was founded in 2020")
+        self.assertEqual(triple["origin"], "test")
+        self.assertEqual(
+            store.triples("2024 Paris Olympics", "organizer")[0]["value"],
+            "International Olympic Committee",
+        )
+
+        self.assertTrue(store.covers({"entity": "Upstage", "relation": "founded in", "value": "2021"}))
+        self.assertFalse(store.covers({"entity": "Paris 2024", "relation": "location", "value": "Paris"}))
+        self.assertFalse(store.covers({"entity": "Upstage", "relation": "ceo", "value": "Sung Kim"}))
+        self.assertEqual(
+            store.subgraph([{"entity": "Upstage", "relation": "founded in", "value": 2020}]),
+            {"Upstage AI": {"founded in": {"value": 2020, "source": "Upstage was founded in 2020"}}},
+        )
+
+    def test_store_persists(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "kg.sqlite")
+            KGStore(path).add_kg({"Company0": {"founded in": {"value": 1900, "source": None}}})
+            self.assertEqual(KGStore(path).triples("company0")[0]["value"], 1900)
+
+    def test_fc_skips_covered_claims(self):
+        store = KGStore(":memory:")
+        llm = FakeChat()
+        search = FakeSearch()
+        fc(make_document(3), llm=llm, search_tool=search, kg_store=store)
+        self.assertEqual(len(store), 3)
+        first = llm.stage_stats()
+
+        llm.reset()
+        search.queries.clear()
+        verified, _ = fc(make_document(4), llm=llm, search_tool=search, kg_store=store)
+        stats = llm.stage_stats()
+        # only Company3 is new: it alone is searched for and put in the new KG
+        self.assertIn("Company3", "".join(search.queries))
+        self.assertNotIn("Company0", "".join(search.queries))
+        self.assertEqual(stats["keywords"]["calls"], 1)
+        self.assertEqual(stats["build_kg"]["calls"], 1)
+        self.assertLess(
+            stats["build_kg"]["completion_tokens"], first["build_kg"]["completion_tokens"] / 2
+        )
+        self.assertEqual(stats["verify"]["calls"], 4)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(len(verified), 4)
+
+        llm.reset()
+        search.queries.clear()
+        fc(make_document(4), llm=llm, search_tool=search, kg_store=store)
+        self.assertEqual(search.queries, [])
+        self.assertNotIn("keywords", llm.stage_stats())
+        self.assertNotIn("build_kg", llm.stage_stats())
+
+    def test_text2kg_writes_to_store(self):
+        store = KGStore(":memory:")
+        text2kg(make_document(1), [], llm=FakeChat(), kg_store=store)
+        self.assertGreater(len(store), 0)
+
+
+class TestKGFastPath(unittest.TestCase):
+
+    def test_compare_values(self):
+        self.assertTrue(compare_values("$3.2 billion", "3,200,000,000 USD"))
+        self.assertTrue(compare_values("July 26, 2024", "2024-07-26"))
+        self.assertTrue(compare_values("2024", "26 July 2024"))
+        self.assertTrue(compare_values(" Paris ", "paris"))
+        self.assertTrue(compare_values("5%", "5 percent"))
+        self.assertFalse(compare_values("$4 billion", "$3.2 billion"))
+        self.assertFalse(compare_values(1901, "1900"))
+        self.assertFalse(compare_values("August 2024", "2024-07-26"))
+        # rounding, other units and differing text are left to the LLM
+        self.assertIsNone(compare_values("$3 billion", "$3.2 billion"))
+        self.assertIsNone(compare_values("3.2 billion", "€3.2 billion"))
+        self.assertIsNone(compare_values("Seoul", "Seoul, South Korea"))
+
+    def test_verifier(self):
+        kg = {
+            "Upstage AI": {
+                "foundedIn": {"value": 2020, "source": "Upstage was founded in 2020"},
+                "revenue": {"value": "$12 million", "source": "revenue of $12 million"},
+                "offices": [{"value": "Seoul"}, {"value": "San Jose"}],
+            }
+        }
+        verifier = KGVerifier(kg)
+        true = verifier.verify({"entity": "Upstage", "relation": "founded in", "value": "2020"})
+        self.assertEqual(true["status"], "true")
+        self.assertEqual(true["provenance"], "Upstage was founded in 2020")
+        false = verifier.verify({"entity": "Upstage", "relation": "revenue", "value": "$15 million"})
+        self.assertEqual(false["status"], "false")
+        self.assertIn("revenue of $12 million", false["explanation"])
+        self.assertEqual(verifier.verify({"entity": "Upstage", "relation": "offices", "value": "San Jose"})["status"], "true")
+        # several stored values, none matching: not a clear contradiction
+        self.assertIsNone(verifier.verify({"entity": "Upstage", "relation": "offices", "value": "Busan"}))
+        self.assertIsNone(verifier.verify({"entity": "Upstage", "relation": "CEO", "value": "Sung Kim"}))
+
+    def test_inverse_relation_goes_to_llm(self):
+        verifier = KGVerifier({"Microsoft": {"acquired": {"value": "GitHub"}}})
+        self.assertEqual(
+            verifier.verify({"entity": "Microsoft", "relation": "acquired", "value": "GitHub"})["status"], "true"
+        )
+        self.assertIsNone(verifier.verify({"entity": "Microsoft", "relation": "acquired by", "value": "GitHub"}))
+        verifier = KGVerifier({"Upstage": {"invested in": {"value": "Company0"}}})
+        self.assertIsNone(verifier.verify({"entity": "Upstage", "relation": "invested by", "value": "Company0"}))
+
+    def test_verify_facts_escalates_only_ambiguous_claims(self):
+        llm = FakeChat()
+        kg = {
+            "Company0": {"founded in": {"value": 1900, "source": "Company0 was founded in 1900"}},
+            "Company1": {"founded in": {"value": 1950, "source": "Company1 was founded in 1950"}},
+        }
+        facts = [
+            {"entity": "Company0", "relation": "founded in", "value": "1900"},
+            {"entity": "Company1", "relation": "founded in", "value": "1901"},
+            {"entity": "Company2", "relation": "founded in", "value": "1902"},
+        ]
+        metrics = MetricsCollector()
+        with observe(metrics):
+            verified = verify_facts(facts, "", kg, 0.7, llm, batch_size=2, kg_fast_path=True)
+        self.assertEqual([r["status"] for r in verified.values()], ["true", "false", "true"])
+        self.assertEqual(verified["0"]["provenance"], "Company0 was founded in 1900")
+        self.assertNotIn("provenance", verified["2"])
+        # Company2 is not in the KG; "Company0" is close, but not the same entity
+        self.assertEqual(len(llm.calls), 1)
+        self.assertEqual(metrics.to_dict()["verify"]["cache_hits"], {"kg_verdict": 2})
+
+    def test_fc_fast_path(self):
+        llm = FakeChat()
+        verified, _ = fc(make_document(3), llm=llm, search_tool=FakeSearch(), kg_fast_path=True)
+        self.assertTrue(all(r["status"] == "true" for r in verified.values()))
+        self.assertNotIn("verify", llm.stage_stats())
+
+        verified, _ = asyncio.run(
+            afc(make_document(3), llm=llm, search_tool=FakeSearch(), kg_fast_path=True)
+        )
+        self.assertEqual(len(verified), 3)
+        self.assertNotIn("verify", llm.stage_stats())
+
+
+class TestParallelSearch(unittest.TestCase):
+
+    def test_pool_runs_searches_in_parallel(self):
+        search = FakeSearch(latency=0.2)
+        pool = SearchPool(search, size=4)
+        start = time.perf_counter()
+        results = pool.run_many([f"Company{i}" for i in range(4)])
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual([r.count("snippet:") for r in results], [1, 1, 1, 1])
+        self.assertIn("Company2 was founded", results[2])
+
+        start = time.perf_counter()
+        asyncio.run(pool.arun_many([f"Company{i}" for i in range(4)]))
+        self.assertLess(time.perf_counter() - start, 0.6)
+
+    def test_pool_reuses_clients(self):
+        clients = []
+
+        def factory():
+            clients.append(FakeSearch(latency=0.02))
+            return clients[-1]
+
+        pool = SearchPool(factory=factory, size=2)
+        pool.run_many([f"Company{i}" for i in range(8)])
+        asyncio.run(pool.arun_many([f"Company{i}" for i in range(8)]))
+        self.assertLessEqual(len(clients), 2)
+        self.assertEqual(sum(len(client.queries) for client in clients), 16)
+
+    def test_rank_results(self):
+        results = [
+            "snippet: Company0 was founded in 1900., title: a, link: https://a, "
+            "snippet: Company0 makes widgets., title: b, link: https://b",
+            "snippet: Company1 was founded in 1901., title: c, link: https://c, "
+            "snippet: Unrelated news., title: d, link: https://d",
+            "snippet: Company0 was founded in 1900., title: a, link: https://a",
+        ]
+        context = rank_results(
+            results, ["Company0 founded in 1900", "Company1 founded in 1901"], max_tokens=35
+        )
+        lines = context.splitlines()
+        # each claim's best snippet first, the duplicate dropped, cut to the budget
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Company0 was founded", lines[0])
+        self.assertIn("Company1 was founded", lines[1])
+        self.assertEqual(len(rank_results(results, ["Company0"]).splitlines()), 4)
+
+    def test_search_modes(self):
+        facts = [
+            {"entity": f"Company{i}", "relation": "founded in", "value": str(1900 + i)}
+            for i in range(3)
+        ]
+        llm = FakeChat()
+        search = FakeSearch()
+        context = search_context("text", facts, search, llm, search_mode="claims")
+        self.assertEqual(sorted(search.queries), [f"Company{i} founded in {1900 + i}" for i in range(3)])
+        self.assertEqual(llm.calls, [])
+        self.assertEqual(len(context.splitlines()), 3)
+
+        search = FakeSearch()
+        search_context("text", facts, search, llm, search_mode="questions")
+        self.assertEqual(search.queries, ["company founding year"])
+        self.assertEqual(llm.stage_stats()["text2questions"]["calls"], 1)
+
+        search = FakeSearch()
+        verified, _ = asyncio.run(
+            afc(make_document(3), llm=FakeChat(), search_tool=search, search_mode="claims", max_context_tokens=100)
+        )
+        self.assertEqual(len(search.queries), 3)
+        self.assertEqual(len(verified), 3)
+
+
+class TestStreamingVerdicts(unittest.TestCase):
+
+    facts = [
+        {"entity": f"Company{i}", "relation": "founded in", "value": str(1900 + i)}
+        for i in range(4)
+    ]
+
+    @staticmethod
+    def slow_first(prompt):
+        # Company0 takes much longer to verify than the others
+        if "Claimed Fact:" in prompt and "Company0" in prompt.rsplit("Claimed Fact:", 1)[1]:
+            time.sleep(0.3)
+        return pipeline_response(prompt)
+
+    def test_results_stream_as_they_finish(self):
+        llm = FakeChat(responder=self.slow_first)
+        start = time.perf_counter()
+        stream = iter_verify_facts(self.facts, "", {}, 0.7, llm, max_concurrency=4)
+        first_id, first = next(stream)
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertNotEqual(first_id, "0")
+        results = dict([(first_id, first), *stream])
+        self.assertEqual(results, verify_facts(self.facts, "", {}, 0.7, FakeChat()))
+
+    def test_fast_path_results_come_first(self):
+        kg = {"Company3": {"founded in": {"value": 1903, "source": "Company3 was founded in 1903"}}}
+        ids = [
+            fact_id
+            for fact_id, _ in iter_verify_facts(
+                self.facts, "", kg, 0.7, FakeChat(), batch_size=2, kg_fast_path=True
+            )
+        ]
+        self.assertEqual(ids, ["3", "0", "1", "2"])
+
+    def test_async_stream(self):
+        async def collect():
+            return [
+                item
+                async for item in aiter_verify_facts(self.facts, "", {}, 0.7, FakeChat(latency=0.01))
+            ]
+
+        results = asyncio.run(collect())
+        self.assertEqual(dict(results), verify_facts(self.facts, "", {}, 0.7, FakeChat()))
+
+    def test_stream_is_one_verify_span(self):
+        metrics = MetricsCollector()
+        llm = FakeChat()
+        with observe(metrics):
+            for _ in iter_verify_facts(self.facts, "", {}, 0.7, llm, max_concurrency=2):
+                pass
+        stages = metrics.to_dict()
+        self.assertEqual(stages["verify"]["spans"], 1)
+        self.assertEqual(stages["verify"]["llm_calls"], 4)
+
+    def test_stream_annotation(self):
+        verified = {"0": {"claimed": "Company0 founded in 1900", "status": "true", "confidence": 0.9, "explanation": "Ok."}}
+        text = make_document(1)
+        pieces = list(stream_fact_check_to_text(text, verified, FakeChat()))
+        self.assertEqual("".join(pieces), add_fact_check_to_text(text, verified, FakeChat()))
+
+        located = {"0": {**verified["0"], "span": [0, len(text)]}}
+        self.assertEqual(
+            list(stream_fact_check_to_text(text, located)),
+            [add_fact_check_to_text(text, located)],
+        )
+
+
+class TestConfidenceThreshold(unittest.TestCase):
+
+    facts = [
+        {"entity": f"Company{i}", "relation": "founded in", "value": str(1900 + i)}
+        for i in range(4)
+    ]
+
+    def test_apply_confidence_threshold(self):
+        llm = FakeChat()
+        raw = verify_facts(self.facts, "", {}, 0.0, llm)
+        llm.reset()
+        strict = apply_confidence_threshold(raw, 0.95)
+        self.assertEqual({r["status"] for r in strict.values()}, {"not sure"})
+        self.assertEqual(apply_confidence_threshold(strict, 0.5), strict)
+        self.assertEqual(apply_confidence_threshold(raw, 0.5), verify_facts(self.facts, "", {}, 0.5, FakeChat()))
+        self.assertEqual({r["status"] for r in raw.values()}, {"true"})
+        self.assertEqual(llm.calls, [])
+
+
+class TestKGRendering(unittest.TestCase):
+
+    def test_graph_payload(self):
+        kg = {
+            "Upstage": {
+                "CEO": {"value": "Sung Kim", "source": "Sung Kim is CEO of Upstage"},
+                "founded": {"value": 2020},
+            },
+            "Sung Kim": {"works at": {"value": "Upstage"}},
+        }
+        nodes, edges = kg_graph(kg)
+        self.assertEqual(sorted(node["id"] for node in nodes), ["2020", "Sung Kim", "Upstage"])
+        self.assertTrue(all(node["entity"] for node in nodes if node["id"] != "2020"))
+        self.assertIn(
+            {"from": "Upstage", "to": "Sung Kim", "title": "CEO: Sung Kim is CEO of Upstage"}, edges
+        )
+        self.assertEqual(len(edges), 3)
+
+    def test_large_graph_is_sampled(self):
+        kg = {
+            f"Entity{i}": {f"relation{j}": {"value": f"value {i} {j}"} for j in range(5 + i % 20)}
+            for i in range(200)
+        }
+        nodes, edges = kg_graph(kg, max_nodes=100, max_values=10)
+        self.assertLessEqual(len(nodes), 100)
+        more = [node for node in nodes if node["label"].startswith("+")]
+        self.assertTrue(more)
+        # the most connected entities are the ones kept
+        self.assertIn("Entity19", {node["id"] for node in nodes})
+
+        positions = static_layout(nodes, edges)
+        self.assertEqual(set(positions), {node["id"] for node in nodes})
+        self.assertEqual(positions, static_layout(nodes, edges))
+
+    def test_html_is_cached_and_static_for_large_graphs(self):
+        small = {"Company0": {"founded in": {"value": 1900, "source": "Company0 was founded in 1900"}}}
+        html = kg_html(small)
+        self.assertIn("Company0", html)
+        self.assertIs(kg_html(json.loads(json.dumps(small))), html)
+
+        large = {f"Company{i}": {"founded in": {"value": 1900 + i}} for i in range(80)}
+        html = kg_html(large, physics_max_nodes=100)
+        self.assertIn('"physics": false', html)
+        self.assertIn('"x": ', html)
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,391 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import asyncio
+import functools
+import inspect
+import json
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+# Innermost pipeline stage of the current call, e.g. "verify"
+_stage: ContextVar[Optional[str]] = ContextVar("stage", default=None)
+# Observers registered with observe() for the current call
+_scoped_observers: ContextVar[Tuple["Observer", ...]] = ContextVar(
+    "scoped_observers", default=()
+)
+# Observers registered with add_observer() for the whole process
+_global_observers: List["Observer"] = []
+
+UNSTAGED = "unstaged"
+
+
+class Observer:
+    """
+    Receives pipeline events. Subclass it and override the events of interest.
+
+    Events are delivered synchronously from the thread or task doing the work,
+    so implementations must be cheap and thread-safe.
+    """
+
+    def on_span_start(self, stage: str) -> None:
+        pass
+
+    def on_span_end(self, stage: str, seconds: float, error: Optional[BaseException]) -> None:
+        pass
+
+    def on_llm_call(self, stage: str, input_tokens: int, output_tokens: int) -> None:
+        pass
+
+    def on_retry(self, stage: str, attempt: int, exception: Optional[BaseException]) -> None:
+        pass
+
+    def on_cache(self, stage: str, cache: str, hit: bool) -> None:
+        pass
+
+    def on_repair(self, stage: str, success: bool) -> None:
+        pass
+
+
+def add_observer(observer: Observer) -> None:
+    _global_observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    if observer in _global_observers:
+        _global_observers.remove(observer)
+
+
+@contextmanager
+def observe(*observers: Observer) -> Iterator[None]:
+    """
+    Send the events of the calls made inside this block (including their threads
+    and tasks started through the pipeline) to the given observers.
+    """
+
+    token = _scoped_observers.set(_scoped_observers.get() + observers)
+    try:
+        yield
+    finally:
+        _scoped_observers.reset(token)
+
+
+def _observers() -> Tuple[Observer, ...]:
+    scoped = _scoped_observers.get()
+    return (*_global_observers, *scoped) if _global_observers else scoped
+
+
+def enabled() -> bool:
+    return bool(_global_observers or _scoped_observers.get())
+
+
+def current_stage() -> str:
+    return _stage.get() or UNSTAGED
+
+
+def _emit(event: str, *args: Any) -> None:
+    for observer in _observers():
+        getattr(observer, event)(*args)
+
+
+def record_llm_call(input_tokens: int, output_tokens: int) -> None:
+    if enabled():
+        _emit("on_llm_call", current_stage(), input_tokens, output_tokens)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    if enabled():
+        _emit("on_cache", current_stage(), cache, hit)
+
+
+def record_repair(success: bool) -> None:
+    if enabled():
+        _emit("on_repair", current_stage(), success)
+
+
+def record_retry(retry_state: Any) -> None:
+    """
+    tenacity before_sleep hook counting retries of the current stage.
+    """
+
+    if enabled():
+        exception = retry_state.outcome.exception() if retry_state.outcome else None
+        _emit("on_retry", current_stage(), retry_state.attempt_number, exception)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a pipeline stage. Events inside the block are attributed to it.
+    """
+
+    token = _stage.set(stage)
+    if not enabled():
+        try:
+            yield
+        finally:
+            _stage.reset(token)
+        return
+
+    _emit("on_span_start", stage)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _stage.reset(token)
+        _emit("on_span_end", stage, time.perf_counter() - start, error)
+
+
+@contextmanager
+def _stream_span(stage: str) -> Iterator[Callable[[], Any]]:
+    """
+    Span of a generator: timed from the first item to the last, but the stage is only
+    set while the generator itself runs, not while the consumer handles its items.
+
+    Yields a function that enters the stage for one step of the generator.
+    """
+
+    if enabled():
+        _emit("on_span_start", stage)
+    start = time.perf_counter()
+    error = None
+
+    @contextmanager
+    def step() -> Iterator[None]:
+        token = _stage.set(stage)
+        try:
+            yield
+        finally:
+            _stage.reset(token)
+
+    try:
+        yield step
+    except GeneratorExit:
+        # The consumer stopped early: not an error
+        raise
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if enabled():
+            _emit("on_span_end", stage, time.perf_counter() - start, error)
+
+
+def traced(stage: str) -> Callable:
+    """
+    Decorator running a function, sync or async, inside span(stage).
+
+    Generators and async generators are traced as one span over their whole iteration.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.isasyncgenfunction(fn):
+
+            @functools.wraps(fn)
+            async def async_gen_wrapper(*args, **kwargs):
+                with _stream_span(stage) as step:
+                    agen = fn(*args, **kwargs)
+                    try:
+                        while True:
+                            with step():
+                                try:
+                                    item = await agen.__anext__()
+                                except StopAsyncIteration:
+                                    return
+                            yield item
+                    finally:
+                        await agen.aclose()
+
+            return async_gen_wrapper
+
+        if inspect.isgeneratorfunction(fn):
+
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                with _stream_span(stage) as step:
+                    gen = fn(*args, **kwargs)
+                    try:
+                        while True:
+                            with step():
+                                try:
+                                    item = next(gen)
+                                except StopIteration:
+                                    return
+                            yield item
+                    finally:
+                        gen.close()
+
+            return gen_wrapper
+
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _estimate_tokens(text: str) -> int:
+    # Imported here: evidence -> search_cache -> tracing would otherwise be circular
+    from evidence import estimate_tokens
+
+    return estimate_tokens(text)
+
+
+class LLMCallHandler(BaseCallbackHandler):
+    """
+    LangChain callback reporting each model call, with its token usage, to the observers.
+
+    Uses the provider's usage metadata when the response has it, otherwise estimates
+    tokens from the text.
+    """
+
+    def __init__(self):
+        self._input_tokens: Dict[Any, int] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._input_tokens[run_id] = sum(
+            _estimate_tokens(str(message.content)) for batch in messages for message in batch
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._input_tokens[run_id] = sum(_estimate_tokens(prompt) for prompt in prompts)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        input_tokens = self._input_tokens.pop(run_id, 0)
+        output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens = usage.get("input_tokens", input_tokens)
+                    output_tokens += usage.get("output_tokens", 0)
+                else:
+                    output_tokens += _estimate_tokens(generation.text)
+        record_llm_call(input_tokens, output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._input_tokens.pop(run_id, None)
+
+
+def llm_config() -> Optional[Dict[str, Any]]:
+    """
+    Runnable config reporting model calls to the observers, or None when nobody observes.
+    """
+
+    if not enabled():
+        return None
+    return {"callbacks": [LLMCallHandler()]}
+
+
+class MetricsCollector(Observer):
+    """
+    Observer aggregating pipeline events per stage, exportable as JSON or Prometheus text.
+    """
+
+    FIELDS = (
+        "spans",
+        "errors",
+        "seconds",
+        "llm_calls",
+        "input_tokens",
+        "output_tokens",
+        "retries",
+        "repairs",
+        "repair_failures",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.stages: Dict[str, Dict[str, Any]] = defaultdict(self._new_stage)
+
+    @classmethod
+    def _new_stage(cls) -> Dict[str, Any]:
+        stats = {field: 0 for field in cls.FIELDS}
+        stats["cache_hits"] = defaultdict(int)
+        stats["cache_misses"] = defaultdict(int)
+        return stats
+
+    def on_span_end(self, stage: str, seconds: float, error: Optional[BaseException]) -> None:
+        with self._lock:
+            stats = self.stages[stage]
+            stats["spans"] += 1
+            stats["seconds"] += seconds
+            if error is not None:
+                stats["errors"] += 1
+
+    def on_llm_call(self, stage: str, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            stats = self.stages[stage]
+            stats["llm_calls"] += 1
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+
+    def on_retry(self, stage: str, attempt: int, exception: Optional[BaseException]) -> None:
+        with self._lock:
+            self.stages[stage]["retries"] += 1
+
+    def on_cache(self, stage: str, cache: str, hit: bool) -> None:
+        with self._lock:
+            self.stages[stage]["cache_hits" if hit else "cache_misses"][cache] += 1
+
+    def on_repair(self, stage: str, success: bool) -> None:
+        with self._lock:
+            self.stages[stage]["repairs" if success else "repair_failures"] += 1
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                stage: {
+                    **{field: stats[field] for field in self.FIELDS},
+                    "cache_hits": dict(stats["cache_hits"]),
+                    "cache_misses": dict(stats["cache_misses"]),
+                }
+                for stage, stats in self.stages.items()
+            }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "fc") -> str:
+        """
+        Render the metrics in the Prometheus text exposition format, one counter per field.
+        """
+
+        stages = self.to_dict()
+        lines = []
+        for field in self.FIELDS:
+            name = f"{prefix}_stage_{field}_total"
+            lines.append(f"# TYPE {name} counter")
+            for stage, stats in stages.items():
+                lines.append(f'{name}{{stage="{stage}"}} {stats[field]:g}')
+        for field in ("cache_hits", "cache_misses"):
+            name = f"{prefix}_{field}_total"
+            lines.append(f"# TYPE {name} counter")
+            for stage, stats in stages.items():
+                for cache, count in stats[field].items():
+                    lines.append(f'{name}{{stage="{stage}",cache="{cache}"}} {count}')
+        return "\n".join(lines) + "\n"
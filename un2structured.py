@@ -1,44 +1,46 @@
-from langchain_upstage import ChatUpstage as Chat
+from __future__ import annotations
+
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.output_parsers import StrOutputParser
-from typing import List, Dict, Any  # Add this import
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 import json  # Add this import
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
-
-
-MODEL_NAME = "solar-pro"
+from functools import lru_cache
+
+from clients import MODEL_NAME, get_llm
+from chains import get_chain
+from chunking import chunk_spans, dedupe, normalize_relation, parallel_map
+from kg_index import normalize_entity
+from kg_store import KGStore, store_kg
+from retries import with_retries
+from tracing import traced
+
+if TYPE_CHECKING:
+    from langchain_upstage import ChatUpstage as Chat
+
+
+__all__ = [
+    # Re-exported from clients, where the model name now lives
+    "MODEL_NAME",
+    "text2kvpairs",
+    "text2kg",
+    "text2questions",
+    "generate_prf_docs",
+    "text2questions_v2",
+]
 
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type, before_sleep_log
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_fixed(0),
-    retry=retry_if_exception_type(Exception),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    reraise=True,
-)
-def text2kvpairs(
-    text: str, llm: Chat = Chat(model_name=MODEL_NAME)
-) -> List[Dict[str, str]]:
+@lru_cache(maxsize=None)
+def _text2kvpairs_prompt() -> ChatPromptTemplate:
     """
-    Extract key-value pairs from the given text using a language model with high accuracy.
-
-    Args:
-        text (str): The input text from which to extract key-value pairs.
-        llm (Chat, optional): The language model to use for extraction. Defaults to Chat(model_name=MODEL_NAME).
-
-    Returns:
-        List[Dict[str, str]]: A list of dictionaries representing the extracted key-value pairs.
+    Build (once) the prompt used to extract key-value pairs, with comprehensive instructions and multiple examples.
     """
 
-    # Define the prompt template with comprehensive instructions and multiple examples
-    prompt = ChatPromptTemplate.from_messages(
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "human",
@@ -89,11 +91,57 @@ Now, extract key-value pairs from the following text. Be thorough and capture al
         ]
     )
 
-    # Initialize the output parser
-    output_parser = JsonOutputParser()
 
-    # Create the processing chain
-    chain = prompt | llm | output_parser
+@traced("text2kvpairs")
+def text2kvpairs(
+    text: str,
+    llm: Optional[Chat] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: int = 1,
+    max_concurrency: int = 4,
+) -> List[Dict[str, str]]:
+    """
+    Extract key-value pairs from the given text using a language model with high accuracy.
+
+    Args:
+        text (str): The input text from which to extract key-value pairs.
+        llm (Chat, optional): The language model to use for extraction. Defaults to the shared client for MODEL_NAME.
+        chunk_size (Optional[int]): Maximum characters per extraction call; longer texts are split
+            into overlapping chunks extracted in parallel. None to send the whole text.
+        chunk_overlap (int): Number of sentences shared by consecutive chunks.
+        max_concurrency (int): Maximum number of chunks extracted at the same time.
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries representing the extracted key-value pairs.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    if chunk_size is None or len(text) <= chunk_size:
+        return _text2kvpairs(text, llm)
+
+    def extract(span):
+        pairs = _text2kvpairs(text[span[0] : span[1]], llm)
+        return pairs if isinstance(pairs, list) else []
+
+    results = parallel_map(
+        extract, chunk_spans(text, chunk_size, chunk_overlap), max_concurrency
+    )
+    # Pairs repeated across chunk overlaps are merged by normalized key and value
+    return dedupe(
+        (pair for pairs in results for pair in pairs if isinstance(pair, dict)),
+        lambda pair: (
+            normalize_relation(pair.get("key", "")),
+            normalize_entity(pair.get("value", "")),
+        ),
+    )
+
+
+@with_retries
+def _text2kvpairs(text: str, llm: Chat) -> List[Dict[str, str]]:
+    # Get the processing chain, built once per llm
+    chain = get_chain("text2kvpairs", llm, _text2kvpairs_prompt)
 
     # Execute the chain with the provided text
     result = chain.invoke({"text": text})
@@ -101,30 +149,13 @@ Now, extract key-value pairs from the following text. Be thorough and capture al
     return result
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_fixed(0),
-    retry=retry_if_exception_type(Exception),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    reraise=True,
-)
-def text2kg(
-    text: str, kv_pairs: List[Dict[str, str]], llm: Chat = Chat(model_name=MODEL_NAME)
-) -> Dict[str, Any]:
+@lru_cache(maxsize=None)
+def _text2kg_prompt() -> ChatPromptTemplate:
     """
-    Extract a knowledge graph from the given text and key-value pairs using a language model with high accuracy.
-
-    Args:
-        text (str): The input text from which to extract the knowledge graph.
-        kv_pairs (List[Dict[str, str]]): The key-value pairs extracted from the text.
-        llm (Chat, optional): The language model to use for extraction. Defaults to Chat(model_name=MODEL_NAME).
-
-    Returns:
-        Dict[str, Any]: A dictionary representing the extracted knowledge graph.
+    Build (once) the prompt used to extract a knowledge graph, with comprehensive instructions and multiple examples.
     """
 
-    # Define the prompt template with comprehensive instructions and multiple examples
-    prompt = ChatPromptTemplate.from_messages(
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "human",
@@ -216,39 +247,47 @@ Key-Value Pairs: {kv_pairs}""",
         ]
     )
 
-    # Initialize the output parser
-    output_parser = JsonOutputParser()
 
-    # Create the processing chain
-    chain = prompt | llm | output_parser
+@traced("text2kg")
+@with_retries
+def text2kg(
+    text: str,
+    kv_pairs: List[Dict[str, str]],
+    llm: Optional[Chat] = None,
+    kg_store: Optional[KGStore] = None,
+) -> Dict[str, Any]:
+    """
+    Extract a knowledge graph from the given text and key-value pairs using a language model with high accuracy.
+
+    Args:
+        text (str): The input text from which to extract the knowledge graph.
+        kv_pairs (List[Dict[str, str]]): The key-value pairs extracted from the text.
+        llm (Chat, optional): The language model to use for extraction. Defaults to the shared client for MODEL_NAME.
+        kg_store (KGStore, optional): Store to add the graph to. Defaults to the one set with set_kg_store().
+
+    Returns:
+        Dict[str, Any]: A dictionary representing the extracted knowledge graph.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    # Get the processing chain, built once per llm
+    chain = get_chain("text2kg", llm, _text2kg_prompt)
 
     # Execute the chain with the provided text and key-value pairs
     result = chain.invoke({"text": text, "kv_pairs": kv_pairs})
+    store_kg(result, "text2kg", kg_store)
 
     return result
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_fixed(0),
-    retry=retry_if_exception_type(Exception),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    reraise=True,
-)
-def text2questions(
-    text: str, llm: Chat = Chat(model_name=MODEL_NAME)
-) -> List[Dict[str, Any]]:
+@lru_cache(maxsize=None)
+def _text2questions_prompt() -> ChatPromptTemplate:
     """
-    Break down complex questions or statements into smaller, focused questions with search terms.
-
-    Args:
-        text (str): The input text containing complex questions or statements.
-        llm (Chat, optional): The language model to use for extraction. Defaults to Chat(model_name=MODEL_NAME).
-
-    Returns:
-        List[Dict[str, Any]]: A list of dictionaries, each containing a sub-question and search terms.
+    Build (once) the prompt used to break down complex questions.
     """
 
-    prompt = ChatPromptTemplate.from_messages(
+    return ChatPromptTemplate.from_messages(
         [
             (
                 "human",
@@ -316,52 +355,62 @@ Now, break down the following complex question or statement into 2-3 smaller, fo
         ]
     )
 
-    output_parser = JsonOutputParser()
-    chain = prompt | llm | output_parser
+
+@traced("text2questions")
+@with_retries
+def text2questions(
+    text: str, llm: Optional[Chat] = None
+) -> List[Dict[str, Any]]:
+    """
+    Break down complex questions or statements into smaller, focused questions with search terms.
+
+    Args:
+        text (str): The input text containing complex questions or statements.
+        llm (Chat, optional): The language model to use for extraction. Defaults to the shared client for MODEL_NAME.
+
+    Returns:
+        List[Dict[str, Any]]: A list of dictionaries, each containing a sub-question and search terms.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    chain = get_chain("text2questions", llm, _text2questions_prompt)
     result = chain.invoke({"text": text})
 
     return result
 
-def generate_prf_docs(query: str, llm: Chat, num_docs: int = 3) -> List[str]:
+@lru_cache(maxsize=None)
+def _prf_docs_prompt() -> ChatPromptTemplate:
     """
-    Generate pseudo-relevant feedback documents using the LLM.
+    Build (once) the prompt used to generate pseudo-relevant feedback documents.
     """
-    prf_prompt = ChatPromptTemplate.from_messages([
+
+    return ChatPromptTemplate.from_messages([
         ("system", "You are an AI assistant that generates concise, relevant passages in response to a query."),
         ("human", "Generate {num_docs} short, informative passages (2-3 sentences each) that could be relevant to the following query: {query}")
     ])
+
+
+@traced("prf_docs")
+@with_retries
+def generate_prf_docs(query: str, llm: Chat, num_docs: int = 3) -> List[str]:
+    """
+    Generate pseudo-relevant feedback documents using the LLM.
+    """
     
-    chain = prf_prompt | llm | StrOutputParser()
+    chain = get_chain("generate_prf_docs", llm, _prf_docs_prompt, StrOutputParser)
     result = chain.invoke({"query": query, "num_docs": num_docs})
     return result.split("\n\n")  # Assuming each passage is separated by a blank line
 
 
-# Based on https://arxiv.org/pdf/2305.03653
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_fixed(2),
-    retry=retry_if_exception_type(Exception),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    reraise=True,
-)
-def text2questions_v2(
-    text: str, 
-    llm: Chat = Chat(model_name=MODEL_NAME)
-) -> Dict[str, Any]:
+@lru_cache(maxsize=None)
+def _query_expansion_prompt() -> ChatPromptTemplate:
     """
-    Generate query expansions using Chain-of-Thought prompting with an LLM and generated PRF documents.
-
-    Args:
-        text (str): The original query text.
-        llm (Chat): The language model to use. Defaults to Chat(model_name=MODEL_NAME).
-
-    Returns:
-        Dict[str, Any]: A dictionary containing the original query, expanded query, and analysis.
+    Build (once) the Chain-of-Thought query expansion prompt.
     """
-    # Generate PRF documents
-    prf_docs = generate_prf_docs(text, llm)
 
-    cot_prompt = ChatPromptTemplate.from_messages([
+    return ChatPromptTemplate.from_messages([
         ("system", "You are an AI assistant specialized in expanding search queries to improve retrieval effectiveness."),
         ("human", """Given the following query and pseudo-relevant documents, please:
 1. Analyze the main topics and subtopics of the query.
@@ -387,9 +436,39 @@ Respond in the following JSON format:
 }}""")
     ])
 
+
+@with_retries
+def _expand_query(text: str, prf_docs: List[str], llm: Chat) -> Dict[str, Any]:
+    chain = get_chain("text2questions_v2", llm, _query_expansion_prompt)
+    return chain.invoke({"query": text, "prf_docs": "\n".join(prf_docs)})
+
+
+# Based on https://arxiv.org/pdf/2305.03653
+# Not retried as a whole: each of its two LLM calls retries on its own
+@traced("text2questions_v2")
+def text2questions_v2(
+    text: str, 
+    llm: Optional[Chat] = None
+) -> Dict[str, Any]:
+    """
+    Generate query expansions using Chain-of-Thought prompting with an LLM and generated PRF documents.
+
+    Args:
+        text (str): The original query text.
+        llm (Chat): The language model to use. Defaults to the shared client for MODEL_NAME.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing the original query, expanded query, and analysis.
+    """
+
+    if llm is None:
+        llm = get_llm()
+
+    # Generate PRF documents
+    prf_docs = generate_prf_docs(text, llm)
+
     try:
-        chain = cot_prompt | llm | JsonOutputParser()
-        result = chain.invoke({"query": text, "prf_docs": "\n".join(prf_docs)})
+        result = _expand_query(text, prf_docs, llm)
         
         original_query = text.strip()
         expanded_queries = [original_query] * 5  # Repeat original query 5 times for emphasis